@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Measures the import time of scriptycut in fresh interpreters and checks it against a budget.
+Heavy optional dependencies (NumPy, ImageIO) must not be imported and no process may be spawned.
+
+python benchmarks/bench_import.py
+python benchmarks/bench_import.py --runs 20 --budget 80
+"""
+
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+# All modules a usual project script imports
+MODULES = (
+    "scriptycut.clip",
+    "scriptycut.fileclip",
+    "scriptycut.image",
+    "scriptycut.generate",
+    "scriptycut.crossfade",
+    "scriptycut.overlay",
+    "scriptycut.transform",
+    "scriptycut.rawframes",
+    "scriptycut.formats",
+)
+
+HEAVY_MODULES = "numpy", "imageio"
+
+BUDGET_MS = 100.
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+_PROBE = f"""
+import sys, time, json
+spawned = []
+sys.addaudithook(lambda event, args: spawned.append(args[0]) if event == "subprocess.Popen" else None)
+t = time.perf_counter()
+import {", ".join(MODULES)}
+elapsed = time.perf_counter() - t
+print(json.dumps({{"ms": elapsed * 1000, "spawned": spawned,
+                  "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure_once() -> dict:
+    res = subprocess.run((sys.executable, "-c", _PROBE), capture_output=True, text=True, check=True)
+    return json.loads(res.stdout)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help="Maximum median import time in ms")
+    parser.add_argument("--output", type=Path, help="Result file. Default: results/import-<timestamp>.json")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    times = [r["ms"] for r in runs]
+    heavy = sorted(set().union(*(r["heavy"] for r in runs)))
+    spawned = sorted(set().union(*(r["spawned"] for r in runs)))
+    median = statistics.median(times)
+
+    result = {
+        "created_iso": datetime.now().isoformat(),
+        "python": sys.version,
+        "modules": MODULES,
+        "median_ms": median,
+        "min_ms": min(times),
+        "max_ms": max(times),
+        "budget_ms": args.budget,
+        "heavy_modules_imported": heavy,
+        "spawned_processes": spawned,
+    }
+
+    output = args.output or RESULTS_DIR / f"import-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+
+    print(f"Import time: median {median:.1f} ms (min {min(times):.1f}, max {max(times):.1f}), "
+          f"budget {args.budget:.1f} ms")
+
+    ok = median <= args.budget
+    if heavy:
+        print(f"Heavy modules imported: {', '.join(heavy)}")
+        ok = False
+    if spawned:
+        print(f"Processes spawned on import: {', '.join(spawned)}")
+        ok = False
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks synthetic projects: graph building, planning, rendering and re-rendering with a warm cache.
+The warm re-render reads the caches of all nodes and only encodes the output again. It is no faster than
+the first render when the output encode dominates.
+Results are stored as JSON for regression comparison.
+
+python benchmarks/bench_render.py --preset quick
+python benchmarks/bench_render.py --segments 10 100 --resolutions 720p --compare benchmarks/results/<old>.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+
+from scriptycut.clip import Clip
+from scriptycut.cache import Cache
+from scriptycut.common import Caching
+from scriptycut.fftools import FFMPEG
+from scriptycut.render import RenderPlan, ThreadedEngine, AsyncEngine
+
+from projects import build_project, RESOLUTIONS
+
+PRESETS = {
+    "quick": ((10, ), ("720p", )),
+    "default": ((10, 100), ("720p", "1080p")),
+    "full": ((10, 100, 1000), ("720p", "1080p", "4k")),  # Needs a lot of time and disk space
+}
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Lower is better for all of them
+COMPARED_METRICS = "graph_build", "planning", "render", "rerender_warm"
+
+OUTPUT_ARGS = "-c:v", "ffv1"
+
+ENGINES = {"threaded": ThreadedEngine, "async": AsyncEngine}
+
+
+@contextmanager
+def forced_caching():
+    """Clips left to the cost model get their own cached job instead of being fused"""
+    previous = Clip.CACHING
+    Clip.CACHING = Caching.ALWAYS
+    try:
+        yield
+    finally:
+        Clip.CACHING = previous
+
+
+def bench_project(segments: int, resolution: str, workdir: Path, max_jobs: int, engine: str) -> dict:
+    Clip.set_root_cache(Cache(workdir / "cache", auto_discard_orphans=False))
+    output = workdir / "output.mkv"
+
+    t = time.perf_counter()
+    project = build_project(segments, resolution)
+    graph_build = time.perf_counter() - t
+
+    t = time.perf_counter()
+    plan = RenderPlan(project, output, OUTPUT_ARGS)
+    planning = time.perf_counter() - t
+
+    t = time.perf_counter()
+    profile = plan.run(max_jobs, ENGINES[engine]())
+    render = time.perf_counter() - t
+
+    # Same project again with a warm cache: All nodes but the output hit.
+    # Fused nodes have no cache, so caching is forced and the caches are filled first.
+    with forced_caching():
+        RenderPlan(project, output, OUTPUT_ARGS).run(max_jobs, ENGINES[engine]())
+        t = time.perf_counter()
+        profile_cached = RenderPlan(project, output, OUTPUT_ARGS).run(max_jobs, ENGINES[engine]())
+        rerender_warm = time.perf_counter() - t
+
+    width, height = RESOLUTIONS[resolution]
+    frames = project.duration * Clip._fps_hint.as_float
+
+    return {
+        "segments": segments,
+        "resolution": resolution,
+        "engine": engine,
+        "duration": project.duration,
+        "jobs": len(plan.jobs),
+        "graph_build": graph_build,
+        "planning": planning,
+        "render": render,
+        "render_cpu": profile.cpu_time,
+        "critical_path": [n.name for n in profile.critical_path()],
+        "fps": frames / render,
+        "megapixels_per_second": frames * width * height / render / 1e6,
+        "rerender_warm": rerender_warm,
+        "cache_hits": sum(n.cache_hit for n in profile_cached.nodes.values()),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta: float) -> bool:
+    """
+    Prints ratios against a baseline. Returns False on regressions.
+    Differences below min_delta seconds are noise and never count as regression.
+    """
+    def key(r: dict) -> tuple:
+        # Results of older versions have no engine
+        return r["segments"], r["resolution"], r.get("engine", "threaded")
+
+    old = {key(r): r for r in baseline["results"]}
+    ok = True
+
+    for r in results["results"]:
+        b = old.get(key(r))
+        if b is None:
+            continue
+
+        for metric in COMPARED_METRICS:
+            if metric not in b:
+                # Measured differently by older versions
+                continue
+            ratio = r[metric] / b[metric] if b[metric] else 1.
+            regression = ratio > threshold and r[metric] - b[metric] > min_delta
+            ok = ok and not regression
+            print(f"{r['segments']:>5} {r['resolution']:>6} {r['engine']:>8} {metric:>16}: "
+                  f"{b[metric]:9.3f}s -> {r[metric]:9.3f}s "
+                  f"({ratio:5.2f}x){'  REGRESSION' if regression else ''}")
+
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=PRESETS, default="quick")
+    parser.add_argument("--segments", type=int, nargs="+", help="Overrides the preset")
+    parser.add_argument("--resolutions", choices=RESOLUTIONS, nargs="+", help="Overrides the preset")
+    parser.add_argument("--jobs", type=int, default=None, help="Parallel ffmpeg processes")
+    parser.add_argument("--engine", choices=ENGINES, default="threaded")
+    parser.add_argument("--output", type=Path, help="Result file. Default: results/<timestamp>.json")
+    parser.add_argument("--compare", type=Path, help="Compare with a previous result file")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slowdown ratio counted as regression")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="Ignore slowdowns below these seconds")
+    args = parser.parse_args()
+
+    segments, resolutions = PRESETS[args.preset]
+    segments = args.segments or segments
+    resolutions = args.resolutions or resolutions
+
+    results = {
+        "created_iso": datetime.now().isoformat(),
+        "python": sys.version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": FFMPEG().version.splitlines()[0],
+        "results": [],
+    }
+
+    for n in segments:
+        for resolution in resolutions:
+            with tempfile.TemporaryDirectory(prefix="scriptycut-bench-") as workdir:
+                r = bench_project(n, resolution, Path(workdir), args.jobs, args.engine)
+            results["results"].append(r)
+            print(f"{n:>5} {resolution:>6}: build {r['graph_build']:.3f}s, plan {r['planning']:.3f}s, "
+                  f"render {r['render']:.3f}s ({r['fps']:.1f} fps), warm re-render {r['rerender_warm']:.3f}s")
+
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results: {output}")
+
+    if args.compare:
+        return 0 if compare(results, json.loads(args.compare.read_text()), args.threshold, args.min_delta) else 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""
+Deterministic synthetic projects for benchmarks.
+Only generated sources (lavfi) are used. No media files required.
+"""
+
+from scriptycut.clip import Clip, ClipSequence, Libavfilter
+from scriptycut.generate import TestSrc, ColorClip
+from scriptycut.crossfade import Crossfade
+from scriptycut.overlay import Overlay
+
+
+RESOLUTIONS = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+COLORS = "red", "green", "blue", "yellow", "cyan", "magenta"
+PATTERNS = "testsrc2", "smptebars", "rgbtestsrc"
+
+
+def segment(nr: int, duration: float, width: int, height: int) -> Clip:
+    """
+    One generated segment. Each segment number always creates the same clip.
+    Every 5th segment is rendered in a lower resolution and scaled.
+    Every 7th segment gets a small overlay.
+    """
+    kind = nr % 3
+    if nr % 5 == 4:
+        w, h = width // 2, height // 2
+    else:
+        w, h = width, height
+
+    if kind == 0:
+        clip = TestSrc(duration, w, h)
+    elif kind == 1:
+        clip = ColorClip(duration, w, h, COLORS[nr % len(COLORS)])
+    else:
+        pattern = PATTERNS[nr % len(PATTERNS)]
+        clip = Libavfilter(f"{pattern}=size={w}x{h}:rate={Clip._fps_hint.as_float}", duration)
+
+    if (w, h) != (width, height):
+        clip = clip.scale(width, height)
+
+    if nr % 7 == 6:
+        clip = Overlay(clip, ColorClip(duration, width // 8, height // 8, "white"), f"x={nr % 10 * 10}:y=10")
+
+    return clip
+
+
+def build_project(segments: int, resolution: str, segment_duration=0.5, crossfade_every=4) -> Clip:
+    """
+    Sequence of generated segments with crossfades between some of them.
+    :param segments: Number of segments
+    :param resolution: Key of RESOLUTIONS
+    :param segment_duration: Seconds per segment
+    :param crossfade_every: Insert a crossfade after every n-th segment, at least 2. 0 disables crossfades.
+                            The sequence trims the overlap from the neighbouring segments.
+    """
+    width, height = RESOLUTIONS[resolution]
+    clips = []
+
+    for nr in range(segments):
+        if nr and crossfade_every and nr % crossfade_every == 0:
+            clips.append(Crossfade(segment_duration / 2, "fade"))
+        clips.append(segment(nr, segment_duration, width, height))
+
+    return ClipSequence(clips)
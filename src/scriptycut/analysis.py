@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+
+"""
+Analysis of clip sources by single decode passes.
+Measurements are stored as NumPy arrays in the cache folder and reused by all following queries.
+"""
+
+import re
+from pathlib import Path
+from subprocess import run
+from typing import TYPE_CHECKING, Optional
+
+from scriptycut.clip import Clip, ClipError
+from scriptycut.ffinterface import FFargFilter, FFargOutput
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Width of the downscaled video for analysis. Scene scores and black detection don't need details.
+ANALYSIS_WIDTH = 160
+
+# Luminance of a pixel considered black (blackdetect pix_th)
+BLACK_PIXEL_THRESHOLD = .1
+
+_BLACK_RE = re.compile(r"black_start:\s*([\d.]+)\s+black_end:\s*([\d.]+)")
+
+
+def _run_analysis(clip: Clip, graph: str, what: str) -> str:
+    """
+    Runs graph on the source of a clip without output. Returns the log.
+    {video} and {audio} in graph are replaced by the input streams. The graph ends in [out].
+    """
+    from scriptycut.fftools import FFMPEG
+    from scriptycut.render import source_input
+
+    inp = source_input(clip)
+    cmd = FFMPEG().command((inp, FFargFilter(graph.format(video=f"[{inp.video_spec(0)}]",
+                                                          audio=f"[{inp.audio_spec(0)}]"), "[out]", None),
+                            FFargOutput("-", ("-f", "null"))))
+    res = run(cmd, capture_output=True, text=True, errors="replace", cwd=clip.cachedir)
+    if res.returncode != 0:
+        raise ClipError(f"{what} of {clip!r} failed:\n{res.stderr[-2000:]}")
+    return res.stderr
+
+
+def _parse_frame_metadata(text: str, keys: tuple[str, ...]) -> tuple[list[float], dict[str, list[float]]]:
+    """Times and values of keys from the output of the (a)metadata=print filter"""
+    times = []
+    values = {key: [] for key in keys}
+    for line in text.splitlines():
+        if line.startswith("frame:"):
+            times.append(float(line.rsplit("pts_time:", 1)[1]))
+            for v in values.values():
+                v.append(float("nan"))
+            continue
+
+        key, sep, value = line.partition("=")
+        if sep and key in values and times:
+            values[key][-1] = float(value)
+    return times, values
+
+
+def _read_metadata_file(clip: Clip, name: str, keys: tuple[str, ...]) -> tuple[list[float], dict[str, list[float]]]:
+    file = clip.cachedir / name
+    try:
+        return _parse_frame_metadata(file.read_text(), keys)
+    finally:
+        file.unlink(missing_ok=True)
+
+
+def source_stamps(clip: Clip) -> list[int]:
+    """Sizes and modification times of the source files of a clip. Cached analyses of changed files are stale."""
+    from scriptycut.fileclip import FileClip
+
+    if isinstance(clip, FileClip):
+        return list(clip.source_stamp)
+    return [value for sub in clip.subclips for value in source_stamps(sub)]
+
+
+def _load_npz(file: Path, clip: Clip) -> Optional[dict[str, "np.ndarray"]]:
+    """Arrays of an analysis file. None if it's missing or was made from other source files."""
+    import numpy as np
+
+    if not file.is_file():
+        return None
+    with np.load(file) as data:
+        if "source" not in data or data["source"].tolist() != source_stamps(clip):
+            return None
+        return dict(data)
+
+
+def _save_npz(file: Path, clip: Clip, **arrays):
+    import numpy as np
+
+    part = file.with_suffix(".part.npz")
+    np.savez(part, source=np.array(source_stamps(clip), dtype=np.int64), **arrays)
+    part.replace(file)
+
+
+class VideoAnalysis:
+    """
+    Scene change scores of all frames and black segments of a clip's video.
+    Computed by one low resolution pass (scale, select by scene, blackdetect).
+    """
+
+    FILE = "video_analysis.npz"
+
+    def __init__(self, times: "np.ndarray", scene_scores: "np.ndarray", black: "np.ndarray"):
+        """
+        :param times: Frame times in seconds
+        :param scene_scores: Scene change score of each frame (0 to 1)
+        :param black: Black segments (N, 2) of start and end times. Any length.
+        """
+        self.times = times
+        self.scene_scores = scene_scores
+        self.black = black
+
+    @classmethod
+    def of(cls, clip: Clip, force=False) -> "VideoAnalysis":
+        """Loads the analysis from the cache folder or analyzes the clip"""
+        import numpy as np
+
+        file: Path = clip.cachedir / cls.FILE
+        data = None if force else _load_npz(file, clip)
+        if data is not None:
+            return cls(data["times"], data["scene_scores"], data["black"])
+
+        if not clip.has_video:
+            raise ValueError(f"{clip!r} has no video.")
+
+        scores_file = "scene_scores.txt"
+        log = _run_analysis(clip,
+                            f"{{video}}scale={ANALYSIS_WIDTH}:-2,select='gte(scene,0)',"
+                            f"metadata=print:key=lavfi.scene_score:file={scores_file},"
+                            f"blackdetect=d=0:pix_th={BLACK_PIXEL_THRESHOLD}[out]",
+                            "Video analysis")
+
+        times, values = _read_metadata_file(clip, scores_file, ("lavfi.scene_score", ))
+        scores = values["lavfi.scene_score"]
+        black = [(float(start), float(end)) for start, end in _BLACK_RE.findall(log)]
+
+        analysis = cls(np.array(times, dtype=np.float64), np.array(scores, dtype=np.float32),
+                       np.array(black, dtype=np.float64).reshape(-1, 2))
+        _save_npz(file, clip, times=analysis.times, scene_scores=analysis.scene_scores, black=analysis.black)
+        return analysis
+
+    def scene_changes(self, threshold: float = .3) -> "np.ndarray":
+        """Times of frames with a scene score above threshold"""
+        return self.times[self.scene_scores > threshold]
+
+    def black_segments(self, min_duration: float = .1) -> "np.ndarray":
+        """Black segments (N, 2) of start and end times lasting at least min_duration"""
+        return self.black[self.black[:, 1] - self.black[:, 0] >= min_duration]
+
+
+# Window of the peak and RMS envelope in seconds
+ENVELOPE_SECONDS = .1
+
+# silencedetect: Level and minimum duration of silence
+SILENCE_NOISE_DB = -50
+SILENCE_MIN_SECONDS = .1
+
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[\d.]+)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[\d.]+)")
+_LOUDNESS_RE = {
+    "integrated": re.compile(r"I:\s*(-?[\d.]+|-inf) LUFS"),
+    "threshold": re.compile(r"Threshold:\s*(-?[\d.]+|-inf) LUFS"),
+    "lra": re.compile(r"LRA:\s*(-?[\d.]+) LU\b"),
+    "true_peak": re.compile(r"Peak:\s*(-?[\d.]+|-inf) dBFS"),
+}
+
+
+class AudioAnalysis:
+    """
+    Peak and RMS envelope, silence intervals and EBU R128 loudness of a clip's audio.
+    Computed by one pass (asetnsamples, astats, silencedetect, ebur128).
+    Silence trimming and two-pass loudnorm reuse it instead of decoding the audio again.
+    """
+
+    FILE = "audio_analysis.npz"
+
+    def __init__(self, times: "np.ndarray", peak_db: "np.ndarray", rms_db: "np.ndarray", silence: "np.ndarray",
+                 loudness: dict[str, float]):
+        """
+        :param times: Start times of the envelope windows
+        :param peak_db: Peak level of each window in dBFS
+        :param rms_db: RMS level of each window in dBFS
+        :param silence: Silent intervals (N, 2) of start and end times
+        :param loudness: integrated (LUFS), threshold (LUFS), lra (LU), true_peak (dBFS)
+        """
+        self.times = times
+        self.peak_db = peak_db
+        self.rms_db = rms_db
+        self.silence = silence
+        self.loudness = loudness
+
+    @classmethod
+    def of(cls, clip: Clip, sample_rate: int = None, force=False) -> "AudioAnalysis":
+        """
+        Loads the analysis from the cache folder or analyzes the clip
+        :param sample_rate: Sample rate of the source if known. Else the audio gets resampled to 48 kHz.
+        """
+        import numpy as np
+
+        file: Path = clip.cachedir / cls.FILE
+        data = None if force else _load_npz(file, clip)
+        if data is not None:
+            loudness = dict(zip(data["loudness_keys"].tolist(), data["loudness"].tolist()))
+            return cls(data["times"], data["peak_db"], data["rms_db"], data["silence"], loudness)
+
+        if not clip.has_audio:
+            raise ValueError(f"{clip!r} has no audio.")
+
+        resample = ""
+        if not sample_rate:
+            sample_rate = 48000
+            resample = f"aresample={sample_rate},"
+
+        envelope_file = "envelope.txt"
+        keys = "lavfi.astats.Overall.Peak_level", "lavfi.astats.Overall.RMS_level"
+        log = _run_analysis(clip,
+                            f"{{audio}}{resample}asetnsamples=n={round(sample_rate * ENVELOPE_SECONDS)}:p=0,"
+                            f"astats=metadata=1:reset=1:measure_perchannel=none:"
+                            f"measure_overall=Peak_level+RMS_level,"
+                            f"ametadata=print:file={envelope_file},"
+                            f"silencedetect=n={SILENCE_NOISE_DB}dB:d={SILENCE_MIN_SECONDS},"
+                            f"ebur128=peak=true:framelog=quiet[out]",
+                            "Audio analysis")
+        times, values = _read_metadata_file(clip, envelope_file, keys)
+
+        starts = [float(t) for t in _SILENCE_START_RE.findall(log)]
+        ends = [float(t) for t in _SILENCE_END_RE.findall(log)]
+        ends += [clip.duration] * (len(starts) - len(ends))  # Silent until the end
+        summary = log[log.rfind("Summary:"):]
+        loudness = {}
+        for key, regex in _LOUDNESS_RE.items():
+            m = regex.search(summary)
+            loudness[key] = float(m.group(1)) if m else float("nan")
+
+        analysis = cls(np.array(times, dtype=np.float64),
+                       np.array(values[keys[0]], dtype=np.float32),
+                       np.array(values[keys[1]], dtype=np.float32),
+                       np.array(list(zip(starts, ends)), dtype=np.float64).reshape(-1, 2),
+                       loudness)
+        _save_npz(file, clip, times=analysis.times, peak_db=analysis.peak_db, rms_db=analysis.rms_db,
+                  silence=analysis.silence, loudness_keys=np.array(list(loudness)),
+                  loudness=np.array(list(loudness.values()), dtype=np.float64))
+        return analysis
+
+    def silences(self, min_duration: float = .5) -> "np.ndarray":
+        """Silent intervals (N, 2) of at least min_duration seconds"""
+        return self.silence[self.silence[:, 1] - self.silence[:, 0] >= min_duration]
+
+    def loudnorm_args(self, target_i: float = -16., target_lra: float = 11., target_tp: float = -1.5) -> str:
+        """loudnorm filter options for the second pass using the measurement"""
+        m = self.loudness
+        return (f"loudnorm=I={target_i}:LRA={target_lra}:TP={target_tp}:measured_I={m['integrated']}:"
+                f"measured_LRA={m['lra']}:measured_TP={m['true_peak']}:measured_thresh={m['threshold']}:linear=true")
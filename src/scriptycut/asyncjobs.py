@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+"""
+Processes on an asyncio event loop. Alternative to JobThread running I/O of all processes in one thread.
+One event loop can supervise hundreds of ffmpeg and ffprobe processes.
+On Python up to 3.11, asyncio waits for each process in a thread unless pidfd_child_watcher() is used.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Callable, Awaitable, Union, AsyncIterable, Iterable
+from subprocess import DEVNULL, PIPE, CompletedProcess
+
+from scriptycut.common import Pathlike
+
+logger = logging.getLogger(__name__)
+
+# Data for stdin. Written with back-pressure: The next chunk is produced when the pipe has drained.
+FeedTypes = Union[bytes, Iterable[bytes], AsyncIterable[bytes]]
+
+# Seconds between terminate and kill on cancellation
+TERMINATE_TIMEOUT = 5.
+
+
+def parse_progress_block(lines: list[str]) -> dict[str, str]:
+    """
+    Parses key=value lines of ffmpeg's -progress output
+    frame=120
+    out_time_us=5000000
+    speed=2.5x
+    progress=continue
+    """
+    info = {}
+    for line in lines:
+        key, sep, value = line.partition("=")
+        if sep:
+            info[key.strip()] = value.strip()
+    return info
+
+
+@contextmanager
+def pidfd_child_watcher():
+    """
+    Lets asyncio.run() in the main thread watch processes by pidfds instead of a thread per process.
+    Python up to 3.11 installs a ThreadedChildWatcher by default. Python 3.12 picks pidfds if supported.
+    Does nothing if pidfds are unsupported (Linux before 5.3, other systems) or another watcher was set.
+    """
+    if sys.version_info >= (3, 12) or threading.current_thread() is not threading.main_thread() \
+            or not hasattr(asyncio, "PidfdChildWatcher") or not hasattr(os, "pidfd_open"):
+        yield
+        return
+
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+    except OSError:
+        yield
+        return
+
+    previous = asyncio.get_child_watcher()
+    if type(previous) is not asyncio.ThreadedChildWatcher:
+        yield
+        return
+
+    # Attached to the loop of asyncio.run() by the event loop policy
+    asyncio.set_child_watcher(asyncio.PidfdChildWatcher())
+    try:
+        yield
+    finally:
+        asyncio.set_child_watcher(previous)
+
+
+class AsyncJob:
+    """
+    A single process run by asyncio.
+    Cancelling the awaiting task terminates the process. A timeout kills it.
+    """
+
+    def __init__(self, cmd: List[str], cwd: Pathlike = None, timeout: float = None,
+                 stdin: Union[int, FeedTypes] = DEVNULL, stdout: int = DEVNULL, stderr: int = DEVNULL,
+                 close_std_fds=True,
+                 read_stdout: Callable[[asyncio.StreamReader], Awaitable] = None,
+                 on_progress: Callable[[dict[str, str]], None] = None):
+        """
+        :param cmd: Command line
+        :param cwd: Working directory
+        :param timeout: Seconds until the process gets killed
+        :param stdin: File descriptor or data to feed (bytes, iterable or async iterable of bytes)
+        :param stdout: File descriptor. Ignored if read_stdout or on_progress are set.
+        :param stderr: File descriptor
+        :param close_std_fds: Close the passed file descriptors when finished
+        :param read_stdout: Coroutine function consuming stdout. It reads at its own pace (back-pressure).
+        :param on_progress: Called with parsed blocks of ffmpeg's "-progress pipe:1" output on stdout
+        """
+        if read_stdout is not None and on_progress is not None:
+            raise ValueError("stdout can either be read as data or as progress info.")
+
+        self.cmd = cmd
+        self.cwd = cwd
+        self.timeout = timeout
+        self.result: Optional[CompletedProcess] = None
+        self.process: Optional[asyncio.subprocess.Process] = None
+
+        # Same interface as JobThread. asyncio reaps the process itself, so there's no rusage.
+        self.rusage: Optional[os.struct_rusage] = None
+        self.started: Optional[float] = None  # time.time()
+        self.finished: Optional[float] = None
+
+        self._feed = None if isinstance(stdin, int) else stdin
+        self._stdin = PIPE if self._feed is not None else stdin
+        self._stdout = PIPE if read_stdout or on_progress else stdout
+        self._stderr = stderr
+        self._read_stdout = read_stdout
+        self._on_progress = on_progress
+        self.close_std_fds = close_std_fds
+
+    @property
+    def wall_time(self) -> Optional[float]:
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    async def _write_stdin(self, writer: asyncio.StreamWriter):
+        try:
+            chunks = self._feed
+            if isinstance(chunks, (bytes, bytearray, memoryview)):
+                chunks = chunks,
+
+            if hasattr(chunks, "__aiter__"):
+                async for chunk in chunks:
+                    writer.write(chunk)
+                    await writer.drain()
+            else:
+                for chunk in chunks:
+                    writer.write(chunk)
+                    await writer.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # Process finished reading early
+            pass
+        finally:
+            writer.close()
+
+    async def _read_progress(self, reader: asyncio.StreamReader):
+        block = []
+        async for raw_line in reader:
+            line = raw_line.decode(errors="replace").strip()
+            block.append(line)
+            if line.startswith("progress="):
+                self._on_progress(parse_progress_block(block))
+                block = []
+
+    async def _communicate(self, proc: asyncio.subprocess.Process):
+        tasks = []
+        if self._feed is not None:
+            tasks.append(self._write_stdin(proc.stdin))
+        if self._read_stdout is not None:
+            tasks.append(self._read_stdout(proc.stdout))
+        elif self._on_progress is not None:
+            tasks.append(self._read_progress(proc.stdout))
+
+        await asyncio.gather(*tasks)
+        return await proc.wait()
+
+    async def _terminate(self, proc: asyncio.subprocess.Process):
+        if proc.returncode is not None:
+            return
+
+        proc.terminate()
+        try:
+            await asyncio.wait_for(proc.wait(), TERMINATE_TIMEOUT)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+
+    def _close_fds(self):
+        if not self.close_std_fds:
+            return
+
+        for fd in self._stdin, self._stdout, self._stderr:
+            if isinstance(fd, int) and fd >= 0:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+    async def run(self) -> CompletedProcess:
+        logger.debug(f"ASYNC JOB {id(self)} START: {self.cmd}")
+        self.started = time.time()
+
+        try:
+            self.process = proc = await asyncio.create_subprocess_exec(
+                *self.cmd, stdin=self._stdin, stdout=self._stdout, stderr=self._stderr, cwd=self.cwd)
+
+            try:
+                returncode = await asyncio.wait_for(self._communicate(proc), self.timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                returncode = await proc.wait()
+            except BaseException:
+                # Cancelled or failed reading/writing
+                await asyncio.shield(self._terminate(proc))
+                raise
+
+            self.result = CompletedProcess(self.cmd, returncode)
+            return self.result
+        finally:
+            self.finished = time.time()
+            self._close_fds()
+            logger.debug(f"ASYNC JOB {id(self)} FINISH")
+
+    def __await__(self):
+        return self.run().__await__()
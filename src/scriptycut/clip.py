@@ -3,15 +3,19 @@
 import logging
 import functools
 from abc import ABCMeta, abstractmethod
-from typing import Optional, Union
+from pathlib import Path
+from typing import Optional, Union, TYPE_CHECKING
 from collections.abc import Iterable, Generator
 from itertools import chain
 
 from scriptycut.cache import Cache
-from scriptycut.common import Pathlike, FPS, Layer, ClipClassMeta
-from scriptycut.fftools import FFMPEG
+from scriptycut.common import Pathlike, FPS, Layer, Caching, ClipClassMeta
 from scriptycut.clipflags import ClipFlags
-from scriptycut.ffinterface import FFArgsInterface
+from scriptycut.ffinterface import FFArgsInterface, FFargInput, FFargFilter, FFargOutput, ArgumentTypes
+
+if TYPE_CHECKING:
+    from scriptycut.formats import VideoFormat, AudioFormat
+    from scriptycut.renderprofile import RenderProfile
 
 logger = logging.getLogger('scriptycut')
 
@@ -34,13 +38,11 @@ class Clip(metaclass=ABCMeta):
     # Version is important for caching. Each version will retain its own cache.
     META = ClipClassMeta()
 
-    # Heavy processing should be cached especially on multiple renders
-    # Disable when caching is really unnecessary (direct reading from file at least)
-    CACHE_ENABLE = True
-
-    # If CACHE_ENABLE = True, the backend can automatically
-    # take care of creating and offering a cache file:
-    CACHE_BY_BACKEND = True
+    # Heavy processing should be cached especially on multiple renders.
+    # AUTO lets the render planner weigh the processing against writing and reading a cache (scriptycut.costs).
+    # Cheap nodes run within the ffmpeg process of the next Clip then.
+    # NEVER when caching is really unnecessary (direct reading from file at least)
+    CACHING = Caching.AUTO
 
     # By default, streams are consistent with the input options.
     # Set to True on random based streams, live streams, cam/mic inputs, variable lengths etc.
@@ -96,7 +98,6 @@ class Clip(metaclass=ABCMeta):
 
         # Clip related attributes
         self._video_fps: Optional[FPS] = None
-        self._cached = False
 
     @property
     def has_video(self) -> bool:
@@ -133,6 +134,44 @@ class Clip(metaclass=ABCMeta):
     def video_fps(self) -> Optional[FPS]:
         return self._video_fps
 
+    @property
+    def is_still(self) -> bool:
+        """
+        True if the video shows the same picture all the time and has no audio.
+        Still clips get rendered by encoding a short GOP once and looping it in copy mode.
+        """
+        return False
+
+    @property
+    def video_format(self) -> Optional["VideoFormat"]:
+        """Format of the video stream if known, like the one of a source file"""
+        return None
+
+    @property
+    def audio_format(self) -> Optional["AudioFormat"]:
+        """Format of the audio stream if known, like the one of a source file"""
+        return None
+
+    def keyframe_times(self) -> Optional[list[float]]:
+        """
+        Times where decoding can start without decoding earlier frames. Helps to split work into chunks.
+        None if unknown or any frame.
+        """
+        return None
+
+    def stream_copy_parts(self) -> Optional[tuple["Clip", ...]]:
+        """
+        Consecutive parts of the video which may be rendered separately and joined. Parts of source files
+        get copied into H.264 outputs instead of encoded. See scriptycut.streamcopy.
+        None if the clip gets rendered as a whole.
+        """
+        return None
+
+    @property
+    def subclips(self) -> tuple["Clip", ...]:
+        """Direct dependencies of the clip. Their output is the input for this clip."""
+        return ()
+
     @property
     def duration(self) -> float:
         """
@@ -183,12 +222,15 @@ class Clip(metaclass=ABCMeta):
         return RepeatClip(self, count)
 
     def __getitem__(self, item):
-        # TODO Rethink?
-        if isinstance(item, int):
-            pass  # get a frame by framenumber
-
-        if isinstance(item, float):
-            pass  # get a frame at second
+        """
+        clip[120]: Frame by frame number as read-only ndarray (H, W, C)
+        clip[4.5]: Frame at second
+        Negative values count from the end. Decoders are reused. See scriptycut.framepool.
+        clip[0:10, 5.:6.]: Slices
+        """
+        if isinstance(item, (int, float)):
+            from scriptycut.framepool import default_pool
+            return default_pool().get(self, item)
 
         if isinstance(item, (slice, tuple)):
             from scriptycut.slice import Slice
@@ -199,10 +241,21 @@ class Clip(metaclass=ABCMeta):
     #     from scriptycut.transform import Transform
     #     return Transform(self, options)
 
-    def overlay(self, other_overlay_clip: "Clip", options) -> "Clip":
-        # TODO Overlays with clips
+    def overlay(self, other_overlay_clip: "Clip", options: str = None, start: float = 0.,
+                duration: float = None) -> "Clip":
+        """Places a clip on top of this one from start for duration seconds. See scriptycut.overlay.Overlay."""
         from scriptycut.overlay import Overlay
-        return Overlay(self, other_overlay_clip, options)
+        return Overlay(self, other_overlay_clip, options, start, duration)
+
+    def speed(self, factor: float, keyframes_only: bool = None, audio=True) -> "Clip":
+        """Plays the clip factor times faster. See scriptycut.speed.Speed."""
+        from scriptycut.speed import Speed
+        return Speed(self, factor, keyframes_only, audio)
+
+    def reverse(self, chunk_seconds: float = 2.) -> "Clip":
+        """Plays the clip backwards with bounded memory. See scriptycut.reverse.Reverse."""
+        from scriptycut.reverse import Reverse
+        return Reverse(self, chunk_seconds)
 
     def scale(self,
               width: int = None, height: int = None,
@@ -224,34 +277,161 @@ class Clip(metaclass=ABCMeta):
     def ffmpeg_args(self) -> FFArgsInterface:
         """
         Create command line arguments for the ffmpeg call representing the clip function.
+        Inputs are usually the input_args() of the subclips. Outputs are added by the renderer.
         :return: FFArgs instance or iterable of it
         """
+        raise NotImplementedError(f"{self.__class__.__name__} can't be rendered yet.")
 
-    def render_cache(self, force_update_existing=False):
-        if not self.CACHE_ENABLE:
-            return
+    def stdin_data(self) -> Optional[Iterable]:
+        """
+        Data ffmpeg reads from stdin (pipe:0) while rendering this clip.
+        Iterable of ndarrays or bytes-like objects, consumed in a separate thread. None if not needed.
+        """
+        return None
+
+    def input_args(self) -> FFargInput:
+        """
+        How the ffmpeg call of a following clip reads this clip.
+        Reads from the cache file by default.
+        """
+        return FFargInput(self.cache_file,
+                          video="v:0" if self.has_video else None,
+                          audio="a:0" if self.has_audio else None)
 
-        if self._cached and not force_update_existing:
+    def cache_output_args(self) -> FFargOutput:
+        """Output of the cache job. Lossless FFV1 and FLAC by default."""
+        from scriptycut.fftools import FFMPEG
+        return FFMPEG.cache_output_args(self.cache_part_file)
+
+    @property
+    def cache_file(self) -> Path:
+        """Rendered clip in its cache folder"""
+        return self.cachedir / "cache.mkv"
+
+    def layer_cache_file(self, layers: Layer) -> Path:
+        """
+        Cache file holding only some layers, like the audio of a video clip.
+        The full cache_file if all available layers are requested.
+        """
+        layers &= self.available_av_layer
+        if layers == self.available_av_layer:
+            return self.cache_file
+        return self.cachedir / f"cache.{layers.name.lower()}.mkv"
+
+    @property
+    def cache_part_file(self) -> Path:
+        """Incomplete cache file while rendering"""
+        return self.cachedir / "cache.part.mkv"
+
+    @property
+    def cacheable(self) -> bool:
+        """The clip can be rendered into its cache folder"""
+        return self.CACHING is not Caching.NEVER or self.is_still
+
+    @property
+    def is_cached(self) -> bool:
+        return self.cacheable and self.cache_file.is_file()
+
+    def render_cache(self, force_update_existing=False) -> Optional["RenderProfile"]:
+        """
+        Renders the clip into its cache folder. Still clips are cached by looping a short GOP.
+        :return: RenderProfile or None if there was nothing to render
+        """
+        if not self.cacheable:
+            return None
+
+        if self.is_cached and not force_update_existing:
             # The Clip is already cached
-            return
+            return None
+
+        from scriptycut.render import RenderPlan
+        return RenderPlan(self, force_update_existing=force_update_existing).run()
+
+    def render(self, file: Pathlike, output_args: ArgumentTypes = None, max_jobs: int = None,
+               engine=None, layers: Layer = None) -> "RenderProfile":
+        """
+        Renders the clip into a file. Cacheable subclips get rendered into their cache folders first.
+        :param file: Output file
+        :param output_args: Encoding arguments for the output. ffmpeg chooses defaults by the file extension.
+        :param max_jobs: Maximum number of parallel ffmpeg processes. Default from THREADS environment variable.
+        :param engine: scriptycut.render.ThreadedEngine (default) or AsyncEngine
+        :param layers: Layers to render. Default: All except those excluded by output_args (-vn, -an)
+                       or an audio file extension. Unused layers are not decoded.
+        :return: RenderProfile of all processed clips. Save it by write_json() or write_chrome_trace().
+        """
+        # TODO: Format incompatibility handling
+        from scriptycut.render import RenderPlan
+        return RenderPlan(self, file, output_args, layers=layers).run(max_jobs, engine)
 
-        if self.has_video:
-            cached_video_file = self.cachedir / "video.ffv1"
-        if self.has_audio:
-            cached_audio_file = self.cachedir / "audio.wav"  # or flac
+    def explain(self, file: Optional[Pathlike] = None, output_args: ArgumentTypes = None, analyze=False,
+                max_jobs: int = None, engine=None, layers: Layer = None) -> str:
+        """
+        Prints the physical render plan: The ffmpeg processes, which clips are fused into them, cached, piped or
+        stream copied, and their estimated costs.
+        :param file: Output file like for render(). Default: The cache of the clip.
+        :param output_args: Encoding arguments for the output
+        :param analyze: Run the render and show the actual times
+        :param max_jobs: Maximum number of parallel ffmpeg processes for analyze
+        :param engine: Engine for analyze
+        :param layers: Layers to render
+        :return: The printed plan
+        """
+        from scriptycut.render import RenderPlan
+        plan = RenderPlan(self, file, output_args, layers=layers)
+        profile = plan.run(max_jobs, engine) if analyze else None
+        text = plan.explain(profile)
+        print(text)
+        return text
+
+    def iter_frames(self, batch: int = 16, pix_fmt: str = "rgb24", size: tuple[int, int] = None, fps=None):
+        """
+        Decodes the video into batches of NumPy frames shaped (N, H, W, C).
+        Batches are reused ring buffer views. See scriptycut.rawframes.FrameReader.
+        """
+        from scriptycut.rawframes import FrameReader
+        return iter(FrameReader(self, batch, pix_fmt, size, fps))
 
-        self.render()
-        self._cached = True
+    def iter_audio(self, chunk_seconds: float = 1., sample_rate: int = 48000, layout: str = "stereo"):
+        """
+        Decodes the audio into chunks of float32 samples shaped (N, C).
+        Chunks are reused ring buffer views. See scriptycut.rawaudio.AudioReader.
+        """
+        from scriptycut.rawaudio import AudioReader
+        return iter(AudioReader(self, chunk_seconds, sample_rate, layout))
 
-    def render(self, file: Pathlike, **encoding_kwargs):
-        # TODO: Render interface, format incompatibility handling
-        input_args = ()
-        output_args = ()
+    def thumbnails(self, times: Iterable[float] = None, every: float = None, size: tuple[int, int] = (320, -2),
+                   keyframes_only=False) -> list[Path]:
+        """
+        Extracts frames at times or every n seconds as PNG files in one pass. Cached.
+        See scriptycut.thumbnails.thumbnails()
+        """
+        from scriptycut.thumbnails import thumbnails
+        return thumbnails(self, times, every, size, keyframes_only)
 
-        f = FFMPEG()
-        render_thread = f.run_threaded(self.cachedir, *input_args, *output_args, file)
-        render_thread.join_if_alive()
-        # -progress progressinfo.txt
+    def contact_sheet(self, cols: int = 4, rows: int = 4, size: tuple[int, int] = (320, -2),
+                      keyframes_only=False) -> Path:
+        """
+        A single PNG of cols * rows frames evenly spread over the clip. Cached.
+        See scriptycut.thumbnails.contact_sheet()
+        """
+        from scriptycut.thumbnails import contact_sheet
+        return contact_sheet(self, cols, rows, size, keyframes_only)
+
+    def frames(self, pix_fmt: str = "rgb24"):
+        """
+        All frames as read-only np.memmap (N, H, W, C) of a FrameStore in the cachedir.
+        Decoded once. Later calls, clip[n] and iter_frames() read the store without decoding.
+        """
+        from scriptycut.rawframes import FrameReader, FrameStore
+
+        store = FrameStore(self.cachedir, pix_fmt)
+        if not store.exists:
+            reader = FrameReader(self, pix_fmt=pix_fmt)
+            with store.create(reader.shape, reader.dtype, self.video_fps) as writer:
+                for batch in reader:
+                    writer.write(batch)
+
+        return store.open()
 
     def iter_sequenced_clips(self) -> Generator["Clip", None, None]:
         """
@@ -317,7 +497,58 @@ class InputClip(Clip, metaclass=ABCMeta):
     Also the render process should integrate these sources directly as input arguments of the next
     ffmpeg processing command.
     """
-    CACHE_ENABLE = False  # We're probably reading from a file source etc. anyway, so caching would be unnecessary.
+    CACHING = Caching.NEVER  # We're probably reading from a file source etc. anyway, so caching would be unnecessary.
+
+    def input_args(self) -> FFargInput:
+        raise NotImplementedError(f"{self.__class__.__name__} has to define its input arguments.")
+
+    def ffmpeg_args(self) -> FFArgsInterface:
+        # Plain reading of the input
+        inp = self.input_args()
+        return inp, FFargFilter(None, inp.video_spec(0), inp.audio_spec(0))
+
+
+class CachedInput(Clip):
+    """
+    One pass of an input clip rendered into the cache. For inputs read repeatedly,
+    like the looped clip of a RepeatClip, which then loops the lossless cache in copy mode.
+    """
+    CACHING = Caching.ALWAYS
+
+    def __init__(self, clip: Clip):
+        self._clip = clip
+        Clip.__init__(self)
+        self._video_fps = clip.video_fps
+
+    @property
+    def clip(self) -> Clip:
+        return self._clip
+
+    @property
+    def subclips(self) -> tuple[Clip, ...]:
+        return self._clip,
+
+    @property
+    def flags(self) -> set[ClipFlags]:
+        return self._clip.flags
+
+    @property
+    def duration(self) -> float:
+        return self._clip.duration
+
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        return self._clip.video_resolution
+
+    def stdin_data(self) -> Optional[Iterable]:
+        return self._clip.stdin_data()
+
+    def ffmpeg_args(self) -> FFArgsInterface:
+        inp = self._clip.input_args()
+        return inp, FFargFilter(None, inp.video_spec(0), inp.audio_spec(0))
+
+    def _repr_data(self) -> str:
+        return f"{self._clip!r}"
 
 
 class ClipSequence(Clip):
@@ -335,18 +566,53 @@ class ClipSequence(Clip):
         if len(self._clips) == 0:
             raise ValueError("Empty ClipSequences are not allowed.")
 
+        self._clips = self._resolve_crossfades(self._clips)
+
         Clip.__init__(self)
 
     @staticmethod
     def _flatten_subclips(clips: Iterable[Clip]):
         for clip in clips:
-            if isinstance(clip, ClipSequence):
-                # Balance up
+            if isinstance(clip, ClipSequence) and type(clip).ffmpeg_args is ClipSequence.ffmpeg_args:
+                # Balance up. Subclasses processing their clips in their own way (like RepeatClip) stay one clip.
                 yield from clip._clips
             else:
                 # Just append
                 yield clip
 
+    @staticmethod
+    def _resolve_crossfades(clips: tuple[Clip, ...]) -> tuple[Clip, ...]:
+        """
+        Replaces Crossfade templates between two clips by the rendered overlap
+        and trims the overlapping parts from the neighbours. Templates at the ends stay
+        until the sequence gets joined with more clips.
+        """
+        from scriptycut.crossfade import Crossfade
+        from scriptycut.slice import Trim
+
+        def is_template(c: Clip) -> bool:
+            return isinstance(c, Crossfade) and c.is_template
+
+        cut_start = [0.] * len(clips)
+        cut_end = [0.] * len(clips)
+        resolved = list(clips)
+        for i, c in enumerate(clips):
+            if not is_template(c) or i == 0 or i == len(clips) - 1:
+                continue
+            clip1, clip2 = clips[i - 1], clips[i + 1]
+            if is_template(clip1) or is_template(clip2):
+                raise ValueError("Crossfades need a clip in between.")
+            resolved[i] = c.with_clips(clip1, clip2)
+            cut_end[i - 1] = cut_start[i + 1] = c.duration
+
+        for i, c in enumerate(clips):
+            if cut_start[i] or cut_end[i]:
+                if cut_start[i] + cut_end[i] >= c.duration:
+                    raise ValueError(f"{c!r} is too short for its crossfades.")
+                resolved[i] = Trim(c, cut_start[i], c.duration - cut_end[i])
+
+        return tuple(resolved)
+
     @functools.cached_property
     def flags(self) -> set[ClipFlags]:
         return ClipFlags.merge_from_clips(self._clips, append=ClipFlags.HasSequence)
@@ -355,39 +621,112 @@ class ClipSequence(Clip):
     def duration(self) -> float:
         return sum(c.duration for c in self._clips)
 
+    @property
+    def subclips(self) -> tuple[Clip, ...]:
+        return self._clips
+
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        return next((c.video_resolution for c in self._clips if c.video_resolution), None)
+
+    def stream_copy_parts(self) -> Optional[tuple[Clip, ...]]:
+        if type(self).ffmpeg_args is not ClipSequence.ffmpeg_args:
+            # Joined in their own way
+            return None
+        return self._clips
+
+    def ffmpeg_args(self) -> FFArgsInterface:
+        from scriptycut.crossfade import Crossfade
+
+        if any(isinstance(c, Crossfade) and c.is_template for c in self._clips):
+            raise RuntimeError("A Crossfade at the start or end of a sequence lacks a clip.")
+
+        inputs = tuple(c.input_args() for c in self._clips)
+        has_video = self.has_video
+        has_audio = self.has_audio
+
+        # Clips without a stream get filled by black frames or silence to match the concat segments.
+        # Video and audio are concatenated separately, so each layer can be rendered alone.
+        graph = []
+        video_segments = audio_segments = ""
+        for i, (c, inp) in enumerate(zip(self._clips, inputs)):
+            if has_video:
+                if inp.video:
+                    video_segments += f"[{inp.video_spec(i)}]"
+                else:
+                    w, h = self.video_resolution
+                    graph.append(f"color=c=black:s={w}x{h}:r={self._fps_hint.as_float}:d={c.duration}[fv{i}]")
+                    video_segments += f"[fv{i}]"
+
+            if has_audio:
+                if inp.audio:
+                    audio_segments += f"[{inp.audio_spec(i)}]"
+                else:
+                    graph.append(f"anullsrc=r=48000:cl=stereo,atrim=duration={c.duration}[fa{i}]")
+                    audio_segments += f"[fa{i}]"
+
+        if has_video:
+            graph.append(f"{video_segments}concat=n={len(inputs)}:v=1:a=0[v]")
+        if has_audio:
+            graph.append(f"{audio_segments}concat=n={len(inputs)}:v=0:a=1[a]")
+        return (*inputs,
+                FFargFilter(";".join(graph), "[v]" if has_video else None, "[a]" if has_audio else None))
+
     def match_resolutions(self,
                           width: int = None, height: int = None,
                           from_master=False, keep_aspect=True, center=True, custom: str = None):
         """
         Scales and fits a ClipSequence equally to a common resolution.
-        Helper/wrapper function using transform()
-        :param width:
-        :param height:
+        Clips already in that resolution stay untouched.
+        :param width: Target width. Default: From the master or the cheapest to reach by scaling.
+        :param height: Target height
         :param from_master: Use width and height from a containing master clip.
         :param keep_aspect: Keep aspect ratio of clips. Add black bars.
-        :param center:
-        :param custom:
-        :return:
+        :param center: Center clips between the bars
+        :param custom: Own scale filter for all clips not in the target resolution
+        :return: New ClipSequence
         """
+        from scriptycut.conform import FormatPlan, VideoTarget, AudioTarget
+        from scriptycut.transform import Scale
 
-        if from_master:
-            if ClipFlags.ContainsMasterClip not in self.flags:
-                raise RuntimeError("from_master requires one subclip clip to be flagged as master.")
+        if from_master and ClipFlags.ContainsMasterClip not in self.flags:
+            raise RuntimeError("from_master requires one subclip clip to be flagged as master.")
 
-            master_clips = tuple(c for c in self.iter_sequenced_clips() if ClipFlags.IsMasterClip)
-            if not master_clips:
-                raise RuntimeError("No master clip found.")
+        video = VideoTarget((width, height)) if width and height else None
+        # Audio stays as it is
+        plan = FormatPlan(self._clips, from_master, video, AudioTarget(), keep_aspect, center)
+        if plan.video is None:
+            raise ValueError("No clip with a known resolution. Specify width and height.")
+        resolution = plan.video.resolution
 
+        def scale(c: Clip) -> Clip:
+            if not c.has_video or c.video_resolution == resolution:
+                return c
+            if custom:
+                return Scale(c, custom=custom)
+            return Scale(c, *resolution, keep_aspect=keep_aspect, center=center)
 
-        from scriptycut.transform import Scale
+        return ClipSequence(plan.apply(scale), auto_flatten=False)
+
+    def match_formats(self, from_master=True, width: int = None, height: int = None, fps: Union[int, str] = None,
+                      pix_fmt: str = None, sample_rate: int = None, channel_layout: str = None,
+                      keep_aspect=True, center=True) -> "ClipSequence":
+        """
+        Converts all clips to a common format with the fewest conversions. See scriptycut.conform.FormatPlan.
+        Unspecified properties are taken from the master clip or chosen by the lowest conversion cost.
+        Clips already in the target format stay untouched.
+        :return: New ClipSequence
+        """
+        from scriptycut.conform import FormatPlan, VideoTarget, AudioTarget
 
-        scaled_clips = []
-        for c in self.iter_sequenced_clips():
-            if not c.has_video:
-                # No video to scale
-                scaled_clips.append(c)
+        video = audio = None
+        if width and height:
+            video = VideoTarget((width, height), None if fps is None else FPS(fps), pix_fmt)
+        if sample_rate or channel_layout:
+            audio = AudioTarget(sample_rate, channel_layout)
 
-        return ClipSequence(scaled_clips, auto_flatten=False)
+        plan = FormatPlan(self._clips, from_master, video, audio, keep_aspect, center)
+        return ClipSequence(plan.apply(), auto_flatten=False)
 
     def iter_sequenced_clips(self) -> Generator[Clip, None, None]:
         """Just resolve sequences in play order. May return the same clip multiple times."""
@@ -420,6 +759,41 @@ class RepeatClip(ClipSequence):
     def count(self) -> int:
         return self._count
 
+    @functools.cached_property
+    def _loop_source(self) -> Clip:
+        """
+        The clip whose cache gets looped in copy mode: The clip itself, the encoded GOP of a still clip,
+        or one pass of an input clip rendered into the cache. Nothing gets encoded more than once.
+        """
+        if self._clip.CACHING is not Caching.NEVER:
+            return self._clip
+        if self._clip.is_still and self._clip.video_fps is not None:
+            from scriptycut.still import StillFrames
+            return StillFrames(self._clip)
+        return CachedInput(self._clip)
+
+    @property
+    def subclips(self) -> tuple[Clip, ...]:
+        return self._loop_source,
+
+    def _looped_input(self) -> FFargInput:
+        from scriptycut.still import StillFrames
+
+        source = self._loop_source
+        if isinstance(source, StillFrames):
+            # Encoded GOP of a still clip
+            return source.loop_input_args(self.duration)
+        return source.input_args().with_options(("-stream_loop", self._count - 1))
+
+    def ffmpeg_args(self) -> FFArgsInterface:
+        # The cache is rendered once and repeated by the demuxer
+        inp = self._looped_input()
+        return inp, FFargFilter(None, inp.video_spec(0), inp.audio_spec(0))
+
+    def cache_output_args(self) -> FFargOutput:
+        # Looped packets of a cache file are in the cache format already
+        return FFargOutput(self.cache_part_file, ("-c", "copy"))
+
     def iter_all_clips(self) -> Generator[Clip, None, None]:
         """Iter over all subclips of the repeated clip once."""
         yield from self._clip.iter_all_clips()  # Yields self._clip already
@@ -433,10 +807,15 @@ class Libavfilter(InputClip):
     """
     Create clips by ffmpeg's lavfi device
     https://ffmpeg.org/ffmpeg-devices.html#Examples-5
+    The filtergraph generates either video or audio (layer).
     """
-    def __init__(self, filtergraph: str, duration: float):
+    def __init__(self, filtergraph: str, duration: float, layer: Layer = Layer.V):
+        if layer not in (Layer.V, Layer.A):
+            raise ValueError("A lavfi filtergraph generates either video or audio.")
+
         self._filtergraph = filtergraph
         self._duration = duration
+        self._layer = layer
 
         InputClip.__init__(self)
 
@@ -448,5 +827,14 @@ class Libavfilter(InputClip):
     def filtergraph(self):
         return self._filtergraph
 
+    @property
+    def flags(self) -> set[ClipFlags]:
+        return {ClipFlags.HasVideo} if self._layer is Layer.V else {ClipFlags.HasAudio}
+
+    def input_args(self) -> FFargInput:
+        if self._layer is Layer.V:
+            return FFargInput(self._filtergraph, ("-f", "lavfi", "-t", self._duration), video="v:0", audio=None)
+        return FFargInput(self._filtergraph, ("-f", "lavfi", "-t", self._duration), video=None, audio="a:0")
+
     def _repr_data(self) -> str:
-        return f"{self._duration}"
+        return f"{self._filtergraph}:{self._duration}"
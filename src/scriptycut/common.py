@@ -3,7 +3,7 @@
 from typing import Union, Optional
 from pathlib import Path
 from sys import platform
-from enum import IntFlag, auto
+from enum import Enum, IntFlag, auto
 from os import environ
 
 
@@ -34,6 +34,13 @@ class Layer(IntFlag):
     AV = A + V
 
 
+class Caching(Enum):
+    """Whether the render planner gives a Clip its own ffmpeg process and cache file"""
+    AUTO = auto()  # Decided by the cost model: Cheap nodes run within the process of the next Clip
+    ALWAYS = auto()
+    NEVER = auto()  # Read directly as input, like source files
+
+
 class FPS:
     """
     Representation of a framerate (fps).
@@ -83,7 +90,18 @@ class FPS:
         return self._denominator
 
     def __eq__(self, other):
-        pass
+        if not isinstance(other, FPS):
+            return NotImplemented
+        return self._numerator * other._denominator == other._numerator * self._denominator
+
+    def __hash__(self):
+        return hash(self._as_float)
+
+    def __str__(self):
+        return f"{self._numerator}/{self._denominator}"
+
+    def __repr__(self):
+        return f"FPS({self})"
 
 
 class ClipClassMeta:
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+"""
+Format normalization of the clips of a sequence.
+The target format is the one of the master clip, or the one which is cheapest to reach.
+Only the properties which differ get converted. Conforming clips stay untouched,
+so they can be read (and later stream copied) without conversion.
+
+Costs are estimated as work on decoded data: pixels * frames for video, samples * channels for audio.
+A conversion re-processes the whole clip, so its cost is the size of its output.
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Callable, Iterable
+
+from scriptycut.clip import Clip
+from scriptycut.clipflags import ClipFlags
+from scriptycut.common import FPS
+from scriptycut.ffinterface import FFArgsInterface, FFargFilter
+
+
+@dataclass(frozen=True)
+class VideoTarget:
+    resolution: tuple[int, int]
+    fps: Optional[FPS] = None
+    pix_fmt: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class AudioTarget:
+    sample_rate: Optional[int] = None
+    channel_layout: Optional[str] = None
+
+
+def video_target_of(clip: Clip) -> Optional[VideoTarget]:
+    """Known video properties of a clip. None without video or unknown resolution."""
+    if not clip.has_video or clip.video_resolution is None:
+        return None
+    fmt = clip.video_format
+    return VideoTarget(tuple(clip.video_resolution), clip.video_fps, fmt.pix_fmt if fmt else None)
+
+
+def audio_target_of(clip: Clip) -> Optional[AudioTarget]:
+    """Known audio properties of a clip. None without audio."""
+    if not clip.has_audio:
+        return None
+    fmt = clip.audio_format
+    if fmt is None:
+        return AudioTarget()
+    return AudioTarget(int(fmt.sample_rate) if fmt.sample_rate else None, fmt.channel_layout)
+
+
+def _differs(value, target) -> bool:
+    # Unknown properties are left as they are
+    return target is not None and value is not None and value != target
+
+
+def video_changes(clip: Clip, target: VideoTarget) -> dict[str, object]:
+    """Video properties of clip which need a conversion to reach target"""
+    if not clip.has_video:
+        return {}
+    have = video_target_of(clip)
+    changes = {}
+    if have is None or have.resolution != target.resolution:
+        # Unknown resolutions get scaled, since concat requires the same size
+        changes["resolution"] = target.resolution
+    if have is not None:
+        if _differs(have.fps, target.fps):
+            changes["fps"] = target.fps
+        if _differs(have.pix_fmt, target.pix_fmt):
+            changes["pix_fmt"] = target.pix_fmt
+    return changes
+
+
+def audio_changes(clip: Clip, target: AudioTarget) -> dict[str, object]:
+    """Audio properties of clip which need a conversion to reach target"""
+    have = audio_target_of(clip)
+    if have is None:
+        return {}
+    changes = {}
+    if _differs(have.sample_rate, target.sample_rate):
+        changes["sample_rate"] = target.sample_rate
+    if _differs(have.channel_layout, target.channel_layout):
+        changes["channel_layout"] = target.channel_layout
+    return changes
+
+
+def video_cost(clip: Clip, target: VideoTarget) -> float:
+    """Pixels * frames to convert clip into target. 0 if it conforms."""
+    if not video_changes(clip, target):
+        return 0.
+    fps = target.fps or clip.video_fps or FPS(24)
+    w, h = target.resolution
+    return clip.duration * fps.as_float * w * h
+
+
+def audio_cost(clip: Clip, target: AudioTarget) -> float:
+    """Samples * channels to convert clip into target. 0 if it conforms."""
+    if not audio_changes(clip, target):
+        return 0.
+    have = audio_target_of(clip)
+    rate = target.sample_rate or have.sample_rate or 48000
+    return clip.duration * rate * 2  # Channels after conversion are rarely known. Stereo.
+
+
+def leaves(clip: Clip) -> Iterable[Clip]:
+    """Clips with their own format: Trims and crossfades are looked through"""
+    from scriptycut.crossfade import Crossfade
+    from scriptycut.slice import Trim
+
+    if isinstance(clip, Trim):
+        yield from leaves(clip.clip)
+    elif isinstance(clip, Crossfade) and not clip.is_template:
+        yield from leaves(clip.clip1)
+        yield from leaves(clip.clip2)
+    else:
+        yield clip
+
+
+def rebuild(clip: Clip, convert: Callable[[Clip], Clip]) -> Clip:
+    """The same structure of trims and crossfades with converted leaves"""
+    from scriptycut.crossfade import Crossfade
+    from scriptycut.slice import Trim
+
+    if isinstance(clip, Trim):
+        return Trim(rebuild(clip.clip, convert), clip.start, clip.end)
+    if isinstance(clip, Crossfade) and not clip.is_template:
+        return clip.with_clips(rebuild(clip.clip1, convert), rebuild(clip.clip2, convert))
+    return convert(clip)
+
+
+def cheapest_target(candidates: Iterable, clips: tuple[Clip, ...], cost: Callable[[Clip, object], float]):
+    """The candidate with the lowest total conversion cost. The first one on equal costs."""
+    best = best_cost = None
+    for candidate in dict.fromkeys(candidates):
+        total = sum(cost(c, candidate) for c in clips)
+        if best_cost is None or total < best_cost:
+            best, best_cost = candidate, total
+    return best
+
+
+class FormatPlan:
+    """
+    Target formats of a sequence and the conversions to reach them.
+    """
+
+    def __init__(self, clips: Iterable[Clip], from_master=True, video: Optional[VideoTarget] = None,
+                 audio: Optional[AudioTarget] = None, keep_aspect=True, center=True):
+        """
+        :param clips: Clips of the sequence
+        :param from_master: Target the format of the master clip if there is one
+        :param video: Target video format. Default: master or cheapest.
+        :param audio: Target audio format. Default: master or cheapest.
+        :param keep_aspect: Fit clips into the resolution with black bars
+        :param center: Center fitted clips
+        """
+        self.clips = tuple(clips)
+        self.leaves = tuple(dict.fromkeys(leaf for c in self.clips for leaf in leaves(c)))
+        self.keep_aspect = keep_aspect
+        self.center = center
+
+        master = None
+        if from_master:
+            master = next((c for c in self.leaves if ClipFlags.IsMasterClip in c.flags), None)
+
+        if video is None:
+            candidates = [video_target_of(master)] if master is not None and master.has_video else []
+            candidates += [video_target_of(c) for c in self.leaves]
+            candidates = [t for t in candidates if t is not None]
+            video = candidates[0] if master is not None and candidates else \
+                cheapest_target(candidates, self.leaves, video_cost)
+
+        if audio is None:
+            candidates = [audio_target_of(master)] if master is not None and master.has_audio else []
+            candidates += [audio_target_of(c) for c in self.leaves]
+            candidates = [t for t in candidates if t is not None]
+            audio = candidates[0] if master is not None and candidates else \
+                cheapest_target(candidates, self.leaves, audio_cost)
+
+        self.video = video
+        self.audio = audio
+
+    @property
+    def cost(self) -> float:
+        """Estimated work of all conversions"""
+        return sum((video_cost(c, self.video) if self.video else 0.) +
+                   (audio_cost(c, self.audio) if self.audio else 0.)
+                   for c in self.leaves)
+
+    def changes(self, clip: Clip) -> dict[str, object]:
+        """Properties of a leaf which get converted"""
+        changes = video_changes(clip, self.video) if self.video else {}
+        if self.audio:
+            changes.update(audio_changes(clip, self.audio))
+        return changes
+
+    def convert(self, clip: Clip) -> Clip:
+        """A leaf in the target format. The leaf itself if it conforms."""
+        changes = self.changes(clip)
+        if not changes:
+            return clip
+
+        if set(changes) == {"resolution"}:
+            from scriptycut.transform import Scale
+            return Scale(clip, *changes["resolution"], keep_aspect=self.keep_aspect, center=self.center)
+        return Conform(clip, keep_aspect=self.keep_aspect, center=self.center, **changes)
+
+    def apply(self, convert: Callable[[Clip], Clip] = None) -> tuple[Clip, ...]:
+        """
+        Clips of the sequence with converted leaves
+        :param convert: Own conversion of a leaf instead of convert()
+        """
+        convert = convert or self.convert
+        converted = {}
+
+        def convert_once(leaf: Clip) -> Clip:
+            # Repeated leaves share one converted clip
+            if leaf not in converted:
+                converted[leaf] = convert(leaf)
+            return converted[leaf]
+
+        return tuple(rebuild(c, convert_once) for c in self.clips)
+
+
+class Conform(Clip):
+    """
+    Converts only the given properties of a clip in one pass: resolution, frame rate, pixel format,
+    sample rate, channel layout. Other properties stay as they are.
+    """
+
+    def __init__(self, clip: Clip, resolution: tuple[int, int] = None, fps: FPS = None, pix_fmt: str = None,
+                 sample_rate: int = None, channel_layout: str = None, keep_aspect=True, center=True):
+        self._clip = clip
+        self._resolution = tuple(resolution) if resolution else None
+        self._fps = fps
+        self._pix_fmt = pix_fmt
+        self._sample_rate = sample_rate
+        self._channel_layout = channel_layout
+        self._keep_aspect = keep_aspect
+        self._center = center
+
+        Clip.__init__(self)
+        self._video_fps = fps or clip.video_fps
+
+    @property
+    def clip(self) -> Clip:
+        return self._clip
+
+    @property
+    def subclips(self) -> tuple[Clip, ...]:
+        return self._clip,
+
+    @property
+    def flags(self) -> set[ClipFlags]:
+        return self._clip.flags
+
+    @property
+    def duration(self) -> float:
+        return self._clip.duration
+
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        return self._resolution or self._clip.video_resolution
+
+    def _video_filters(self) -> list[str]:
+        from scriptycut.transform import _scale_filter
+
+        filters = []
+        if self._resolution:
+            filters.append(_scale_filter(*self._resolution, self._keep_aspect, self._center))
+        if self._fps:
+            filters.append(f"fps={self._fps}")
+        if self._pix_fmt:
+            filters.append(f"format={self._pix_fmt}")
+        return filters
+
+    def _audio_filters(self) -> list[str]:
+        filters = []
+        if self._sample_rate:
+            filters.append(f"aresample={self._sample_rate}")
+        if self._channel_layout:
+            filters.append(f"aformat=channel_layouts={self._channel_layout}")
+        return filters
+
+    def ffmpeg_args(self) -> FFArgsInterface:
+        inp = self._clip.input_args()
+        graph = []
+        video, audio = inp.video_spec(0), inp.audio_spec(0)
+        if video and (filters := self._video_filters()):
+            graph.append(f"[{video}]{','.join(filters)}[v]")
+            video = "[v]"
+        if audio and (filters := self._audio_filters()):
+            graph.append(f"[{audio}]{','.join(filters)}[a]")
+            audio = "[a]"
+        return inp, FFargFilter(";".join(graph) or None, video, audio)
+
+    def _repr_data(self) -> str:
+        return (f"{self._clip}→{self._resolution}:{self._fps}:{self._pix_fmt}:{self._sample_rate}:"
+                f"{self._channel_layout}:{int(self._keep_aspect)}{int(self._center)}")
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cost model of the render planner.
+Costs are relative units of work on decoded data: pixels * frames for video, weighted samples for audio,
+times a factor of the codec or the processing. One unit is about decoding one H.264 pixel.
+Codecs are taken from the VideoFormat and AudioFormat of the clips. Processed clips are read from their caches.
+
+The planner caches a node if reading its cache on later renders saves more than writing it costs.
+Cheaper nodes run within the ffmpeg process of the next node.
+"""
+
+from pathlib import Path
+from typing import Optional
+
+from scriptycut.clip import Clip, InputClip
+from scriptycut.common import Layer, Pathlike
+from scriptycut.ffinterface import ArgumentTypes, unpack_args
+
+CACHE_VIDEO_CODEC = "ffv1"
+CACHE_AUDIO_CODEC = "flac"
+
+# Decoding work per pixel or sample
+DECODE_FACTORS = {
+    "rawvideo": .05,
+    "pcm_s16le": .05,
+    "pcm_f32le": .05,
+    "mjpeg": .5,
+    "png": .8,
+    "ffv1": .6,
+    "prores": .6,
+    "dnxhd": .6,
+    "mpeg2video": .6,
+    "mpeg4": .7,
+    "h264": 1.,
+    "vp8": 1.,
+    "hevc": 1.5,
+    "vp9": 1.5,
+    "av1": 2.,
+    "flac": .5,
+    "mp3": .8,
+    "aac": 1.,
+    "opus": 1.,
+    "vorbis": 1.,
+}
+
+# Encoding work per pixel or sample with default settings
+ENCODE_FACTORS = {
+    "rawvideo": .05,
+    "pcm_s16le": .05,
+    "pcm_f32le": .05,
+    "mjpeg": 2.,
+    "png": 4.,
+    "ffv1": 1.5,
+    "prores": 3.,
+    "dnxhd": 3.,
+    "mpeg2video": 3.,
+    "mpeg4": 3.,
+    "h264": 8.,
+    "vp8": 12.,
+    "hevc": 25.,
+    "vp9": 20.,
+    "av1": 40.,
+    "flac": 2.,
+    "mp3": 3.,
+    "aac": 3.,
+    "opus": 3.,
+    "vorbis": 3.,
+}
+
+# Encoder names and their codecs
+ENCODERS = {
+    "libx264": "h264",
+    "libx264rgb": "h264",
+    "libopenh264": "h264",
+    "h264_nvenc": "h264",
+    "libx265": "hevc",
+    "hevc_nvenc": "hevc",
+    "libvpx": "vp8",
+    "libvpx-vp9": "vp9",
+    "libaom-av1": "av1",
+    "libsvtav1": "av1",
+    "librav1e": "av1",
+    "libmp3lame": "mp3",
+    "libopus": "opus",
+    "libvorbis": "vorbis",
+    "libfdk_aac": "aac",
+}
+
+# ffmpeg's default codecs by output extension (video, audio)
+DEFAULT_CODECS = {
+    ".mp4": ("h264", "aac"),
+    ".mov": ("h264", "aac"),
+    ".mkv": ("h264", "vorbis"),
+    ".webm": ("vp9", "opus"),
+    ".avi": ("mpeg4", "mp3"),
+    ".wav": (None, "pcm_s16le"),
+    ".flac": (None, "flac"),
+    ".mp3": (None, "mp3"),
+    ".m4a": (None, "aac"),
+    ".ogg": (None, "vorbis"),
+    ".opus": (None, "opus"),
+}
+
+UNKNOWN_CODEC_FACTOR = 1.
+GENERATE_FACTOR = .1  # Generated sources like lavfi graphs and still images
+FILTER_FACTOR = .2  # Processing of a node's filter graph per output pixel or sample
+AUDIO_SAMPLE_WEIGHT = 10.  # A sample costs about as much as 10 pixels
+AUDIO_SAMPLE_RATE = 48000
+AUDIO_CHANNELS = 2
+
+# Expected later renders reading a cache. Caches pay off on re-renders only.
+RERENDERS = 2
+
+
+def video_units(clip: Clip) -> float:
+    """Pixels * frames of the video of a clip"""
+    if not clip.has_video:
+        return 0.
+    width, height = clip.video_resolution or (1920, 1080)
+    fps = clip.video_fps or clip._fps_hint
+    return clip.duration * fps.as_float * width * height
+
+
+def audio_units(clip: Clip) -> float:
+    """Weighted samples * channels of the audio of a clip"""
+    if not clip.has_audio:
+        return 0.
+    fmt = clip.audio_format
+    rate = float(fmt.sample_rate) if fmt is not None and fmt.sample_rate else AUDIO_SAMPLE_RATE
+    channels = fmt.channels if fmt is not None and fmt.channels else AUDIO_CHANNELS
+    return clip.duration * rate * channels * AUDIO_SAMPLE_WEIGHT
+
+
+def units(clip: Clip, layers: Layer) -> dict[Layer, float]:
+    """Amount of data of the layers of a clip"""
+    result = {}
+    if Layer.V in layers:
+        result[Layer.V] = video_units(clip)
+    if Layer.A in layers:
+        result[Layer.A] = audio_units(clip)
+    return result
+
+
+def cache_codec(layer: Layer) -> str:
+    return CACHE_VIDEO_CODEC if layer is Layer.V else CACHE_AUDIO_CODEC
+
+
+def codec_of(clip: Clip, layer: Layer) -> Optional[str]:
+    """
+    Codec decoded when reading a layer of clip: The one of its source, the cache codec for processed clips.
+    None for generated sources.
+    """
+    fmt = clip.video_format if layer is Layer.V else clip.audio_format
+    if fmt is not None:
+        return fmt.codec_name
+    if not isinstance(clip, InputClip):
+        return cache_codec(layer)
+    for sub in clip.subclips:
+        # Input clips reading another clip, like a Trim
+        return codec_of(sub, layer)
+    return None
+
+
+def decode_cost(clip: Clip, layers: Layer, from_cache=False) -> float:
+    """
+    Cost of reading the layers of a clip
+    :param from_cache: Read the cache file instead of the clip's input
+    """
+    cost = 0.
+    for layer, amount in units(clip, layers).items():
+        name = cache_codec(layer) if from_cache else codec_of(clip, layer)
+        cost += amount * (GENERATE_FACTOR if name is None else DECODE_FACTORS.get(name, UNKNOWN_CODEC_FACTOR))
+    return cost
+
+
+def encode_cost(clip: Clip, layers: Layer, video_codec: Optional[str], audio_codec: Optional[str]) -> float:
+    """Cost of encoding the layers of a clip. A codec of "copy" costs nothing."""
+    cost = 0.
+    for layer, amount in units(clip, layers).items():
+        name = video_codec if layer is Layer.V else audio_codec
+        if name != "copy":
+            cost += amount * ENCODE_FACTORS.get(name, UNKNOWN_CODEC_FACTOR)
+    return cost
+
+
+def filter_cost(clip: Clip, layers: Layer) -> float:
+    """Cost of a node's own processing"""
+    return sum(units(clip, layers).values()) * FILTER_FACTOR
+
+
+def cache_write_cost(clip: Clip, layers: Layer) -> float:
+    return encode_cost(clip, layers, CACHE_VIDEO_CODEC, CACHE_AUDIO_CODEC)
+
+
+def cache_read_cost(clip: Clip, layers: Layer) -> float:
+    return decode_cost(clip, layers, from_cache=True)
+
+
+def worth_caching(clip: Clip, layers: Layer, rebuild_cost: float) -> bool:
+    """
+    Whether a cache of clip saves more work on RERENDERS later renders than writing it costs.
+    :param rebuild_cost: Cost of processing the clip with everything not cached below it
+    """
+    read = cache_read_cost(clip, layers)
+    return RERENDERS * (rebuild_cost - read) > cache_write_cost(clip, layers) + read
+
+
+def output_codecs(output_file: Optional[Pathlike], output_args: ArgumentTypes = None) -> tuple[Optional[str], Optional[str]]:
+    """Codecs (video, audio) of an output: From encoder arguments or ffmpeg's default for the extension"""
+    suffix = Path(output_file).suffix.lower() if output_file is not None else ""
+    video, audio = DEFAULT_CODECS.get(suffix, ("h264", "aac"))
+    args = tuple(unpack_args(output_args))
+    for option, value in zip(args, args[1:]):
+        codec = ENCODERS.get(value, value)
+        if option in ("-c", "-codec"):
+            video = audio = codec
+        elif option in ("-c:v", "-codec:v", "-vcodec"):
+            video = codec
+        elif option in ("-c:a", "-codec:a", "-acodec"):
+            audio = codec
+    return video, audio
@@ -1,18 +1,30 @@
 # -*- coding: utf-8 -*-
 
+import functools
 from typing import Optional
 
 from scriptycut.clip import Clip
 from scriptycut.common import Layer
+from scriptycut.clipflags import ClipFlags
+from scriptycut.ffinterface import FFArgsInterface, FFargFilter
 
 
 class Crossfade(Clip):
     """
     Creates a crossfade of by specific duration. Does not include the non crossfading parts of the source clips.
-    Clips can be added later. Especially for use in ClipSequences.
+    Clips can be added later. Especially for use in ClipSequences: clip1 + Crossfade(1) + clip2
+    The sequence then reads the untouched parts of the clips by seeking. Only the overlap gets rendered.
+    Into H.264 outputs the untouched parts get copied from keyframe to keyframe. See scriptycut.streamcopy.
     """
     # TODO crossfade to images/colors support here?
-    def __init__(self, duration: float, options, layer=Layer.AV, clip1: Clip = None, clip2: Clip = None):
+    def __init__(self, duration: float, options: str = "fade", layer=Layer.AV, clip1: Clip = None, clip2: Clip = None):
+        """
+        :param duration: Duration of the overlap in seconds
+        :param options: Video transition of the xfade filter (fade, wipeleft, dissolve, ...)
+        :param layer: Which streams are crossfaded. Other streams cut to clip2 at the start of the overlap.
+        :param clip1: Clip fading out at its end
+        :param clip2: Clip fading in at its start
+        """
         if (clip1 is None) != (clip2 is None):
             raise RuntimeError("Specify either both clips at the same time or None of them to use a Crossfade as template.")
 
@@ -63,5 +75,72 @@ class Crossfade(Clip):
     def layer(self) -> Layer:
         return self._layer
 
+    @property
+    def is_template(self) -> bool:
+        return self._clip1 is None
+
+    @functools.cached_property
+    def _overlap(self) -> tuple[Clip, ...]:
+        """The overlapping parts of both clips"""
+        if self.is_template:
+            return ()
+
+        from scriptycut.slice import Trim
+
+        d = self._duration
+        return Trim(self._clip1, self._clip1.duration - d, self._clip1.duration), Trim(self._clip2, 0, d)
+
+    @property
+    def subclips(self) -> tuple[Clip, ...]:
+        # Only the overlapping parts are read. Input seeking skips decoding the rest.
+        return self._overlap
+
+    @property
+    def flags(self) -> set[ClipFlags]:
+        if self.is_template:
+            return set()
+        return ClipFlags.merge_from_clips(self._clip1, self._clip2)
+
+    @property
+    def video_fps(self):
+        return None if self.is_template else self._clip1.video_fps
+
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        return None if self.is_template else self._clip1.video_resolution
+
+    def ffmpeg_args(self) -> FFArgsInterface:
+        if self.is_template:
+            raise RuntimeError("A Crossfade template can't be rendered without clips.")
+
+        d = self._duration
+        in1, in2 = (c.input_args() for c in self._overlap)
+        graph = []
+        video = audio = None
+
+        if self.has_video:
+            if Layer.V in self._layer and in1.video and in2.video:
+                graph += [f"[{in1.video_spec(0)}]setpts=PTS-STARTPTS,settb=AVTB[v1]",
+                          f"[{in2.video_spec(1)}]setpts=PTS-STARTPTS,settb=AVTB[v2]",
+                          f"[v1][v2]xfade=transition={self._options}:duration={d}:offset=0[v]"]
+            elif in2.video:
+                graph.append(f"[{in2.video_spec(1)}]setpts=PTS-STARTPTS[v]")
+            else:
+                graph.append(f"[{in1.video_spec(0)}]setpts=PTS-STARTPTS[v]")
+            video = "[v]"
+
+        if self.has_audio:
+            if Layer.A in self._layer and in1.audio and in2.audio:
+                graph += [f"[{in1.audio_spec(0)}]asetpts=PTS-STARTPTS[a1]",
+                          f"[{in2.audio_spec(1)}]asetpts=PTS-STARTPTS[a2]",
+                          f"[a1][a2]acrossfade=d={d}[a]"]
+            elif in2.audio:
+                graph.append(f"[{in2.audio_spec(1)}]asetpts=PTS-STARTPTS[a]")
+            else:
+                graph.append(f"[{in1.audio_spec(0)}]asetpts=PTS-STARTPTS[a]")
+            audio = "[a]"
+
+        return in1, in2, FFargFilter(";".join(graph), video, audio)
+
     def _repr_data(self) -> str:
         return f"{self._duration}s:{self._options}:{self._clip1!r}->{self._clip2!r}@{self._layer.name}"
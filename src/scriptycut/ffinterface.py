@@ -1,8 +1,15 @@
 # -*- coding: utf-8 -*-
 
-from typing import Optional, Iterable, Union, Generator, Iterator, Any
+"""
+Building blocks of ffmpeg command lines.
+Clips describe their processing by FFArgs instances which get composed into full commands on rendering.
+"""
+
+import re
+from typing import Optional, Iterable, Union, Generator
 from pathlib import Path
-from types import GeneratorType
+
+from scriptycut.common import Layer
 
 PathLike = Union[str, bytes, Path]
 SupportedTypes = PathLike | int | float | str
@@ -23,16 +30,16 @@ def unpack_args(arg: ArgumentTypes) -> Generator[str, None, None]:
     elif arg is not None:
         yield str(arg)
 
-class ClioIOCache:
-
-
 
 class FFArgs:
     def __init__(self, args: ArgumentTypes):
         self._args = tuple(unpack_args(args))
 
     def args(self) -> tuple[str, ...]:
-        return self._argsv
+        return self._args
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}:{' '.join(self._args)}>"
 
 
 class GeneralArgs(FFArgs):
@@ -42,18 +49,270 @@ class GeneralArgs(FFArgs):
 
 
 class FFargInput(FFArgs):
-    def __init__(self, input_file: PathLike, input_args: ArgumentTypes = None):
-        FFArgs.__init__(self, tuple(unpack_args(input_args)) + ("-i", input_file))
+    """
+    A single input of an ffmpeg command.
+    video and audio are the stream specifiers within the input which represent the Clip.
+    None if the stream is not present.
+    """
+
+    def __init__(self, input_file: PathLike, input_args: ArgumentTypes = None,
+                 video: Optional[str] = "v:0", audio: Optional[str] = "a:0"):
+        self._input_file = input_file
+        self._video = video
+        self._audio = audio
+        FFArgs.__init__(self, tuple(unpack_args(input_args)) + ("-i", str(input_file)))
+
+    @property
+    def input_file(self) -> PathLike:
+        return self._input_file
+
+    @property
+    def video(self) -> Optional[str]:
+        return self._video
+
+    @property
+    def audio(self) -> Optional[str]:
+        return self._audio
+
+    def with_options(self, input_args: ArgumentTypes) -> "FFargInput":
+        """Same input with additional input options like seeking or looping in front"""
+        return FFargInput(self._input_file, (*unpack_args(input_args), *self._args[:-2]), self._video, self._audio)
+
+    def video_spec(self, index: int) -> Optional[str]:
+        """Stream specifier for -map or filter graphs (as "[spec]") if this input is the index-th input."""
+        return None if self._video is None else f"{index}:{self._video}"
+
+    def audio_spec(self, index: int) -> Optional[str]:
+        return None if self._audio is None else f"{index}:{self._audio}"
+
+
+class FFargFilter(FFArgs):
+    """
+    An optional filter_complex graph and the streams being mapped into the output.
+    video and audio are either labels of the graph outputs "[v]" or input stream specifiers "0:v:0".
+    """
+
+    def __init__(self, graph: Optional[str], video: Optional[str], audio: Optional[str]):
+        self._graph = graph
+        self._video = video
+        self._audio = audio
+
+        args = []
+        if graph:
+            args += ["-filter_complex", graph]
+        for stream in video, audio:
+            if stream:
+                args += ["-map", stream]
+
+        FFArgs.__init__(self, args)
+
+    @property
+    def graph(self) -> Optional[str]:
+        return self._graph
+
+    @property
+    def video(self) -> Optional[str]:
+        return self._video
+
+    @property
+    def audio(self) -> Optional[str]:
+        return self._audio
 
 
 class FFargOutput(FFArgs):
-    def __init__(self, output_file: PathLike, input_args: ArgumentTypes = None):
-        FFArgs.__init__(self, tuple(unpack_args(input_args)) + ("-i", input_file))
+    def __init__(self, output_file: PathLike, output_args: ArgumentTypes = None):
+        self._output_file = output_file
+        FFArgs.__init__(self, tuple(unpack_args(output_args)) + (str(output_file), ))
+
+    @property
+    def output_file(self) -> PathLike:
+        return self._output_file
 
 
 FFArgsInterface = Union[FFArgs, Iterable[FFArgs]]
 
 
-# data = [1, 2, ["a", "b"], 4, 5]
-# print(list(unpack_args(data)))
+def unpack_ffargs(ffargs: FFArgsInterface) -> Generator[FFArgs, None, None]:
+    if isinstance(ffargs, FFArgs):
+        yield ffargs
+    elif ffargs is not None:
+        for a in ffargs:
+            yield from unpack_ffargs(a)
+
+
+def compose(ffargs: FFArgsInterface) -> list[str]:
+    """
+    Composes FFArgs in the order ffmpeg expects them:
+    General arguments, inputs, filters and mappings, outputs.
+    """
+    order = GeneralArgs, FFargInput, FFargFilter, FFargOutput
+    all_args = tuple(unpack_ffargs(ffargs))
+    args = []
+    for cls in order:
+        for a in all_args:
+            if isinstance(a, cls):
+                args.extend(a.args())
+    return args
+
+
+def inputs_of(ffargs: FFArgsInterface) -> tuple[FFargInput, ...]:
+    return tuple(a for a in unpack_ffargs(ffargs) if isinstance(a, FFargInput))
+
+
+_LABEL_RUN = r"(?:\[[^\]]*\]\s*)*"
+_CHAIN_INPUTS = re.compile(rf"^\s*({_LABEL_RUN})")
+_CHAIN_OUTPUTS = re.compile(rf"({_LABEL_RUN})$")
+_LABEL = re.compile(r"\[([^\]]*)\]")
+_INPUT_STREAM = re.compile(r"^(\d+):([va])")
+
+
+def _input_stream(spec: str) -> Optional[tuple[int, Layer]]:
+    """Input index and layer of a stream specifier like "0:v:0" """
+    m = _INPUT_STREAM.match(spec)
+    if m is None:
+        return None
+    return int(m.group(1)), Layer.V if m.group(2) == "v" else Layer.A
+
+
+def _reindex(spec: str, new_index: dict[int, int]) -> str:
+    m = _INPUT_STREAM.match(spec)
+    return spec if m is None else f"{new_index[int(m.group(1))]}{spec[len(m.group(1)):]}"
+
+
+def prune_layers(ffargs: FFArgsInterface, layers: Layer) -> tuple[tuple[FFArgs, ...], tuple[tuple[FFargInput, Layer], ...]]:
+    """
+    Removes everything not needed for the layers: Mappings, filter chains and unused inputs.
+    Inputs read for one layer only get -vn or -an, so their other streams are not decoded.
+    Filter chains need to be separated by layer (no chain producing video and audio).
+    :return: Pruned FFArgs and the remaining inputs with the layers read from them
+    """
+    args = tuple(unpack_ffargs(ffargs))
+    inputs = [a for a in args if isinstance(a, FFargInput)]
+    mapping = next((a for a in args if isinstance(a, FFargFilter)), None)
+    if mapping is None:
+        raise ValueError("Missing mapping of streams.")
+
+    video = mapping.video if Layer.V in layers else None
+    audio = mapping.audio if Layer.A in layers else None
+    if video is None and audio is None:
+        raise ValueError(f"None of the layers {layers!r} is available.")
+
+    # Walk the graph backwards from the mapped outputs
+    used: dict[int, Layer] = {}
+    needed = set()
+    for stream in video, audio:
+        if stream is None:
+            continue
+        if stream.startswith("["):
+            needed.add(stream[1:-1])
+        elif (ref := _input_stream(stream)) is not None:
+            used[ref[0]] = used.get(ref[0], Layer.NONE) | ref[1]
+
+    chains = []
+    for chain in reversed(mapping.graph.split(";") if mapping.graph else ()):
+        ins = _LABEL.findall(_CHAIN_INPUTS.match(chain).group(1))
+        outs = _LABEL.findall(_CHAIN_OUTPUTS.search(chain).group(1))
+        if outs and not needed.intersection(outs):
+            continue
+
+        chains.insert(0, chain)
+        for label in ins:
+            if (ref := _input_stream(label)) is not None:
+                used[ref[0]] = used.get(ref[0], Layer.NONE) | ref[1]
+            else:
+                needed.add(label)
+
+    # Drop unused inputs and renumber the references
+    new_index = {old: new for new, old in enumerate(sorted(used))}
+    chains = [_LABEL.sub(lambda m: f"[{_reindex(m.group(1), new_index)}]", chain) for chain in chains]
+
+    pruned_inputs = []
+    for old in sorted(used):
+        inp = inputs[old]
+        layer = used[old]
+        if layer is Layer.A and inp.video:
+            inp = inp.with_options("-vn")
+        elif layer is Layer.V and inp.audio:
+            inp = inp.with_options("-an")
+        pruned_inputs.append((inp, layer))
+
+    pruned_mapping = FFargFilter(";".join(chains) or None,
+                                 None if video is None else _reindex(video, new_index),
+                                 None if audio is None else _reindex(audio, new_index))
+    others = tuple(a for a in args if not isinstance(a, (FFargInput, FFargFilter)))
+    return (*others, *(inp for inp, _ in pruned_inputs), pruned_mapping), tuple(pruned_inputs)
+
+
+def fuse_input(ffargs: FFArgsInterface, index: int, sub_ffargs: FFArgsInterface, prefix: str) -> tuple[FFArgs, ...]:
+    """
+    Replaces an input by the inputs and the filter graph producing it, so both run in one ffmpeg process.
+    Labels of the inserted graph get the prefix to stay unique. Streams used several times get split.
+    :param ffargs: Arguments reading the input
+    :param index: Index of the input. Its options (besides -vn, -an) are dropped.
+    :param sub_ffargs: Arguments producing the input
+    :return: Fused FFArgs
+    """
+    args = tuple(unpack_ffargs(ffargs))
+    inputs = [a for a in args if isinstance(a, FFargInput)]
+    mapping = next(a for a in args if isinstance(a, FFargFilter))
+    sub_args = tuple(unpack_ffargs(sub_ffargs))
+    sub_inputs = [a for a in sub_args if isinstance(a, FFargInput)]
+    sub_mapping = next(a for a in sub_args if isinstance(a, FFargFilter))
+
+    # Inputs behind the replaced one move by the number of inserted inputs
+    count = len(sub_inputs)
+    new_index = {i: i if i < index else i + count - 1 for i in range(len(inputs)) if i != index}
+    sub_index = {i: index + i for i in range(count)}
+
+    def sub_label(label: str) -> str:
+        return _reindex(label, sub_index) if _input_stream(label) is not None else prefix + label
+
+    chains = [_LABEL.sub(lambda m: f"[{sub_label(m.group(1))}]", chain)
+              for chain in (sub_mapping.graph.split(";") if sub_mapping.graph else ())]
+    outputs = {Layer.V: sub_mapping.video, Layer.A: sub_mapping.audio}
+    outputs = {layer: None if s is None else s[1:-1] if s.startswith("[") else s for layer, s in outputs.items()}
+    outputs = {layer: None if s is None else sub_label(s) for layer, s in outputs.items()}
+
+    # References to the replaced input
+    streams = [_LABEL.findall(mapping.graph or ""), [s[1:-1] if s.startswith("[") else s
+                                                     for s in (mapping.video, mapping.audio) if s]]
+    uses = {Layer.V: [], Layer.A: []}
+    for label in (label for labels in streams for label in labels):
+        ref = _input_stream(label)
+        if ref is not None and ref[0] == index:
+            if outputs[ref[1]] is None:
+                raise ValueError(f"Stream {label} is not produced by the fused arguments.")
+            uses[ref[1]].append(label)
+
+    # Labels can be read once. Input streams any number of times.
+    handed_out = {}
+    for layer, used in uses.items():
+        out = outputs[layer]
+        if len(used) > 1 and _input_stream(out) is None:
+            labels = [f"{out}_{i}" for i in range(len(used))]
+            split = "split" if layer is Layer.V else "asplit"
+            chains.append(f"[{out}]{split}={len(used)}" + "".join(f"[{label}]" for label in labels))
+            handed_out[layer] = iter(labels)
+        else:
+            handed_out[layer] = iter([out] * len(used))
+
+    def parent_label(label: str) -> str:
+        ref = _input_stream(label)
+        if ref is None:
+            return label
+        if ref[0] == index:
+            return next(handed_out[ref[1]])
+        return _reindex(label, new_index)
+
+    def parent_stream(stream: Optional[str]) -> Optional[str]:
+        if stream is None or stream.startswith("["):
+            return stream
+        label = parent_label(stream)
+        return label if _input_stream(label) is not None else f"[{label}]"
+
+    if mapping.graph:
+        chains += [_LABEL.sub(lambda m: f"[{parent_label(m.group(1))}]", chain) for chain in mapping.graph.split(";")]
 
+    fused_mapping = FFargFilter(";".join(chains) or None, parent_stream(mapping.video), parent_stream(mapping.audio))
+    others = tuple(a for a in (*args, *sub_args) if not isinstance(a, (FFargInput, FFargFilter)))
+    return (*others, *inputs[:index], *sub_inputs, *inputs[index + 1:], fused_mapping)
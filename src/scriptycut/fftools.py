@@ -5,27 +5,68 @@ Classes and functions to interface ffmpeg executables
 """
 
 import re
+import os
+import shutil
 from os import environ
-from subprocess import run, Popen, PIPE
-from typing import Optional
+from json import loads, dumps
+from pathlib import Path
+from hashlib import sha256
+from threading import RLock
+from subprocess import run, Popen, PIPE, CalledProcessError
+from typing import Optional, Callable
 from functools import cached_property
 
 from scriptycut.common import Pathlike
 from scriptycut.jobthreads import JobThread
+from scriptycut.ffinterface import FFArgsInterface, FFargOutput, compose
 
 
 FFMPEG_CMD_DEFAULT = environ.get("FFMPEG", "ffmpeg")
 FFPROBE_CMD_DEFAULT = environ.get("FFPROBE", "ffprobe")
 FFPLAY_CMD_DEFAULT = environ.get("FFPLAY", "ffplay")
 
+# Discovered capabilities (version, codecs, filters, pix_fmts) per binary survive across runs
+CAPABILITY_CACHE_PATH = Path(environ.get("SCRIPTYCUT_CAPABILITY_CACHE",
+                                         Path(environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+                                         / "scriptycut" / "fftools"))
+
 # Generic options: https://ffmpeg.org/ffmpeg.html#toc-Main-options
 
 # https://opensource.com/article/17/6/ffmpeg-convert-media-file-formats
 
 
+def _to_json(info):
+    """Sets and tuples of capability infos to JSON compatible lists"""
+    if isinstance(info, dict):
+        return {key: _to_json(value) for key, value in info.items()}
+    if isinstance(info, set):
+        return sorted(info)
+    if isinstance(info, tuple):
+        return list(info)
+    return info
+
+
+def _from_json(info):
+    """Reverse of _to_json: Lists of an info dict are sets, lists within dicts are tuples"""
+    if not isinstance(info, dict):
+        return info
+
+    restored = {}
+    for key, value in info.items():
+        if isinstance(value, list):
+            restored[key] = set(value)
+        elif isinstance(value, dict):
+            restored[key] = {k: tuple(v) if isinstance(v, list) else v for k, v in value.items()}
+        else:
+            restored[key] = value
+    return restored
+
+
 class FFtool:
     """
-    Access to FFmpeg and their tools
+    Access to FFmpeg and their tools.
+    Instances are process-wide singletons per class and command. Creating them does not start any process.
+    Capabilities get discovered on first access and are cached on disk by the binary's path, size and mtime.
     """
     GENERAL_ARGS = ("-hide_banner", )
     CODECS_ARGS = "-v", "error", "-codecs"
@@ -33,14 +74,86 @@ class FFtool:
     FILTER_ARGS = "-v", "error", "-filters"
     PIXFMT_ARGS = "-v", "error", "-pix_fmts"
 
+    DEFAULT_CMD: Optional[str] = None
+
+    _instances: dict[tuple[type, str], "FFtool"] = {}
+    _lock = RLock()
+
+    def __new__(cls, cmd: str = None):
+        key = cls, cmd or cls.DEFAULT_CMD
+        with FFtool._lock:
+            tool = FFtool._instances.get(key)
+            if tool is None:
+                tool = object.__new__(cls)
+                FFtool._instances[key] = tool
+        return tool
+
     def __init__(self, cmd: str):
         self.cmd = cmd
+
+    @cached_property
+    def binary_path(self) -> Optional[Path]:
+        found = shutil.which(self.cmd)
+        return None if found is None else Path(found).resolve()
+
+    @cached_property
+    def _capability_file(self) -> Optional[Path]:
+        path = self.binary_path
+        if path is None:
+            return None
+
+        stat_info = path.stat()
+        key = f"{path}:{stat_info.st_size}:{stat_info.st_mtime_ns}"
+        return CAPABILITY_CACHE_PATH / f"{path.name}_{sha256(key.encode()).digest().hex()[:32]}.json"
+
+    @cached_property
+    def _capabilities(self) -> dict:
+        file = self._capability_file
+        if file is None:
+            return {}
+
+        try:
+            return loads(file.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _capability(self, name: str, discover: Callable):
+        """Cached capability info. Runs discover() only if not known for this binary yet."""
+        with FFtool._lock:
+            caps = self._capabilities
+            if name not in caps:
+                caps[name] = _to_json(discover())
+                self._save_capabilities()
+
+            return _from_json(caps[name])
+
+    def _save_capabilities(self):
+        file = self._capability_file
+        if file is None:
+            return
+
+        try:
+            file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = file.with_suffix(f".{os.getpid()}.tmp")
+            tmp_file.write_text(dumps(self._capabilities))
+            os.replace(tmp_file, file)
+        except OSError:
+            pass  # Discovered again next time
+
+    @cached_property
+    def version(self) -> str:
+        return self._capability("version", self._discover_version)
+
+    def _discover_version(self) -> str:
         res = run((self.cmd, *self.GENERAL_ARGS, *self.VERSION_ARGS),
                   capture_output=True, timeout=5, text=True, check=True)
-        self.version = res.stdout
+        return res.stdout
 
     @cached_property
     def filters(self):
+        return self._capability("filters", self._discover_filters)
+
+    def _discover_filters(self):
         # " T.C acrusher          A->A       Reduce audio bit resolution.\n"
         regex = re.compile(r" (.{3}) ([^ ]+) +([AVN|]+)->([^ ]+) +(.*)\n")
         timeline_support = set()
@@ -104,6 +217,9 @@ class FFtool:
 
     @cached_property
     def pix_fmts(self):
+        return self._capability("pix_fmts", self._discover_pix_fmts)
+
+    def _discover_pix_fmts(self):
         # "IO... yuv422p                3             16      8-8-8\n"
         regex = re.compile(r"IO(.{3}) ([^ ]+) +([0-9]+) +([0-9]+) +(.*)\n")
 
@@ -136,6 +252,9 @@ class FFtool:
 
     @cached_property
     def codecs(self):
+        return self._capability("codecs", self._discover_codecs)
+
+    def _discover_codecs(self):
         # " DES... xsub                 XSUB\n"
         regex = re.compile(r" (.{6}) ([^ ]+) +(.*)\n")
 
@@ -206,6 +325,7 @@ class FFMPEG(FFtool):
 
     """
     FFMPEG_ARGS = "-nostdin", "-y"
+    DEFAULT_CMD = FFMPEG_CMD_DEFAULT
     # Progress https://stackoverflow.com/a/43980180/3149622
 
     def __init__(self, cmd=FFMPEG_CMD_DEFAULT):
@@ -214,12 +334,16 @@ class FFMPEG(FFtool):
     def run_threaded(self, cache_path: Pathlike, *args) -> JobThread:
         return JobThread([self.cmd, *self.GENERAL_ARGS, *self.FFMPEG_ARGS, *args], cwd=cache_path, autorun=True)
 
+    def command(self, ffargs: FFArgsInterface) -> list[str]:
+        """Full command line for composed FFArgs"""
+        return [self.cmd, *self.GENERAL_ARGS, *self.FFMPEG_ARGS, *compose(ffargs)]
+
     @staticmethod
     def testvideo_args(seconds=10, resolution=(1280, 720), fps=30) -> list[str]:
         return ["-f", "lavfi", "-i", f"testsrc=duration={seconds}:size={resolution[0]}x{resolution[1]}:rate={fps}"]
 
     @staticmethod
-    def cache_output_args(output_file: Pathlike, resolution: tuple[int, int] = None, fps: float = None, alpha: bool = None) -> list[str]:
+    def cache_output_args(output_file: Pathlike, resolution: tuple[int, int] = None, fps: float = None, alpha: bool = None) -> FFargOutput:
         """
         yuv420p yuva420p yuva422p yuv444p yuva444p yuv440p yuv422p yuv411p yuv410p bgr0 bgra yuv420p16le yuv422p16le
         yuv444p16le yuv444p9le yuv422p9le yuv420p9le yuv420p10le yuv422p10le yuv444p10le yuv420p12le yuv422p12le
@@ -227,11 +351,19 @@ class FFMPEG(FFtool):
         yuva422p9le yuva420p9le gray16le gray gbrp9le gbrp10le gbrp12le gbrp14le gbrap10le gbrap12le ya8 gray10le
         gray12le gbrp16le rgb48le gbrap16le rgba64le gray9le yuv420p14le yuv422p14le yuv444p14le yuv440p10le yuv440p12le
         """
-        return ["-vcodec", "ffv1"]
+        args = ["-vcodec", "ffv1", "-acodec", "flac"]
+        if resolution is not None:
+            args += ["-s", f"{resolution[0]}x{resolution[1]}"]
+        if fps is not None:
+            args += ["-r", str(fps)]
+        if alpha:
+            args += ["-pix_fmt", "yuva444p"]
+        return FFargOutput(output_file, args)
 
 
 class FFPROBE(FFtool):
     PROBE_ARGS = "-v", "error", "-print_format", "json", "-show_format", "-show_streams", "-show_data_hash", "CRC32"
+    DEFAULT_CMD = FFPROBE_CMD_DEFAULT
 
     def __init__(self, cmd=FFPROBE_CMD_DEFAULT):
         FFtool.__init__(self, cmd)
@@ -241,6 +373,34 @@ class FFPROBE(FFtool):
                   capture_output=True, timeout=10, text=True, check=raise_error)
         return res.stdout
 
+    def keyframe_times(self, file: Pathlike, stream: str = "v:0") -> list[float]:
+        """Times of the keyframes of a stream from packet flags. Nothing gets decoded."""
+        res = run((self.cmd, *self.GENERAL_ARGS, "-v", "error", "-select_streams", stream,
+                   "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", file),
+                  capture_output=True, text=True, check=True)
+        times = []
+        for line in res.stdout.splitlines():
+            pts_time, _, flags = line.partition(",")
+            if "K" in flags and pts_time not in ("", "N/A"):
+                times.append(float(pts_time))
+        return sorted(times)
+
+    async def probe_async(self, file: Pathlike, raise_error=True, timeout: float = 10) -> Optional[str]:
+        """Same as probe() as coroutine. Many files can be probed concurrently by asyncio.gather()."""
+        from scriptycut.asyncjobs import AsyncJob
+
+        chunks = []
+
+        async def read_stdout(reader):
+            chunks.append(await reader.read())
+
+        job = AsyncJob([self.cmd, *self.GENERAL_ARGS, *self.PROBE_ARGS, str(file)], timeout=timeout,
+                       read_stdout=read_stdout)
+        res = await job
+        if raise_error and res.returncode != 0:
+            raise CalledProcessError(res.returncode, job.cmd)
+        return b"".join(chunks).decode()
+
 
 class FFPLAY(FFtool):
     """
@@ -248,6 +408,7 @@ class FFPLAY(FFtool):
     """
 
     PLAY_ARGS = ("-autoexit", )
+    DEFAULT_CMD = FFPLAY_CMD_DEFAULT
 
     def __init__(self, cmd=FFPLAY_CMD_DEFAULT):
         FFtool.__init__(self, cmd)
@@ -1,19 +1,29 @@
 # -*- coding: utf-8 -*-
 
-from json import loads
+from json import loads, dumps
 from pathlib import Path
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 from functools import cached_property
 
 from scriptycut.clip import InputClip
-from scriptycut.common import Pathlike
+from scriptycut.common import Pathlike, FPS
 from scriptycut.formats import VideoFormat, AudioFormat
 from scriptycut.fftools import FFPROBE
 from scriptycut.ffinterface import FFargInput
 from scriptycut.clipflags import ClipFlags
 
+if TYPE_CHECKING:
+    import numpy as np
+    from scriptycut.analysis import AudioAnalysis
 
-ffprobe = FFPROBE()
+
+def fps_from_stream_info(stream: dict) -> Optional[FPS]:
+    """Frame rate of a probed video stream. None if unknown or variable."""
+    for key in "avg_frame_rate", "r_frame_rate":
+        rate = stream.get(key, "0/0")
+        if not rate.startswith("0") and not rate.endswith("/0"):
+            return FPS(rate)
+    return None
 
 
 class FileClip(InputClip):
@@ -39,7 +49,7 @@ class FileClip(InputClip):
 
         self._sourcefile = Path(sourcefile)
 
-        probe_res = ffprobe.probe(sourcefile, raise_error=False)  # File may be missing or not
+        probe_res = FFPROBE().probe(sourcefile, raise_error=False)  # File may be missing or not
         data = {} if probe_res is None else loads(probe_res)
 
         if self._sourcefile.is_file():
@@ -72,6 +82,9 @@ class FileClip(InputClip):
 
         InputClip.__init__(self)
 
+        if found_video:
+            self._video_fps = fps_from_stream_info(self._video_streams[video_streamindex])
+
         probe_info = self.cachedir / "probe.txt"
         probe_info.write_text(probe_res or "")
 
@@ -98,6 +111,68 @@ class FileClip(InputClip):
     def all_streams_info(self) -> tuple[dict, ...]:
         return self._all_streams
 
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        if self._video_format is None:
+            return None
+        return self._video_format.width, self._video_format.height
+
+    @property
+    def source_stamp(self) -> tuple[int, int]:
+        """Size and modification time of the source file when the clip was created"""
+        return self._filesize, self._filemoddate
+
+    def input_args(self) -> FFargInput:
+        return FFargInput(self._sourcefile,
+                          video=None if self._video_streamindex is None else f"v:{self._video_streamindex}",
+                          audio=None if self._audio_streamindex is None else f"a:{self._audio_streamindex}")
+
+    def scene_changes(self, threshold: float = .3) -> "np.ndarray":
+        """
+        Times of scene changes in seconds. Scores of all frames are computed once and stored in the cache folder.
+        :param threshold: Scene score from 0 to 1
+        """
+        from scriptycut.analysis import VideoAnalysis
+        return VideoAnalysis.of(self).scene_changes(threshold)
+
+    def black_segments(self, min_duration: float = .1) -> "np.ndarray":
+        """
+        Black segments as array (N, 2) of start and end times. Computed with scene_changes() in the same pass.
+        :param min_duration: Minimum length in seconds
+        """
+        from scriptycut.analysis import VideoAnalysis
+        return VideoAnalysis.of(self).black_segments(min_duration)
+
+    def keyframe_times(self) -> Optional[list[float]]:
+        """
+        Times of the keyframes of the selected video stream in clip time. Read once from the packet index.
+        ffmpeg starts reading at the start time of the file, so packet times are shifted by it.
+        """
+        if self._video_streamindex is None:
+            return None
+
+        file = self.cachedir / "keyframes.json"
+        stamp = list(self.source_stamp)
+        if file.is_file():
+            data = loads(file.read_text())
+            if isinstance(data, dict) and data.get("source") == stamp:
+                return data["times"]
+
+        start = float(self._format.get("start_time", 0.))
+        times = [round(t - start, 6) for t in FFPROBE().keyframe_times(self._sourcefile, f"v:{self._video_streamindex}")]
+        file.write_text(dumps({"source": stamp, "times": times}))
+        return times
+
+    def audio_analysis(self) -> "AudioAnalysis":
+        """
+        Peak/RMS envelope, silence intervals and EBU R128 loudness of the selected audio stream.
+        Computed in one pass and stored in the cache folder.
+        """
+        from scriptycut.analysis import AudioAnalysis
+
+        rate = self._audio_format.sample_rate if self._audio_format is not None else None
+        return AudioAnalysis.of(self, int(rate) if rate else None)
+
     @cached_property
     def duration(self) -> float:
         # Get from format/container
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+from importlib import import_module
 from dataclasses import dataclass, fields
 
 
@@ -22,7 +23,8 @@ class Format:
 
     @classmethod
     def filter_si_dict(cls, si: dict):
-        return {key: value for key, value in si.items() if key in (f.name for f in fields(cls))}
+        # Missing keys like the profile of PCM audio become None
+        return {f.name: si.get(f.name) for f in fields(cls)}
 
 @dataclass
 class VideoFormat(Format):
@@ -52,4 +54,11 @@ class AudioFormat(Format):
 
 _mapping = {"video": VideoFormat, "audio": AudioFormat}
 
-import scriptycut.formats.h264
+# Codec specific submodules, imported on first attribute access (PEP 562)
+_LAZY_SUBMODULES = {"h264"}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_SUBMODULES:
+        return import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+"""
+Clips processed by Python functions on NumPy frames.
+Batches of decoded frames are passed to worker processes through shared memory. No pixel data gets pickled.
+The processed frames are streamed into the encoder in their original order
+and kept in a FrameStore for zero-copy reading by following clips, clip[n] and iter_frames().
+"""
+
+import os
+import hashlib
+from collections import deque
+from typing import Optional, Callable, Iterable, TYPE_CHECKING
+
+from scriptycut.clip import Clip, ClipError
+from scriptycut.clipflags import ClipFlags
+from scriptycut.common import FPS
+from scriptycut.ffinterface import FFArgsInterface, FFargInput, FFargFilter
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Batches in flight per worker
+BATCHES_PER_WORKER = 2
+
+
+def _mp_context():
+    """Start method of the workers. fork copies locks held by other threads of the renderer."""
+    import multiprocessing
+
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _process_batch(fn: Callable, in_name: str, out_name: str, shape: tuple, dtype: str):
+    """Runs in a worker process. Reads the batch from and writes the result into shared memory."""
+    import numpy as np
+    from multiprocessing.shared_memory import SharedMemory
+
+    shm_in = SharedMemory(in_name)
+    shm_out = SharedMemory(out_name)
+    try:
+        frames = np.ndarray(shape, dtype=dtype, buffer=shm_in.buf)
+        result = np.asarray(fn(frames))
+        if result.shape != frames.shape:
+            raise ValueError(f"Function changed the shape of frames from {frames.shape} to {result.shape}")
+        out = np.ndarray(shape, dtype=dtype, buffer=shm_out.buf)
+        out[...] = result
+        del frames, result, out
+    finally:
+        shm_in.close()
+        shm_out.close()
+
+
+def _function_id(fn: Callable) -> str:
+    """Name and a hash of the bytecode, so changing a function invalidates the cache"""
+    name = f"{getattr(fn, '__module__', '')}.{getattr(fn, '__qualname__', repr(fn))}"
+    code = getattr(fn, "__code__", None)
+    if code is None:
+        return name
+    digest = hashlib.sha1(code.co_code + repr(code.co_consts).encode()).hexdigest()[:8]
+    return f"{name}#{digest}"
+
+
+class FrameFunctionClip(Clip):
+    """
+    Video of a clip processed by a NumPy function on batches of frames: fn(frames) -> frames
+    frames is an ndarray (N, H, W, C). The result needs the same shape and data type.
+    fn runs in a ProcessPoolExecutor, so it must be picklable (defined at module level).
+    Workers are started by a fork server (spawned on Windows), because rendering runs in threads and forking
+    a threaded process can deadlock. They import the main module, which needs an if __name__ == "__main__" guard.
+    Audio is passed through.
+    """
+
+    def __init__(self, clip: Clip, fn: Callable[["np.ndarray"], "np.ndarray"], batch: int = 8,
+                 workers: int = None, pix_fmt: str = "rgb24"):
+        """
+        :param clip: Clip with video
+        :param fn: Function processing a batch of frames
+        :param batch: Frames per call of fn
+        :param workers: Number of worker processes. Default: CPU count
+        :param pix_fmt: Packed pixel format of the frames. See rawframes.PIX_FMTS.
+        """
+        if not clip.has_video:
+            raise ValueError("FrameFunctionClip requires a clip with video.")
+        if clip.video_resolution is None or clip.video_fps is None:
+            raise ValueError(f"Resolution and frame rate of {clip!r} need to be known. Scale it first.")
+
+        self._clip = clip
+        self._fn = fn
+        self._batch = max(1, batch)
+        self._workers = workers or os.cpu_count() or 1
+        self._pix_fmt = pix_fmt
+
+        Clip.__init__(self)
+        self._video_fps = clip.video_fps
+
+    @property
+    def clip(self) -> Clip:
+        return self._clip
+
+    @property
+    def subclips(self) -> tuple[Clip, ...]:
+        return self._clip,
+
+    @property
+    def flags(self) -> set[ClipFlags]:
+        return self._clip.flags
+
+    @property
+    def duration(self) -> float:
+        return self._clip.duration
+
+    @property
+    def video_fps(self) -> Optional[FPS]:
+        return self._clip.video_fps
+
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        return self._clip.video_resolution
+
+    def stdin_data(self) -> Iterable[memoryview]:
+        return self._process()
+
+    def _process(self):
+        import numpy as np
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing.shared_memory import SharedMemory
+        from scriptycut.rawframes import FrameReader, FrameStore
+
+        reader = FrameReader(self._clip, self._batch, self._pix_fmt)
+        batch_bytes = self._batch * int(np.prod(reader.shape)) * np.dtype(reader.dtype).itemsize
+        slots = [(SharedMemory(create=True, size=batch_bytes), SharedMemory(create=True, size=batch_bytes))
+                 for _ in range(self._workers * BATCHES_PER_WORKER)]
+        free = deque(slots)
+        pending = deque()  # (future, slot, bytes) in frame order
+        store = FrameStore(self.cachedir, self._pix_fmt).create(reader.shape, reader.dtype, self.video_fps)
+
+        def finish_oldest() -> bytes:
+            future, slot, size = pending.popleft()
+            try:
+                future.result()
+            except Exception as e:
+                raise ClipError(f"Frame function of {self!r} failed: {e!r}") from e
+            # Copied, because the slot gets reused while the writer may still queue the data
+            data = bytes(slot[1].buf[:size])
+            free.append(slot)
+            store.write(data)
+            return data
+
+        try:
+            with store, ProcessPoolExecutor(self._workers, mp_context=_mp_context()) as executor:
+                for frames in reader:
+                    if not free:
+                        yield finish_oldest()
+
+                    slot = free.popleft()
+                    size = frames.nbytes
+                    slot[0].buf[:size] = memoryview(frames).cast("B")
+                    pending.append((executor.submit(_process_batch, self._fn, slot[0].name, slot[1].name,
+                                                    frames.shape, reader.dtype), slot, size))
+
+                while pending:
+                    yield finish_oldest()
+        finally:
+            reader.close()
+            for shm in (shm for slot in slots for shm in slot):
+                shm.close()
+                shm.unlink()
+
+    def ffmpeg_args(self) -> FFArgsInterface:
+        from scriptycut.rawframes import rawvideo_input_args
+
+        fps = self.video_fps
+        frames = FFargInput("pipe:0", rawvideo_input_args(*self.video_resolution, self._pix_fmt,
+                                                          f"{fps.numerator}/{fps.denominator}"),
+                            video="v:0", audio=None)
+        if not self._clip.has_audio:
+            return frames, FFargFilter(None, frames.video_spec(0), None)
+
+        audio = self._clip.input_args()
+        return frames, audio, FFargFilter(None, frames.video_spec(0), audio.audio_spec(1))
+
+    def _repr_data(self) -> str:
+        return f"{self._clip}ƒ{_function_id(self._fn)}:{self._pix_fmt}"
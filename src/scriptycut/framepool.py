@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+"""
+Random access to single frames: clip[120] or clip[4.5]
+Starting ffmpeg costs about 100 ms before the first frame is decoded. So decoders are long-lived processes,
+one per source, which are reused for following requests. A request behind the current position or
+far ahead restarts the decoder with an input seek (nearest prior keyframe, decoded forward to the exact frame).
+Recently decoded frames are kept in an LRU. Frames of a FrameStore are sliced from its memmap directly.
+"""
+
+import logging
+from threading import Lock
+from collections import OrderedDict
+from subprocess import Popen, PIPE, DEVNULL
+from typing import Optional, TYPE_CHECKING
+
+from scriptycut.common import FPS
+from scriptycut.ffinterface import FFargInput, FFargFilter, FFargOutput
+from scriptycut.rawframes import FrameStore, frame_format
+
+if TYPE_CHECKING:
+    import numpy as np
+    from scriptycut.clip import Clip
+
+logger = logging.getLogger(__name__)
+
+# Decoding forward is cheaper than seeking for that many seconds
+SEEK_THRESHOLD = 2.
+
+# Decoder processes kept alive
+MAX_DECODERS = 8
+
+# Decoded frames kept in memory
+MAX_FRAMES = 64
+
+
+class FrameDecoder:
+    """
+    A long-lived ffmpeg process decoding the video of a source forward from a frame index.
+    """
+
+    def __init__(self, source: FFargInput, fps: FPS, size: tuple[int, int], pix_fmt: str = "rgb24"):
+        """
+        :param source: Input with a video stream
+        :param fps: Constant frame rate frames are indexed by
+        :param size: Output size (width, height)
+        :param pix_fmt: Packed pixel format of rawframes.PIX_FMTS
+        """
+        self._source = source
+        self._fps = fps
+        self._size = size
+        self._pix_fmt = pix_fmt
+        self._channels, self._dtype = frame_format(pix_fmt)
+        self._proc: Optional[Popen] = None
+        self._scratch = None
+        self.position = 0  # Index of the next frame the process delivers
+        self.restarts = 0
+        self.lock = Lock()  # Held while reading. The process decodes one request at a time.
+        self.evicted = False  # Dropped from its pool
+
+    @property
+    def fps(self) -> FPS:
+        return self._fps
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return self._size[1], self._size[0], self._channels
+
+    def command(self, start_index: int) -> list[str]:
+        from scriptycut.fftools import FFMPEG
+
+        # Input seeking jumps to the keyframe before and decodes to the exact position
+        start = start_index * self._fps.frame_time
+        seek = self._source.with_options(("-ss", f"{start:.6f}"))
+        graph = f"[{seek.video_spec(0)}]fps={self._fps.numerator}/{self._fps.denominator}," \
+                f"scale={self._size[0]}:{self._size[1]}[frame]"
+        output = FFargOutput("pipe:1", ("-f", "rawvideo", "-pix_fmt", self._pix_fmt))
+        return FFMPEG().command((seek, FFargFilter(graph, "[frame]", None), output))
+
+    def _restart(self, index: int):
+        self.close()
+        logger.debug(f"Decoder of {self._source.input_file} seeks to frame {index}")
+        self._proc = Popen(self.command(index), stdout=PIPE, stderr=DEVNULL, bufsize=0)
+        self.position = index
+        self.restarts += 1
+
+    def _read_into(self, buffer) -> bool:
+        view = memoryview(buffer).cast("B")
+        filled = 0
+        while filled < len(view):
+            n = self._proc.stdout.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        self.position += 1
+        return True
+
+    def read(self, index: int) -> "np.ndarray":
+        """
+        Decodes the frame at index
+        :raises IndexError: Source ended before index
+        """
+        import numpy as np
+
+        ahead = index - self.position
+        if self._proc is None or ahead < 0 or ahead * self._fps.frame_time > SEEK_THRESHOLD:
+            self._restart(index)
+
+        if self._scratch is None:
+            self._scratch = np.empty(self.shape, dtype=self._dtype)
+
+        while self.position < index:
+            if not self._read_into(self._scratch):
+                self.close()
+                raise IndexError(f"Frame {index} is beyond the end of {self._source.input_file}")
+
+        frame = np.empty(self.shape, dtype=self._dtype)
+        if not self._read_into(frame):
+            self.close()
+            raise IndexError(f"Frame {index} is beyond the end of {self._source.input_file}")
+
+        return frame
+
+    def close(self):
+        proc = self._proc
+        if proc is None:
+            return
+
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        proc.stdout.close()
+        self._proc = None
+
+
+class DecoderPool:
+    """
+    Decoders per source and an LRU of decoded frames. Thread safe.
+    Each decoder has its own lock, so different sources decode in parallel. The pool lock only guards the LRUs.
+    Returned frames are shared and read-only. Copy them for modifications.
+    """
+
+    def __init__(self, max_decoders: int = MAX_DECODERS, max_frames: int = MAX_FRAMES):
+        self._max_decoders = max(1, max_decoders)
+        self._max_frames = max_frames
+        self._decoders: OrderedDict[tuple, FrameDecoder] = OrderedDict()
+        self._frames: OrderedDict[tuple, "np.ndarray"] = OrderedDict()
+        self._stores: dict[tuple, "np.memmap"] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _fps_of(clip: "Clip", source: FFargInput) -> FPS:
+        if clip.video_fps is not None:
+            return clip.video_fps
+
+        from json import loads
+        from scriptycut.fftools import FFPROBE
+        from scriptycut.fileclip import fps_from_stream_info
+
+        streams = loads(FFPROBE().probe(source.input_file)).get("streams", ())
+        fps = next((fps_from_stream_info(s) for s in streams if s.get("codec_type") == "video"), None)
+        if fps is None:
+            raise ValueError(f"Frame rate of {clip!r} is unknown.")
+        return fps
+
+    def _decoder(self, key: tuple, clip: "Clip", size, pix_fmt: str) -> FrameDecoder:
+        """Decoder of a source. New ones get created outside of the pool lock, as probing takes a while."""
+        with self._lock:
+            decoder = self._decoders.get(key)
+            if decoder is not None:
+                self._decoders.move_to_end(key)
+                return decoder
+
+        from scriptycut.render import source_input
+
+        source = source_input(clip)
+        created = FrameDecoder(source, self._fps_of(clip, source), size, pix_fmt)
+        with self._lock:
+            decoder = self._decoders.setdefault(key, created)
+            evicted = []
+            while len(self._decoders) > self._max_decoders:
+                evicted.append(self._decoders.popitem(last=False)[1])
+
+        for oldest in evicted:
+            # Waits for a running read
+            with oldest.lock:
+                oldest.close()
+                oldest.evicted = True
+        return decoder
+
+    def _stored_frames(self, clip: "Clip", source_key: tuple) -> Optional["np.memmap"]:
+        """Memmap of a FrameStore in native resolution if present"""
+        frames = self._stores.get(source_key)
+        if frames is None and source_key[1] == clip.video_resolution:
+            store = FrameStore(clip.cachedir, source_key[2])
+            if store.exists:
+                frames = self._stores[source_key] = store.open()
+        return frames
+
+    def _cached_frame(self, key: tuple) -> Optional["np.ndarray"]:
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self.hits += 1
+                self._frames.move_to_end(key)
+            return frame
+
+    @staticmethod
+    def frame_index(clip: "Clip", fps: FPS, item) -> int:
+        """Frame index by int or by seconds as float. Negative values count from the end."""
+        count = int(round(clip.duration * fps.as_float))
+        if isinstance(item, float):
+            item = int(item * fps.numerator // fps.denominator)
+        if item < 0:
+            item += count
+
+        if item < 0 or (count and item >= count):
+            raise IndexError(f"Frame out of range of {clip!r}")
+        return item
+
+    def get(self, clip: "Clip", item, size: tuple[int, int] = None, pix_fmt: str = "rgb24") -> "np.ndarray":
+        """
+        Frame of a clip as read-only ndarray (H, W, C)
+        :param clip: Clip with video
+        :param item: Frame index (int) or time in seconds (float)
+        :param size: Scale to (width, height). Default: resolution of the clip
+        :param pix_fmt: Packed pixel format of rawframes.PIX_FMTS
+        """
+        if not clip.has_video:
+            raise ValueError(f"{clip!r} has no video.")
+
+        size = size or clip.video_resolution
+        if size is None:
+            raise ValueError(f"Resolution of {clip!r} is unknown. Specify size.")
+
+        source_key = clip.cachedir, tuple(size), pix_fmt
+        with self._lock:
+            stored = self._stored_frames(clip, source_key)
+            if stored is not None:
+                fps = clip.video_fps or FPS(FrameStore(clip.cachedir, pix_fmt).header()["fps"] or 1)
+                self.hits += 1
+                return stored[self.frame_index(clip, fps, item)]
+
+        while True:
+            decoder = self._decoder(source_key, clip, size, pix_fmt)
+            index = self.frame_index(clip, decoder.fps, item)
+            key = source_key + (index,)
+
+            frame = self._cached_frame(key)
+            if frame is not None:
+                return frame
+
+            # Decoding holds the lock of this source only. Other sources decode in parallel.
+            with decoder.lock:
+                if decoder.evicted:
+                    continue
+
+                # Decoded by another thread meanwhile?
+                frame = self._cached_frame(key)
+                if frame is not None:
+                    return frame
+                with self._lock:
+                    self.misses += 1
+
+                frame = decoder.read(index)
+                frame.flags.writeable = False
+                with self._lock:
+                    self._frames[key] = frame
+                    while len(self._frames) > self._max_frames:
+                        self._frames.popitem(last=False)
+                return frame
+
+    def close(self):
+        """Stops all decoders and drops cached frames"""
+        with self._lock:
+            decoders = list(self._decoders.values())
+            self._decoders.clear()
+            self._frames.clear()
+            self._stores.clear()
+
+        for decoder in decoders:
+            with decoder.lock:
+                decoder.close()
+                decoder.evicted = True
+
+
+_default_pool: Optional[DecoderPool] = None
+
+
+def default_pool() -> DecoderPool:
+    """Process-wide pool used by Clip.__getitem__"""
+    global _default_pool
+    if _default_pool is None:
+        import atexit
+        _default_pool = DecoderPool()
+        atexit.register(_default_pool.close)
+    return _default_pool
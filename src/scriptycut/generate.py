@@ -3,23 +3,25 @@
 from typing import Optional
 
 from scriptycut.clip import Libavfilter
-from scriptycut.common import Layer
 
 
 class TestSrc(Libavfilter):
     # ffmpeg -f lavfi -i testsrc=duration=10:size=1280x720:rate=30 -preset slow -crf 22 x264-720p30.mkv
 
     def __init__(self, duration: float, width: int, height: int):
+        self._resolution = width, height
         Libavfilter.__init__(self,
                              f"testsrc=duration={duration}:size={width}x{height}:rate={self._fps_hint.as_float}",
                              duration)
+        self._video_fps = self._fps_hint
 
     @property
     def duration(self) -> float:
         return self._duration
 
-    def _repr_data(self) -> str:
-        return f"{self._duration}"
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        return self._resolution
 
 
 class ColorClip(Libavfilter):
@@ -27,14 +29,23 @@ class ColorClip(Libavfilter):
     # ffplay -f lavfi color=c=pink
 
     def __init__(self, duration: float, width: int, height: int, color: str):
-        Libavfilter.__init__(self, f"color=duration={duration}:s={width}x{height}:c={color}", duration)
+        self._resolution = width, height
+        Libavfilter.__init__(self,
+                             f"color=duration={duration}:s={width}x{height}:c={color}:r={self._fps_hint.as_float}",
+                             duration)
+        self._video_fps = self._fps_hint
 
     @property
     def duration(self) -> float:
         return self._duration
 
-    def _repr_data(self) -> str:
-        return f"{self._duration}"
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        return self._resolution
+
+    @property
+    def is_still(self) -> bool:
+        return True
 
 
 # https://ffmpeg.org/ffmpeg-filters.html#toc-Examples-151
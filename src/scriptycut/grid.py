@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+"""
+Multi-view compositing of many clips in a single filter graph.
+All cells are scaled and placed by one xstack filter, so N camera feeds cost one encode pass
+instead of a chain of pairwise overlays with their own intermediates.
+"""
+
+import math
+import functools
+from typing import Optional, Union, Iterable
+
+from scriptycut.clip import Clip
+from scriptycut.clipflags import ClipFlags
+from scriptycut.common import FPS
+from scriptycut.ffinterface import FFArgsInterface, FFargFilter
+from scriptycut.transform import _scale_filter
+
+
+class Grid(Clip):
+    """
+    Clips arranged in cols x rows cells of equal size. Filled row by row.
+    Each cell is fit into the cell size with black bars. Empty cells and cells of ended clips show the fill color.
+    Lasts as long as the longest clip. Audio ending earlier is padded with silence.
+    """
+
+    def __init__(self, clips: Iterable[Clip], cols: int = None, rows: int = None,
+                 cell_size: tuple[int, int] = None, audio: Union[int, str, None] = 0, fill: str = "black"):
+        """
+        :param clips: Clips with video
+        :param cols: Number of columns. Default: Derived from rows or a square-ish grid.
+        :param rows: Number of rows. Default: Derived from cols.
+        :param cell_size: Size of a cell (width, height). Default: Resolution of the first clip.
+        :param audio: Index of the clip whose audio is used, "mix" for all mixed, None for no audio
+        :param fill: Color of empty cells and of cells whose clip ended
+        """
+        self._clips = tuple(clips)
+        if not self._clips:
+            raise ValueError("Grid requires at least one clip.")
+        if not all(c.has_video for c in self._clips):
+            raise ValueError("All clips of a Grid need video.")
+
+        count = len(self._clips)
+        if cols is None:
+            cols = math.ceil(count / rows) if rows else math.ceil(math.sqrt(count))
+        if rows is None:
+            rows = math.ceil(count / cols)
+        if cols * rows < count:
+            raise ValueError(f"{cols}x{rows} cells are too few for {count} clips.")
+
+        cell_size = cell_size or self._clips[0].video_resolution
+        if cell_size is None:
+            raise ValueError("Resolution of the first clip is unknown. Specify cell_size.")
+
+        if isinstance(audio, int):
+            if not self._clips[audio].has_audio:
+                raise ValueError(f"Clip {audio} of the Grid has no audio.")
+        elif audio not in ("mix", None):
+            raise ValueError("audio must be a clip index, 'mix' or None.")
+
+        self._cols = cols
+        self._rows = rows
+        self._cell_size = tuple(cell_size)
+        self._audio = audio
+        self._fill = fill
+
+        Clip.__init__(self)
+        self._video_fps = next((c.video_fps for c in self._clips if c.video_fps), self._fps_hint)
+
+    @property
+    def clips(self) -> tuple[Clip, ...]:
+        return self._clips
+
+    @property
+    def subclips(self) -> tuple[Clip, ...]:
+        return self._clips
+
+    @property
+    def cols(self) -> int:
+        return self._cols
+
+    @property
+    def rows(self) -> int:
+        return self._rows
+
+    @property
+    def cell_size(self) -> tuple[int, int]:
+        return self._cell_size
+
+    @functools.cached_property
+    def _audio_clips(self) -> tuple[int, ...]:
+        """Indexes of the clips whose audio is used"""
+        if self._audio is None:
+            return ()
+        if self._audio == "mix":
+            return tuple(i for i, c in enumerate(self._clips) if c.has_audio)
+        return self._audio % len(self._clips),
+
+    @property
+    def flags(self) -> set[ClipFlags]:
+        flags = ClipFlags.merge_from_clips(self._clips, exclude=ClipFlags.HasAudio)
+        if self._audio_clips:
+            flags.add(ClipFlags.HasAudio)
+        return flags
+
+    @functools.cached_property
+    def duration(self) -> float:
+        return max(c.duration for c in self._clips)
+
+    @property
+    def video_fps(self) -> Optional[FPS]:
+        return self._video_fps
+
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        return self._cols * self._cell_size[0], self._rows * self._cell_size[1]
+
+    def cell_position(self, index: int) -> tuple[int, int]:
+        """Pixel position (x, y) of the cell of the index-th clip"""
+        row, col = divmod(index, self._cols)
+        return col * self._cell_size[0], row * self._cell_size[1]
+
+    def ffmpeg_args(self) -> FFArgsInterface:
+        inputs = tuple(c.input_args() for c in self._clips)
+        width, height = self._cell_size
+        fit = _scale_filter(width, height, keep_aspect=True, center=True)
+        fps = self._video_fps
+
+        graph = []
+        cells = ""
+        for i, (clip, inp) in enumerate(zip(self._clips, inputs)):
+            cell = f"[{inp.video_spec(i)}]{fit},fps={fps.numerator}/{fps.denominator}"
+            if clip.duration < self.duration:
+                # xstack would repeat the last frame
+                cell += f",tpad=stop_mode=add:stop_duration={self.duration - clip.duration}:color={self._fill}"
+            graph.append(f"{cell}[c{i}]")
+            cells += f"[c{i}]"
+
+        if len(inputs) == 1 and self._cols * self._rows == 1:
+            graph.append(f"{cells}null[v]")
+        else:
+            if len(inputs) == 1:
+                # xstack needs two inputs at least
+                graph.append(f"color=c={self._fill}:s={width}x{height}:r={fps.numerator}/{fps.denominator},"
+                             f"trim=duration={self.duration}[c1]")
+                cells += "[c1]"
+            layout = "|".join(f"{x}_{y}" for x, y in map(self.cell_position, range(cells.count("["))))
+            graph.append(f"{cells}xstack=inputs={cells.count('[')}:layout={layout}:fill={self._fill}[v]")
+
+        audio = None
+        if len(self._audio_clips) == 1:
+            i = self._audio_clips[0]
+            audio = inputs[i].audio_spec(i)
+            if self._clips[i].duration < self.duration:
+                graph.append(f"[{audio}]apad=whole_dur={self.duration}[a]")
+                audio = "[a]"
+        elif self._audio_clips:
+            streams = "".join(f"[{inputs[i].audio_spec(i)}]" for i in self._audio_clips)
+            mix = f"{streams}amix=inputs={len(self._audio_clips)}:duration=longest:normalize=0"
+            if max(self._clips[i].duration for i in self._audio_clips) < self.duration:
+                mix += f",apad=whole_dur={self.duration}"
+            graph.append(f"{mix}[a]")
+            audio = "[a]"
+
+        return (*inputs, FFargFilter(";".join(graph), "[v]", audio))
+
+    def _repr_data(self) -> str:
+        return f"▦{self._cols}x{self._rows}:{self._cell_size}:{self._audio}:{self._fill}:{self._clips}"
+
+
+class Stack(Grid):
+    """
+    Clips side by side (hstack) or on top of each other (vertical, vstack) in one xstack filter.
+    """
+
+    def __init__(self, clips: Iterable[Clip], vertical=False, cell_size: tuple[int, int] = None,
+                 audio: Union[int, str, None] = 0):
+        """
+        :param clips: Clips with video
+        :param vertical: Stack from top to bottom instead of left to right
+        :param cell_size: Size of each clip (width, height). Default: Resolution of the first clip.
+        :param audio: Index of the clip whose audio is used, "mix" for all mixed, None for no audio
+        """
+        clips = tuple(clips)
+        Grid.__init__(self, clips, cols=1 if vertical else len(clips), rows=len(clips) if vertical else 1,
+                      cell_size=cell_size, audio=audio)
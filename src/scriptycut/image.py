@@ -1,84 +1,158 @@
 # -*- coding: utf-8 -*-
 
+import weakref
+from fractions import Fraction
 from collections.abc import Iterable
 from pathlib import Path
 from hashlib import sha256
-from typing import Set, Tuple, Optional
+from typing import Set, Tuple, Optional, TYPE_CHECKING
 from functools import cached_property
 
-from numpy import ndarray
-import imageio.v3 as iio
-
 from scriptycut.common import Pathlike
-from scriptycut.clip import Clip
+from scriptycut.clip import Clip, InputClip
 from scriptycut.clipflags import ClipFlags
+from scriptycut.ffinterface import FFArgsInterface, FFargInput, FFargFilter
+
+# NumPy and ImageIO are imported on first use to keep "import scriptycut" fast
+if TYPE_CHECKING:
+    from numpy import ndarray
+
+
+# Streaming file hashes by (path, size, mtime). Unchanged files are hashed once per process.
+_file_hashes: dict[tuple[str, int, int], str] = {}
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_sha256(file: Pathlike) -> str:
+    """SHA-256 of the file content, read in chunks"""
+    path = Path(file).absolute()
+    stat_info = path.stat()
+    key = str(path), stat_info.st_size, stat_info.st_mtime_ns
+
+    digest = _file_hashes.get(key)
+    if digest is None:
+        h = sha256()
+        buffer = bytearray(HASH_CHUNK_SIZE)
+        view = memoryview(buffer)
+        with open(path, "rb", buffering=0) as f:
+            while n := f.readinto(buffer):
+                h.update(view[:n])
+        digest = _file_hashes[key] = h.digest().hex()
+
+    return digest
 
 
 class Image:
-    def __init__(self, data: ndarray, pixel_format):
+    def __init__(self, data: "ndarray", pixel_format):
+        import numpy as np
+
         self._data = data
         self._shape = data.shape
         self._format = pixel_format or {}
 
-        # Hash the raw data to ensure immutability
-        self._hash = "sha256=" + sha256(data.data).digest().hex()  # Hash the data
+        # Hash the raw data to ensure immutability. Shape and type are part of the content.
+        contiguous = np.ascontiguousarray(data)
+        h = sha256(f"{data.shape}:{data.dtype.str}:".encode())
+        h.update(memoryview(contiguous).cast("B"))
+        self._hash = "sha256=" + h.digest().hex()
 
     def export_to_file(self, file: Pathlike):
+        import imageio.v3 as iio
         with iio.imopen(file, "w") as file:
-            file.write(self._data)
+            file.write(self.data)
 
     @property
-    def data(self) -> ndarray:
+    def data(self) -> "ndarray":
         return self._data
 
     @property
     def data_shape(self) -> Tuple:
         return self._shape
 
+    @property
+    def dtype(self):
+        return self._data.dtype
+
     @property
     def format(self):
         return self._format
 
     @property
     def size(self) -> Tuple[int, int]:
-        return self._format.get("shape", (0, 0))
+        return self.format.get("shape", (self.data_shape[1], self.data_shape[0]))
 
     @property
     def mode(self) -> str:
-        return self._format.get("mode", "")
+        return self.format.get("mode", "")
+
+    @property
+    def content_hash(self) -> str:
+        return self._hash
 
     def __hash__(self):
-        return
+        return hash(self._hash)
 
     def __repr__(self):
         return f"<{self.__class__.__name__}:{self._hash}>"
 
 
 class ImageFromFile(Image):
+    """
+    Image file on disk. Identified by a hash of the encoded file, so it's not decoded on creation.
+    Decoded pixel data is kept only as long as it's referenced elsewhere.
+    """
+
     def __init__(self, imagefile: Pathlike):
         self._sourcefile = Path(imagefile)
-
-        with iio.imopen(self._sourcefile, "r") as file:
-            # print(file, dir(file))
-            imagedata = file.read()
-            Image.__init__(self, imagedata, file.metadata())
+        self._hash = "sha256=" + file_sha256(self._sourcefile)
+        self._decoded: Optional[weakref.ref] = None
 
     @property
     def sourcefile(self) -> Path:
         return self._sourcefile
 
+    @property
+    def data(self) -> "ndarray":
+        data = None if self._decoded is None else self._decoded()
+        if data is None:
+            import imageio.v3 as iio
+            data = iio.imread(self._sourcefile)
+            self._decoded = weakref.ref(data)
+        return data
+
+    @cached_property
+    def _props(self):
+        import imageio.v3 as iio
+        return iio.improps(self._sourcefile)
+
+    @property
+    def data_shape(self) -> Tuple:
+        return self._props.shape
+
+    @property
+    def dtype(self):
+        return self._props.dtype
+
+    @cached_property
+    def format(self):
+        import imageio.v3 as iio
+        return iio.immeta(self._sourcefile)
+
     def __repr__(self):
-        return f"<{self.__class__.__name__}:{self._sourcefile}>"
+        return f"<{self.__class__.__name__}:{self._sourcefile}:{self._hash[:23]}>"
 
 
-class ImageClip(Clip):
+class ImageClip(InputClip):
     """
-    A single Image displayed for a time span
+    A single Image displayed for a time span.
+    Image files are read by ffmpeg directly. Images from memory are written once into the cache folder.
     """
     def __init__(self, image: Image, duration: float):
         self._image = image
         self._duration = duration
-        Clip.__init__(self)
+        InputClip.__init__(self)
+        self._video_fps = self._fps_hint
 
     @property
     def image(self) -> Image:
@@ -92,29 +166,83 @@ class ImageClip(Clip):
     def duration(self) -> float:
         return self._duration
 
+    @property
     def video_resolution(self) -> Optional[Tuple[int, int]]:
         return self._image.size
 
+    @property
+    def is_still(self) -> bool:
+        return True
+
+    @property
+    def image_file(self) -> Path:
+        if isinstance(self._image, ImageFromFile):
+            return self._image.sourcefile.absolute()
+
+        file = self.cachedir / "image.png"
+        if not file.is_file():
+            self._image.export_to_file(file)
+        return file
+
+    def input_args(self) -> FFargInput:
+        return FFargInput(self.image_file,
+                          ("-loop", 1, "-framerate", self._video_fps.as_float, "-t", self._duration),
+                          video="v:0", audio=None)
+
     def _repr_data(self) -> str:
         return f"{self._duration}s:{self._image!r}"
 
 
 class ImageSequenceClip(Clip):
     """
-    Clip containing multiple Images, all being displayed by a constant framecount
-    ffmpeg -f image2 -i img%d.jpg /tmp/a.mpg
-    cat *.jpg | ffmpeg -f image2pipe -c:v mjpeg -i - output.mpg
+    Clip containing multiple Images, all being displayed by a constant framecount.
+    Pixel data is streamed as rawvideo into ffmpeg's stdin. One frame per image, ffmpeg repeats them by fps.
+    All images need the same shape and data type.
     """
 
     def __init__(self, images: Iterable[Image], duration_each: float):
         self._images = tuple(images)
         self._duration_each = duration_each
+
+        if not self._images:
+            raise ValueError("ImageSequenceClip requires at least one image.")
+
+        shapes = {(i.data_shape, str(i.dtype)) for i in self._images}
+        if len(shapes) > 1:
+            raise ValueError(f"All images need the same shape and data type: {shapes}")
+
         Clip.__init__(self)
+        self._video_fps = self._fps_hint
+
+    @property
+    def images(self) -> tuple[Image, ...]:
+        return self._images
 
     @property
     def flags(self) -> Set[ClipFlags]:
         return {ClipFlags.HasVideo}
 
+    @property
+    def video_resolution(self) -> Optional[Tuple[int, int]]:
+        shape = self._images[0].data_shape
+        return shape[1], shape[0]
+
+    def stdin_data(self) -> Iterable["ndarray"]:
+        # Files get decoded one by one while streaming
+        return (image.data for image in self._images)
+
+    def ffmpeg_args(self) -> FFArgsInterface:
+        from scriptycut.rawframes import pix_fmt_of, rawvideo_input_args
+
+        first = self._images[0]
+        framerate = Fraction(self._duration_each).limit_denominator(1001)
+        framerate = f"{framerate.denominator}/{framerate.numerator}"
+        inp = FFargInput("pipe:0", rawvideo_input_args(*self.video_resolution,
+                                                       pix_fmt_of(first.data_shape, first.dtype),
+                                                       framerate),
+                         video="v:0", audio=None)
+        return inp, FFargFilter(f"[0:v]fps={self._video_fps.as_float}[v]", "[v]", None)
+
     def _repr_data(self) -> str:
         return f"{self._duration_each}s@{self._images!r}"
 
@@ -5,27 +5,38 @@ Processing in ffmpeg is wrapped in external processes, which are wrapped in thre
 """
 
 import os
-from typing import List, Optional
-from threading import Thread
-from subprocess import run, DEVNULL, CompletedProcess
+import time
+import logging
+from typing import List, Optional, Callable
+from threading import Thread, Timer, Lock
+from subprocess import Popen, DEVNULL, CompletedProcess
 
 from scriptycut.common import Pathlike
 
+logger = logging.getLogger(__name__)
+
 
 class JobThread(Thread):
     _RUNNING_JOBS: List["JobThread"] = []
+    _RUNNING_JOBS_LOCK = Lock()
 
     def __init__(self, cmd: List[str], cwd: Pathlike = None, timeout: int = None,
                  read_fd: int = DEVNULL, write_fd: int = DEVNULL, err_fd: int = DEVNULL, close_std_fds=True,
-                 autorun=False):
+                 autorun=False, on_finish: Callable[["JobThread"], None] = None):
         self.cmd = cmd
         self.cwd = cwd
         self.timeout = timeout
         self.result: Optional[CompletedProcess] = None
 
+        # Resource usage of the finished process (os.wait4). None on platforms without wait4.
+        self.rusage: Optional[os.struct_rusage] = None
+        self.started: Optional[float] = None  # time.time()
+        self.finished: Optional[float] = None
+
         self._read_fd = read_fd
         self._write_fd = write_fd
         self._err_fd = err_fd
+        self._on_finish = on_finish
         self.close_std_fds = close_std_fds and (read_fd>=0 or write_fd>=0 or err_fd>=0)
 
         Thread.__init__(self)
@@ -44,22 +55,61 @@ class JobThread(Thread):
 
         return True
 
-    def run(self):
-        if self in self._RUNNING_JOBS:
-            raise RuntimeError("Job already in running pool?")
+    @property
+    def wall_time(self) -> Optional[float]:
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
 
-        self._RUNNING_JOBS.append(self)
-        print(f"JOB {id(self)} START:" , self.cmd)
-        self.result = run(self.cmd,
-                          stdin=self._read_fd, stdout=self._write_fd, stderr=self._err_fd,
-                          cwd=self.cwd, timeout=self.timeout)
+    def _wait(self, proc: Popen) -> int:
+        """Waits for the process and collects its resource usage if possible"""
+        timer = None
+        if self.timeout is not None:
+            timer = Timer(self.timeout, proc.kill)
+            timer.start()
+
+        try:
+            if hasattr(os, "wait4"):
+                _, status, self.rusage = os.wait4(proc.pid, 0)
+                proc.returncode = os.waitstatus_to_exitcode(status)
+            else:
+                proc.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
 
-        self._RUNNING_JOBS.remove(self)
-        print(f"JOB {id(self)} FINISH")
+        return proc.returncode
 
-        if self.close_std_fds:
-            for fd in self._read_fd, self._write_fd, self._err_fd:
-                self._try_close_fd(fd)
+    def run(self):
+        with self._RUNNING_JOBS_LOCK:
+            if self in self._RUNNING_JOBS:
+                raise RuntimeError("Job already in running pool?")
+            self._RUNNING_JOBS.append(self)
+
+        logger.debug(f"JOB {id(self)} START: {self.cmd}")
+        self.started = time.time()
+
+        try:
+            proc = Popen(self.cmd, stdin=self._read_fd, stdout=self._write_fd, stderr=self._err_fd, cwd=self.cwd)
+            returncode = self._wait(proc)
+            self.finished = time.time()
+            self.result = CompletedProcess(self.cmd, returncode)
+        finally:
+            with self._RUNNING_JOBS_LOCK:
+                self._RUNNING_JOBS.remove(self)
+            logger.debug(f"JOB {id(self)} FINISH")
+
+            if self.close_std_fds:
+                for fd in self._read_fd, self._write_fd, self._err_fd:
+                    self._try_close_fd(fd)
+
+            if self._on_finish is not None:
+                self._on_finish(self)
+
+    @classmethod
+    def running_jobs(cls) -> tuple["JobThread", ...]:
+        with cls._RUNNING_JOBS_LOCK:
+            return tuple(cls._RUNNING_JOBS)
 
     def join_if_alive(self, timeout: float = None):
         """A friendly join which checks if thread is running"""
@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 
+import functools
+from typing import Optional
+
 from scriptycut.clip import Clip
+from scriptycut.clipflags import ClipFlags
+from scriptycut.ffinterface import FFArgsInterface, FFargFilter
 
 # https://www.abyssale.com/generate-video/ffmpeg-overlay-image-on-video
 
@@ -26,15 +31,34 @@ ffmpeg -f x11grab -video_size 1680x1050 -framerate 30 -i :0.0 \
 -f flv rtmp://live.twitch.tv/app/<stream key>
 
     """
-    def __init__(self, clip_bottom: Clip, clip_top: Clip, options):
+    def __init__(self, clip_bottom: Clip, clip_top: Clip, options: str = None, start: float = 0.,
+                 duration: float = None):
+        """
+        The top clip is overlaid within its time window (overlay enable=).
+        Rendered into H.264 outputs, only the window gets encoded. The parts of the bottom clip before and after it
+        are copied from the source file if possible. See scriptycut.streamcopy.
+        :param clip_bottom: Background clip. Its audio is kept.
+        :param clip_top: Clip placed on top
+        :param options: Options of the overlay filter like position "x=10:y=10"
+        :param start: Second of the bottom clip where the top clip appears
+        :param duration: Visible duration. Default: Until the top clip ends.
+        """
         if not clip_bottom.has_video:
             raise RuntimeError("clip_bottom does not containing a video stream.")
         if not clip_top.has_video:
             raise RuntimeError("clip_top does not containing a video stream.")
 
+        if duration is None:
+            duration = clip_top.duration
+        end = min(start + duration, clip_bottom.duration)
+        if start < 0 or end <= start:
+            raise ValueError(f"Overlay window {start} to {end} is outside of the bottom clip.")
+
         self.__clip_bottom = clip_bottom
         self.__clip_top = clip_top
         self.__options = options
+        self.__start = start
+        self.__end = end
 
         Clip.__init__(self)
 
@@ -46,5 +70,76 @@ ffmpeg -f x11grab -video_size 1680x1050 -framerate 30 -i :0.0 \
     def clip_top(self) -> Clip:
         return self.__clip_top
 
+    @property
+    def start(self) -> float:
+        return self.__start
+
+    @property
+    def end(self) -> float:
+        return self.__end
+
+    @property
+    def is_windowed(self) -> bool:
+        """The top clip covers only a part of the bottom clip"""
+        return self.__start > 0 or self.__end < self.__clip_bottom.duration
+
+    @functools.cached_property
+    def _parts(self) -> Optional[tuple[Clip, ...]]:
+        """Untouched parts of the bottom clip and the overlaid window in between"""
+        if not self.is_windowed:
+            return None
+
+        from scriptycut.slice import Trim
+
+        bottom = self.__clip_bottom
+        window = Overlay(Trim(bottom, self.__start, self.__end), self.__clip_top, self.__options)
+        parts = [window]
+        if self.__start > 0:
+            parts.insert(0, Trim(bottom, 0, self.__start))
+        if self.__end < bottom.duration:
+            parts.append(Trim(bottom, self.__end, bottom.duration))
+        return tuple(parts)
+
+    def stream_copy_parts(self) -> Optional[tuple[Clip, ...]]:
+        return self._parts
+
+    @property
+    def subclips(self) -> tuple[Clip, ...]:
+        return self.__clip_bottom, self.__clip_top
+
+    @property
+    def flags(self) -> set[ClipFlags]:
+        flags = ClipFlags.merge_from_clips(self.__clip_bottom, self.__clip_top, exclude=ClipFlags.HasAudio)
+        if self.__clip_bottom.has_audio:
+            flags.add(ClipFlags.HasAudio)
+        return flags
+
+    @property
+    def duration(self) -> float:
+        return self.__clip_bottom.duration
+
+    @property
+    def video_fps(self):
+        return self.__clip_bottom.video_fps
+
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        return self.__clip_bottom.video_resolution
+
+    def ffmpeg_args(self) -> FFArgsInterface:
+        # Audio of the bottom clip only
+        bottom = self.__clip_bottom.input_args()
+        top = self.__clip_top.input_args()
+        options = f"{self.__options}:eof_action=pass" if self.__options else "eof_action=pass"
+        if not self.is_windowed:
+            graph = f"[{bottom.video_spec(0)}][{top.video_spec(1)}]overlay={options}[v]"
+            return bottom, top, FFargFilter(graph, "[v]", bottom.audio_spec(0))
+
+        # The whole bottom clip passes the filter. The top clip starts at the window.
+        start, end = self.__start, self.__end
+        graph = (f"[{top.video_spec(1)}]trim=duration={end - start},setpts=PTS-STARTPTS+{start}/TB[top];"
+                 f"[{bottom.video_spec(0)}][top]overlay={options}:enable='between(t,{start},{end})'[v]")
+        return bottom, top, FFargFilter(graph, "[v]", bottom.audio_spec(0))
+
     def _repr_data(self) -> str:
-        return f"{self.__clip_bottom}↙↗{self.__clip_top}:{self.__options}"
+        return f"{self.__clip_bottom}↙↗{self.__clip_top}:{self.__options}@{self.__start}:{self.__end}"
@@ -58,33 +58,34 @@ class Pipe:
 
 
 
-# Linux send via stdout, connected to a pipe
-# r, w = os.pipe()
-p = Pipe()
-r, w = p.get_fds()
-cmd_send = ["ffmpeg", "-v", "error", "-nostdin", "-f", "lavfi", "-i", "testsrc=duration=10:size=1280x720:rate=30", "-f", "webm", "pipe:1"]
+if __name__ == "__main__":
+    # Linux send via stdout, connected to a pipe
+    # r, w = os.pipe()
+    p = Pipe()
+    r, w = p.get_fds()
+    cmd_send = ["ffmpeg", "-v", "error", "-nostdin", "-f", "lavfi", "-i", "testsrc=duration=10:size=1280x720:rate=30", "-f", "webm", "pipe:1"]
 
 
-# stream = f"/proc/{os.getpid()}/fd/{r}"
-stream = "pipe:0"
+    # stream = f"/proc/{os.getpid()}/fd/{r}"
+    stream = "pipe:0"
 
-print(f"ffplay -autoexit -i {stream} -f webm")
-cmd_receive = ["ffplay", "-v", "error", "-autoexit", "-i", stream, "-f", "webm"]
-# cmd_receive = ["ffplay", "-autoexit", "-i", "/home/as/Downloads/175844.mp4"]
+    print(f"ffplay -autoexit -i {stream} -f webm")
+    cmd_receive = ["ffplay", "-v", "error", "-autoexit", "-i", stream, "-f", "webm"]
+    # cmd_receive = ["ffplay", "-autoexit", "-i", "/home/as/Downloads/175844.mp4"]
 
-print("Start sending process")
-send_proc = subprocess.Popen(cmd_send, bufsize=0, stdout=w, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
+    print("Start sending process")
+    send_proc = subprocess.Popen(cmd_send, bufsize=0, stdout=w, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
 
-print("Starting player")
-rec_process = subprocess.Popen(cmd_receive, bufsize=0, stdin=r, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    print("Starting player")
+    rec_process = subprocess.Popen(cmd_receive, bufsize=0, stdin=r, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
-send_proc.wait()
-print("Close write")
-p.close_write()
+    send_proc.wait()
+    print("Close write")
+    p.close_write()
 
-rec_process.wait()
-print("Close read")
-p.close_read()
+    rec_process.wait()
+    print("Close read")
+    p.close_read()
 
 
-del p
+    del p
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+
+"""
+Requires numpy
+Streams audio samples between ffmpeg and ndarrays as raw float32 PCM (f32le) through pipes.
+Neither temporary WAV files nor whole tracks in memory: Long recordings are processed chunk by chunk.
+NumPy is imported on first use to keep "import scriptycut" fast.
+"""
+
+import hashlib
+from typing import Optional, Union, Callable, Iterable, TYPE_CHECKING
+
+from scriptycut.clip import Clip, ClipError
+from scriptycut.clipflags import ClipFlags
+from scriptycut.ffinterface import FFArgsInterface, FFargInput, FFargFilter
+
+if TYPE_CHECKING:
+    import numpy as np
+
+SAMPLE_RATE = 48000
+CHUNK_SECONDS = 1.
+
+# ffmpeg channel layouts and their number of channels
+LAYOUTS = {
+    "mono": 1,
+    "stereo": 2,
+    "2.1": 3,
+    "quad": 4,
+    "5.0": 5,
+    "5.1": 6,
+    "7.1": 8,
+}
+
+
+def layout_channels(layout: str) -> int:
+    channels = LAYOUTS.get(layout)
+    if channels is None:
+        raise ValueError(f"Unsupported channel layout: {layout}")
+    return channels
+
+
+def pcm_input_args(sample_rate: int, channels: int) -> tuple:
+    """Input arguments for raw float32 samples"""
+    return "-f", "f32le", "-ar", sample_rate, "-ac", channels
+
+
+class AudioReader:
+    """
+    Decodes the audio of a Clip as f32le through a pipe and yields chunks of samples as float32 ndarrays
+    shaped (N, C). Dependencies of the clip get rendered first (audio layer only). The clip itself is not cached,
+    but an existing cache is read instead of processing the clip again.
+
+    Chunks are views into a preallocated ring buffer filled by readinto(), so steady state reading
+    allocates no sample memory. A chunk stays valid until the ring wraps around (ring_size - 1 chunks later).
+    Copy it if you need it longer.
+    """
+
+    def __init__(self, clip: Clip, chunk_seconds: float = CHUNK_SECONDS, sample_rate: int = SAMPLE_RATE,
+                 layout: str = "stereo", ring_size: int = 2):
+        """
+        :param clip: Clip with audio
+        :param chunk_seconds: Length of a chunk. The last one may be shorter.
+        :param sample_rate: Resample to this rate
+        :param layout: Channel layout of LAYOUTS. Channels get up- or downmixed.
+        :param ring_size: Number of chunks in the ring buffer
+        """
+        if not clip.has_audio:
+            raise ValueError("AudioReader requires a clip with audio.")
+
+        self._clip = clip
+        self._sample_rate = int(sample_rate)
+        self._layout = layout
+        self._channels = layout_channels(layout)
+        self._chunk = max(1, round(chunk_seconds * self._sample_rate))
+        self._ring_size = max(2, ring_size)
+        self._proc = None
+        self.samples_read = 0
+
+    @property
+    def sample_rate(self) -> int:
+        return self._sample_rate
+
+    @property
+    def channels(self) -> int:
+        return self._channels
+
+    @property
+    def _from_cache(self) -> bool:
+        return self._clip.is_cached
+
+    def command(self, ffargs=None) -> list[str]:
+        """
+        :param ffargs: Arguments of the clip reading prepared dependencies. Default: The clip's audio only.
+        """
+        from scriptycut.common import Layer
+        from scriptycut.fftools import FFMPEG
+        from scriptycut.ffinterface import FFargOutput, prune_layers
+
+        if self._from_cache:
+            # Decoding the cache is cheaper than processing the clip again
+            inp = self._clip.input_args().with_options("-vn")
+            inputs, mapping = (inp, ), FFargFilter(None, None, inp.audio_spec(0))
+        else:
+            if ffargs is None:
+                # Video is not decoded
+                ffargs = prune_layers(self._clip.ffmpeg_args(), Layer.A)[0]
+            mapping = next(a for a in ffargs if isinstance(a, FFargFilter))
+            inputs = tuple(a for a in ffargs if not isinstance(a, FFargFilter))
+
+        # Append conversions to the audio output of the clip's graph
+        source = mapping.audio if mapping.audio.startswith("[") else f"[{mapping.audio}]"
+        graph = (f"{source}aresample={self._sample_rate},"
+                 f"aformat=sample_fmts=flt:channel_layouts={self._layout}[samples]")
+        if mapping.graph:
+            graph = f"{mapping.graph};{graph}"
+
+        output = FFargOutput("pipe:1", ("-f", "f32le"))
+        return FFMPEG().command((inputs, FFargFilter(graph, None, "[samples]"), output))
+
+    def __iter__(self):
+        import numpy as np
+        from subprocess import Popen, PIPE
+        from scriptycut.common import Layer
+        from scriptycut.rawframes import read_into
+        from scriptycut.render import RenderPlan
+
+        if self._clip.cacheable and self._clip.stdin_data() is not None:
+            # Data fed by Python can't be read twice. Read it from the cache.
+            self._clip.render_cache()
+
+        ffargs = None
+        if not self._from_cache:
+            # Dependencies are rendered for the audio layer only
+            plan = RenderPlan(self._clip, dependencies_only=True, layers=Layer.A)
+            plan.run()
+            ffargs = plan.args
+
+        ring = np.empty((self._ring_size, self._chunk, self._channels), dtype=np.float32)
+        views = [memoryview(ring[i]).cast("B") for i in range(self._ring_size)]
+        sample_bytes = ring[0, 0].nbytes
+        log_file = self._clip.cachedir / "audioreader.log"
+
+        with open(log_file, "wb") as log:
+            self._proc = proc = Popen(self.command(ffargs), stdout=PIPE, stderr=log, cwd=self._clip.cachedir,
+                                      bufsize=0)
+
+        slot = 0
+        try:
+            while True:
+                view = views[slot]
+                filled = read_into(proc.stdout, view)
+                samples = filled // sample_bytes
+                if samples:
+                    self.samples_read += samples
+                    yield ring[slot] if samples == self._chunk else ring[slot, :samples]
+
+                if filled < len(view):
+                    # End of stream
+                    break
+
+                slot = (slot + 1) % self._ring_size
+
+            if proc.wait() != 0:
+                raise ClipError(f"Decoding audio of {self._clip!r} failed:\n"
+                                f"{log_file.read_text(errors='replace')[-2000:]}")
+        finally:
+            self.close()
+
+    def close(self):
+        proc = self._proc
+        if proc is None:
+            return
+
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        proc.stdout.close()
+        self._proc = None
+
+
+class AudioArrayClip(Clip):
+    """
+    Audio from ndarrays streamed as f32le into ffmpeg's stdin.
+    The source is either a whole array or a function returning an iterable of chunks.
+    Chunks are produced while ffmpeg encodes, so memory stays bounded by a few chunks.
+    Arrays are shaped (N, C) or (N, ) for mono. Values are float in -1..1.
+    The audio is padded with silence or cut to duration.
+    """
+
+    def __init__(self, source: Union["np.ndarray", Callable[[], Iterable["np.ndarray"]]],
+                 sample_rate: int = SAMPLE_RATE, duration: Optional[float] = None, channels: Optional[int] = None,
+                 key: Optional[str] = None):
+        """
+        :param source: Array of all samples or a function returning chunks. Rendering calls it again each time.
+        :param sample_rate: Sample rate of the arrays
+        :param duration: Required for a function. Default for an array: Its length.
+        :param channels: Required for a function if not stereo. Default for an array: Its shape.
+        :param key: Identifies the audio of a function for caching. Default: Its name and code.
+                    Pass a key if the function depends on changing data.
+        """
+        self._sample_rate = int(sample_rate)
+
+        if callable(source):
+            if duration is None:
+                raise ValueError("Duration is required for chunks from a function.")
+            self._array = None
+            self._function = source
+            self._channels = channels or 2
+            from scriptycut.framefunction import _function_id
+            self._key = key or _function_id(source)
+        else:
+            import numpy as np
+
+            array = np.ascontiguousarray(source, dtype=np.float32)
+            if array.ndim == 1:
+                array = array[:, None]
+            if array.ndim != 2:
+                raise ValueError(f"Samples need the shape (N, C) or (N, ): {array.shape}")
+            if duration is None:
+                duration = len(array) / self._sample_rate
+
+            self._array = array
+            self._function = None
+            self._channels = array.shape[1]
+            self._key = key or hashlib.sha1(memoryview(array).cast("B")).hexdigest()
+
+        self._duration = float(duration)
+        if self._channels not in LAYOUTS.values():
+            raise ValueError(f"Unsupported number of channels: {self._channels}")
+
+        Clip.__init__(self)
+
+    @property
+    def flags(self) -> set[ClipFlags]:
+        return {ClipFlags.HasAudio}
+
+    @property
+    def duration(self) -> float:
+        return self._duration
+
+    @property
+    def sample_rate(self) -> int:
+        return self._sample_rate
+
+    @property
+    def channels(self) -> int:
+        return self._channels
+
+    def _chunks(self) -> Iterable["np.ndarray"]:
+        import numpy as np
+
+        if self._array is not None:
+            step = round(CHUNK_SECONDS * self._sample_rate)
+            for start in range(0, len(self._array), step):
+                yield self._array[start:start + step]
+            return
+
+        for chunk in self._function():
+            chunk = np.ascontiguousarray(chunk, dtype=np.float32)
+            if chunk.ndim == 1:
+                chunk = chunk[:, None]
+            if chunk.ndim != 2 or chunk.shape[1] != self._channels:
+                raise ClipError(f"Chunk of {self!r} has the shape {chunk.shape}. "
+                                f"Expected (N, {self._channels}).")
+            yield chunk
+
+    def stdin_data(self) -> Iterable["np.ndarray"]:
+        return self._chunks()
+
+    def ffmpeg_args(self) -> FFArgsInterface:
+        inp = FFargInput("pipe:0", pcm_input_args(self._sample_rate, self._channels), video=None, audio="a:0")
+        return inp, FFargFilter(f"[{inp.audio_spec(0)}]apad=whole_dur={self._duration},"
+                                f"atrim=duration={self._duration}[a]", None, "[a]")
+
+    def _repr_data(self) -> str:
+        return f"{self._key}:{self._sample_rate}:{self._channels}:{self._duration}"
@@ -3,6 +3,394 @@
 """
 Requires numpy
 Allows raw image processing with ndarrays
+NumPy is imported on first use to keep "import scriptycut" fast.
 """
 
-import numpy as np
+import os
+import json
+import logging
+from pathlib import Path
+from queue import Queue
+from threading import Thread
+from typing import Optional, Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (channels, dtype): ffmpeg pix_fmt of packed pixels as NumPy stores them
+PIX_FMTS = {
+    (1, "uint8"): "gray",
+    (2, "uint8"): "ya8",
+    (3, "uint8"): "rgb24",
+    (4, "uint8"): "rgba",
+    (1, "uint16"): "gray16le",
+    (2, "uint16"): "ya16le",
+    (3, "uint16"): "rgb48le",
+    (4, "uint16"): "rgba64le",
+    (1, "float32"): "grayf32le",
+}
+
+# Frames produced ahead of ffmpeg reading them
+QUEUE_FRAMES = 8
+
+
+def pix_fmt_of(shape: tuple, dtype) -> str:
+    """ffmpeg pix_fmt for frames of the shape (height, width[, channels]) and dtype"""
+    channels = shape[2] if len(shape) == 3 else 1
+    pix_fmt = PIX_FMTS.get((channels, str(dtype)))
+    if pix_fmt is None:
+        raise ValueError(f"No raw pixel format for {channels} channels of {dtype}.")
+    return pix_fmt
+
+
+def rawvideo_input_args(width: int, height: int, pix_fmt: str, framerate: str) -> tuple:
+    """Input arguments for raw frames"""
+    return "-f", "rawvideo", "-pix_fmt", pix_fmt, "-s", f"{width}x{height}", "-framerate", framerate
+
+
+def frame_buffer(frame: "np.ndarray") -> memoryview:
+    """Flat byte view of a frame. Copies only non-contiguous arrays."""
+    import numpy as np
+    return memoryview(np.ascontiguousarray(frame)).cast("B")
+
+
+def read_into(stream, view: memoryview) -> int:
+    """Fills view from a binary stream like a pipe. Returns the bytes read. Less than len(view) at the end."""
+    filled = 0
+    while filled < len(view):
+        n = stream.readinto(view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+class RawFrameWriter:
+    """
+    Writes frames into a file descriptor like the stdin pipe of ffmpeg.
+    A producer thread prepares the next frames into a bounded queue while the writer thread
+    is blocked by ffmpeg. So Python production and ffmpeg encoding overlap with bounded memory usage.
+    """
+
+    _END = object()
+
+    def __init__(self, frames: Iterable, fd: int, queue_frames: int = QUEUE_FRAMES, close_fd=True):
+        """
+        :param frames: ndarrays or other objects supporting the buffer protocol
+        :param fd: Writable file descriptor
+        :param queue_frames: Maximum number of frames prepared ahead
+        :param close_fd: Close fd when done, so ffmpeg sees the end of input
+        """
+        self._frames = frames
+        self._fd = fd
+        self._close_fd = close_fd
+        self._queue: Queue = Queue(maxsize=max(1, queue_frames))
+        self._stopped = False
+        self.bytes_written = 0
+        self.frames_written = 0
+        self.error: Optional[BaseException] = None
+
+        self._producer = Thread(target=self._produce, daemon=True)
+        self._writer = Thread(target=self._write, daemon=True)
+
+    def start(self) -> "RawFrameWriter":
+        self._producer.start()
+        self._writer.start()
+        return self
+
+    def _produce(self):
+        try:
+            for frame in self._frames:
+                if self._stopped:
+                    break
+                self._queue.put(frame if isinstance(frame, (bytes, bytearray, memoryview)) else frame_buffer(frame))
+        except BaseException as e:
+            self.error = e
+        finally:
+            self._queue.put(self._END)
+
+    def _write(self):
+        try:
+            while (view := self._queue.get()) is not self._END:
+                while view:
+                    n = os.write(self._fd, view)
+                    self.bytes_written += n
+                    view = view[n:]
+                self.frames_written += 1
+        except OSError as e:
+            # Broken pipe: ffmpeg stopped reading. Its return code tells why.
+            logger.debug(f"Raw frame writer stopped: {e}")
+            self._stop()
+        finally:
+            if self._close_fd:
+                os.close(self._fd)
+
+    def _stop(self):
+        # Unblock the producer
+        self._stopped = True
+        while self._producer.is_alive():
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._producer.join(0.01)
+
+    def join(self, timeout: float = None):
+        self._writer.join(timeout)
+        self._producer.join(timeout)
+
+
+def frame_format(pix_fmt: str) -> tuple[int, str]:
+    """Channels and dtype of a packed pix_fmt from PIX_FMTS"""
+    for (channels, dtype), fmt in PIX_FMTS.items():
+        if fmt == pix_fmt:
+            return channels, dtype
+    raise ValueError(f"Unsupported raw pixel format: {pix_fmt}")
+
+
+class FrameReader:
+    """
+    Decodes the video of a Clip as rawvideo through a pipe and yields batches of frames as ndarrays
+    shaped (N, H, W, C). Dependencies of the clip get rendered first. The clip itself is not cached,
+    but an existing cache is read instead of processing the clip again.
+    Frames of a FrameStore in native resolution are sliced from its memmap without decoding.
+
+    Batches are views into a preallocated ring buffer filled by readinto(), so steady state reading
+    allocates no frame memory. A batch stays valid until the ring wraps around (ring_size - 1 batches later).
+    Copy it if you need it longer.
+    """
+
+    def __init__(self, clip, batch: int = 16, pix_fmt: str = "rgb24",
+                 size: Optional[tuple[int, int]] = None, fps=None, ring_size: int = 2):
+        """
+        :param clip: Clip with video
+        :param batch: Frames per batch (N)
+        :param pix_fmt: Packed pixel format of PIX_FMTS. rgb24 gives uint8 (N, H, W, 3).
+        :param size: Scale frames to (width, height). Required if the clip doesn't know its resolution.
+        :param fps: Convert to a constant frame rate
+        :param ring_size: Number of batches in the ring buffer
+        """
+        if not clip.has_video:
+            raise ValueError("FrameReader requires a clip with video.")
+
+        size = size or clip.video_resolution
+        if size is None:
+            raise ValueError("Resolution of the clip is unknown. Specify size.")
+
+        self._clip = clip
+        self._batch = max(1, batch)
+        self._pix_fmt = pix_fmt
+        self._size = size
+        self._fps = fps
+        self._ring_size = max(2, ring_size)
+        self._channels, self._dtype = frame_format(pix_fmt)
+        self._proc = None
+        self.frames_read = 0
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        """Shape of a single frame (H, W, C)"""
+        return self._size[1], self._size[0], self._channels
+
+    @property
+    def dtype(self) -> str:
+        return self._dtype
+
+    @property
+    def _from_cache(self) -> bool:
+        return self._clip.is_cached
+
+    def command(self, ffargs=None) -> list[str]:
+        """
+        :param ffargs: Arguments of the clip reading prepared dependencies. Default: The clip's video only.
+        """
+        from scriptycut.common import Layer
+        from scriptycut.fftools import FFMPEG
+        from scriptycut.ffinterface import FFargFilter, FFargOutput, prune_layers
+
+        if self._from_cache:
+            # Decoding the cache is cheaper than processing the clip again
+            inp = self._clip.input_args()
+            inputs, mapping = (inp, ), FFargFilter(None, inp.video_spec(0), None)
+        else:
+            if ffargs is None:
+                # Audio is not decoded
+                ffargs = prune_layers(self._clip.ffmpeg_args(), Layer.V)[0]
+            mapping = next(a for a in ffargs if isinstance(a, FFargFilter))
+            inputs = tuple(a for a in ffargs if not isinstance(a, FFargFilter))
+
+        # Append conversions to the video output of the clip's graph
+        extra = [f"scale={self._size[0]}:{self._size[1]}"]
+        if self._fps is not None:
+            extra.append(f"fps={self._fps}")
+        source = mapping.video if mapping.video.startswith("[") else f"[{mapping.video}]"
+        graph = f"{source}{','.join(extra)}[frames]"
+        if mapping.graph:
+            graph = f"{mapping.graph};{graph}"
+
+        output = FFargOutput("pipe:1", ("-f", "rawvideo", "-pix_fmt", self._pix_fmt))
+        return FFMPEG().command((inputs, FFargFilter(graph, "[frames]", None), output))
+
+    def __iter__(self):
+        import numpy as np
+        from subprocess import Popen, PIPE
+        from scriptycut.clip import ClipError
+        from scriptycut.common import Layer
+        from scriptycut.render import RenderPlan
+
+        store = FrameStore(self._clip.cachedir, self._pix_fmt)
+        if self._fps is None and tuple(self._size) == self._clip.video_resolution and store.exists:
+            frames = store.open()
+            for start in range(0, len(frames), self._batch):
+                batch = frames[start:start + self._batch]
+                self.frames_read += len(batch)
+                yield batch
+            return
+
+        if self._clip.cacheable and self._clip.stdin_data() is not None:
+            # Data fed by Python can't be read twice. Read it from the cache.
+            self._clip.render_cache()
+
+        ffargs = None
+        if not self._from_cache:
+            # Dependencies are rendered for the video layer only
+            plan = RenderPlan(self._clip, dependencies_only=True, layers=Layer.V)
+            plan.run()
+            ffargs = plan.args
+
+        ring = np.empty((self._ring_size, self._batch, *self.shape), dtype=self._dtype)
+        views = [memoryview(ring[i]).cast("B") for i in range(self._ring_size)]
+        frame_bytes = ring[0, 0].nbytes
+        log_file = self._clip.cachedir / "framereader.log"
+
+        with open(log_file, "wb") as log:
+            self._proc = proc = Popen(self.command(ffargs), stdout=PIPE, stderr=log, cwd=self._clip.cachedir, bufsize=0)
+
+        slot = 0
+        try:
+            while True:
+                view = views[slot]
+                filled = read_into(proc.stdout, view)
+                frames = filled // frame_bytes
+                if frames:
+                    self.frames_read += frames
+                    yield ring[slot] if frames == self._batch else ring[slot, :frames]
+
+                if filled < len(view):
+                    # End of stream
+                    break
+
+                slot = (slot + 1) % self._ring_size
+
+            if proc.wait() != 0:
+                raise ClipError(f"Decoding frames of {self._clip!r} failed:\n"
+                                f"{log_file.read_text(errors='replace')[-2000:]}")
+        finally:
+            self.close()
+
+    def close(self):
+        proc = self._proc
+        if proc is None:
+            return
+
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        proc.stdout.close()
+        self._proc = None
+
+
+class FrameStore:
+    """
+    Decoded frames of a clip in its cachedir as raw file with a small JSON header (shape, dtype, pix_fmt, fps).
+    Readers get a read-only np.memmap: Slicing is zero-copy and pages are shared between processes.
+    frames.<pix_fmt>.raw, frames.<pix_fmt>.json
+    """
+
+    def __init__(self, directory: Path, pix_fmt: str = "rgb24"):
+        self._directory = Path(directory)
+        self._pix_fmt = pix_fmt
+
+    @property
+    def raw_file(self) -> Path:
+        return self._directory / f"frames.{self._pix_fmt}.raw"
+
+    @property
+    def header_file(self) -> Path:
+        return self._directory / f"frames.{self._pix_fmt}.json"
+
+    @property
+    def exists(self) -> bool:
+        # The header is written last
+        return self.header_file.is_file()
+
+    def header(self) -> dict:
+        return json.loads(self.header_file.read_text())
+
+    def open(self) -> "np.memmap":
+        """Frames as read-only memmap (N, H, W, C)"""
+        import numpy as np
+
+        header = self.header()
+        if not header["frames"]:
+            return np.empty((0, *header["shape"]), dtype=header["dtype"])
+        return np.memmap(self.raw_file, dtype=header["dtype"], mode="r",
+                         shape=(header["frames"], *header["shape"]))
+
+    def create(self, shape: tuple[int, int, int], dtype: str, fps=None) -> "FrameStoreWriter":
+        return FrameStoreWriter(self, shape, dtype, fps)
+
+
+class FrameStoreWriter:
+    """
+    Appends frames to a FrameStore. The store appears on commit() only.
+    As context manager: commit() on success, abort() on exceptions.
+    """
+
+    def __init__(self, store: FrameStore, shape: tuple[int, int, int], dtype: str, fps=None):
+        """
+        :param shape: Shape of a frame (H, W, C)
+        :param dtype: NumPy data type
+        :param fps: FPS instance or None
+        """
+        self._store = store
+        self._shape = tuple(shape)
+        self._dtype = str(dtype)
+        self._fps = fps
+        self._part_file = store.raw_file.with_suffix(".part")
+        self._file = open(self._part_file, "wb")
+        self.bytes_written = 0
+
+    def write(self, frames):
+        """Frames as ndarray or bytes-like object"""
+        view = frames if isinstance(frames, (bytes, bytearray, memoryview)) else frame_buffer(frames)
+        self._file.write(view)
+        self.bytes_written += len(view)
+
+    def commit(self):
+        import numpy as np
+
+        self._file.close()
+        frame_bytes = int(np.prod(self._shape)) * np.dtype(self._dtype).itemsize
+        fps = None if self._fps is None else f"{self._fps.numerator}/{self._fps.denominator}"
+        os.replace(self._part_file, self._store.raw_file)
+        self._store.header_file.write_text(json.dumps({
+            "shape": self._shape,
+            "dtype": self._dtype,
+            "pix_fmt": self._store._pix_fmt,
+            "fps": fps,
+            "frames": self.bytes_written // frame_bytes,
+        }))
+
+    def abort(self):
+        self._file.close()
+        self._part_file.unlink(missing_ok=True)
+
+    def __enter__(self) -> "FrameStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
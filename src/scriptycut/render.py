@@ -0,0 +1,807 @@
+# -*- coding: utf-8 -*-
+
+"""
+Turns a graph of Clips into ffmpeg jobs and runs them.
+Clips worth caching get rendered by their own ffmpeg process into their cache folders.
+Cheaper Clips are fused into the ffmpeg process of the next Clip (see scriptycut.costs).
+Input clips are integrated directly as inputs into the ffmpeg command of the next Clip.
+
+A RenderPlan runs on an engine:
+ThreadedEngine: One JobThread per ffmpeg process (default)
+AsyncEngine: All ffmpeg processes supervised by one asyncio event loop
+"""
+
+import os
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from queue import Queue
+from subprocess import DEVNULL
+from typing import Optional, Union, Callable
+
+from scriptycut.clip import Clip, ClipError
+from scriptycut.common import Pathlike, Layer, Caching, threads_num
+from scriptycut.costs import decode_cost, encode_cost, filter_cost, cache_read_cost, cache_write_cost, \
+    worth_caching, output_codecs, CACHE_VIDEO_CODEC, CACHE_AUDIO_CODEC
+from scriptycut.ffinterface import ArgumentTypes, FFArgs, FFargInput, FFargOutput, FFargFilter, inputs_of, \
+    prune_layers, unpack_args, fuse_input
+from scriptycut.fftools import FFMPEG
+from scriptycut.jobthreads import JobThread
+from scriptycut.asyncjobs import AsyncJob, pidfd_child_watcher
+from scriptycut.rawframes import RawFrameWriter
+from scriptycut.renderprofile import RenderProfile, NodeProfile
+
+logger = logging.getLogger(__name__)
+
+
+class RenderJob:
+    """
+    A single ffmpeg process producing the output of a Clip.
+    Cache jobs write into a temporary file first which gets renamed on success.
+    """
+
+    def __init__(self, clip: Clip, cmd: list[str], output_file: Path, depends: tuple["RenderJob", ...],
+                 is_cache: bool, cache_hit: bool, reads_stdin=True, nodes: tuple[Clip, ...] = (), cost: float = 0.,
+                 is_segment=False, input_lists: dict[Path, str] = None):
+        self.clip = clip
+        self.cmd = cmd
+        self.output_file = output_file
+        self.depends = depends
+        self.is_cache = is_cache
+        self.cache_hit = cache_hit
+        self.reads_stdin = reads_stdin
+        self.nodes = nodes  # Other clips processed by this ffmpeg process: Inputs and fused clips
+        self.cost = cost  # Estimated by scriptycut.costs
+        self.is_segment = is_segment  # Video segment of a stream copied output. See scriptycut.streamcopy.
+        self.input_lists = input_lists or {}  # File: content. Written when the job starts, like concat lists.
+        self.log_file = output_file.with_suffix(".log") if is_segment else clip.cachedir / "ffmpeg.log"
+        self._stdin_writer: Optional[RawFrameWriter] = None
+
+    @property
+    def name(self) -> str:
+        return self.clip._autoname
+
+    @property
+    def input_files(self) -> tuple[str, ...]:
+        """Inputs of the ffmpeg command as run: Including fused subclips and layer caches"""
+        return tuple(b for a, b in zip(self.cmd, self.cmd[1:]) if a == "-i")
+
+    @property
+    def write_file(self) -> Path:
+        return part_file(self.output_file) if self.is_cache else self.output_file
+
+    @property
+    def is_copy(self) -> bool:
+        """Streams get copied without encoding"""
+        return any(a in ("-c", "-c:v", "-vcodec") and b == "copy" for a, b in zip(self.cmd, self.cmd[1:]))
+
+    @property
+    def is_piped(self) -> bool:
+        """Python feeds data into stdin"""
+        return self.reads_stdin and self.clip.stdin_data() is not None
+
+    def _open_log(self) -> int:
+        return os.open(self.log_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o640)
+
+    def _open_stdin(self) -> int:
+        """Pipe fed by the clip's stdin_data() if present"""
+        data = self.clip.stdin_data() if self.reads_stdin else None
+        if data is None:
+            return DEVNULL
+
+        read_fd, write_fd = os.pipe()
+        self._stdin_writer = RawFrameWriter(data, write_fd).start()
+        return read_fd
+
+    def _write_input_lists(self):
+        for file, content in self.input_lists.items():
+            file.write_text(content)
+
+    def start(self, on_finish, timeout: float = None) -> JobThread:
+        self._write_input_lists()
+        return JobThread(self.cmd, cwd=self.clip.cachedir, timeout=timeout, read_fd=self._open_stdin(),
+                         err_fd=self._open_log(), autorun=True, on_finish=on_finish)
+
+    def async_job(self, timeout: float = None, on_progress: Callable[[dict[str, str]], None] = None) -> AsyncJob:
+        self._write_input_lists()
+        cmd = self.cmd
+        if on_progress is not None:
+            cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+        return AsyncJob(cmd, cwd=self.clip.cachedir, timeout=timeout, stdin=self._open_stdin(), stderr=self._open_log(),
+                        on_progress=on_progress)
+
+    def finalize(self, thread: Union[JobThread, AsyncJob]):
+        """Checks the result and moves a complete cache file in place"""
+        if self._stdin_writer is not None:
+            self._stdin_writer.join()
+            if self._stdin_writer.error is not None:
+                raise ClipError(f"Producing input data of {self.clip!r} failed: {self._stdin_writer.error!r}")
+
+        if thread.result is None or thread.result.returncode != 0:
+            log = self.log_file.read_text(errors="replace") if self.log_file.is_file() else ""
+            raise ClipError(f"Rendering {self.clip!r} failed:\n{log[-2000:]}")
+
+        if self.is_cache:
+            os.replace(self.write_file, self.output_file)
+
+    def node_profile(self, thread: Union[JobThread, AsyncJob, None] = None) -> NodeProfile:
+        node = NodeProfile(name=self.name,
+                           clip=repr(self.clip),
+                           output=str(self.output_file),
+                           command=self.cmd,
+                           cache_hit=self.cache_hit,
+                           depends=[str(d.output_file) for d in self.depends],
+                           log_file=str(self.log_file))
+
+        if thread is None:
+            # Nothing processed
+            return node
+
+        node.start = thread.started or 0.
+        node.end = thread.finished or node.start
+        if thread.result is not None:
+            node.returncode = thread.result.returncode
+        if thread.rusage is not None:
+            node.cpu_user = thread.rusage.ru_utime
+            node.cpu_system = thread.rusage.ru_stime
+            node.max_rss_kb = thread.rusage.ru_maxrss
+
+        node.bytes_read = sum(_file_size(file) for file in self.input_files)
+        if self.input_lists:
+            # Files read through the lists
+            node.bytes_read += sum(_file_size(dep.output_file) for dep in self.depends if dep.is_segment)
+        if self._stdin_writer is not None:
+            node.bytes_read += self._stdin_writer.bytes_written
+        node.bytes_written = _file_size(self.output_file)
+        return node
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}:{self.name}{'[hit]' if self.cache_hit else ''}>"
+
+
+def source_input(clip: Clip) -> FFargInput:
+    """
+    Input reading the result of a clip for analysis or extraction.
+    Input clips are read directly. Others get rendered into their cache first.
+    """
+    from scriptycut.clip import InputClip
+
+    if not (isinstance(clip, InputClip) and clip.stdin_data() is None):
+        clip.render_cache()
+    return clip.input_args()
+
+
+# Output options limiting the output in time. They don't apply to each looped pass.
+_CUTTING_OPTIONS = {"-ss", "-t", "-to", "-frames:v", "-vframes", "-frames:a", "-aframes", "-fs", "-shortest"}
+
+
+def part_file(file: Path) -> Path:
+    """Temporary file of a cache file until it's complete"""
+    return file.with_name(f"{file.stem}.part{file.suffix}")
+
+
+# Output files which can't hold video
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".flac", ".m4a", ".aac", ".ogg", ".opus", ".wma"}
+
+
+def output_layers(output_file: Optional[Pathlike], output_args: ArgumentTypes = None) -> Layer:
+    """Layers an output needs: -vn, -an or an audio file extension exclude layers"""
+    args = tuple(unpack_args(output_args))
+    layers = Layer.AV
+    if "-vn" in args or (output_file is not None and Path(output_file).suffix.lower() in AUDIO_EXTENSIONS):
+        layers &= ~Layer.V
+    if "-an" in args:
+        layers &= ~Layer.A
+    return layers
+
+
+def _format_cost(cost: float) -> str:
+    for factor, unit in (1e12, "T"), (1e9, "G"), (1e6, "M"), (1e3, "k"):
+        if cost >= factor:
+            return f"{cost / factor:.1f}{unit}"
+    return f"{cost:.0f}"
+
+
+def _file_size(file) -> int:
+    try:
+        return os.stat(file).st_size
+    except (OSError, ValueError):
+        return 0
+
+
+class RenderPlan:
+    """
+    All jobs to render a Clip into a file or into its cache.
+    Jobs are ordered by their dependencies. Cached Clips don't need their dependencies.
+    The required layers are carried down the graph: Unused streams are not decoded (-vn, -an)
+    and subtrees only needed for one layer are rendered into caches of that layer alone.
+
+    Clips with Caching.AUTO get their own job if the cost model finds their cache worth it, if they're read
+    by several clips or if they're read with input options like seeking. Else their filter graph is fused into
+    the job of the clip reading them. explain() shows the decisions.
+    """
+
+    def __init__(self, clip: Clip, output_file: Optional[Pathlike] = None, output_args: ArgumentTypes = None,
+                 force_update_existing=False, dependencies_only=False, layers: Layer = None):
+        """
+        :param clip: Clip to render
+        :param output_file: Output file. None renders into the cache of the clip.
+        :param output_args: ffmpeg output arguments for output_file
+        :param force_update_existing: Ignore existing cache files
+        :param dependencies_only: Only render what the clip reads from. Then args holds the clip's arguments
+                                  reading them.
+        :param layers: Layers to render. Default: All available except those excluded by output_args (-vn, -an)
+                       or by an audio file extension.
+        """
+        self._ffmpeg = FFMPEG()
+        self._force = force_update_existing
+        self._jobs: dict[tuple, RenderJob] = {}  # (cachedir, layers): job
+        self._prepared: dict[tuple, tuple] = {}  # (cachedir, layers): _prepare() result
+        self._references = self._count_references(clip)
+
+        if layers is None:
+            layers = output_layers(output_file, output_args)
+        self.layers = layers & clip.available_av_layer
+        if not self.layers:
+            raise ValueError(f"{clip!r} has none of the layers {layers!r}.")
+
+        self.clip = clip
+        self._output_codecs = output_codecs(output_file, output_args)
+        self.args: Optional[tuple[FFArgs, ...]] = None
+        if dependencies_only:
+            self.target = None
+            self.args = self._prepare(clip, self.layers)[0]
+        elif output_file is None:
+            self.target = self._cache_job(clip, self.layers)
+        elif clip.is_still:
+            # The GOP gets encoded for the output and copied
+            self.target = self._still_job(clip, Path(output_file).absolute(), self._still_output_args(output_args))
+        else:
+            output_file = Path(output_file).absolute()
+            self.target = self._copy_job(clip, output_file, output_args) or \
+                self._repeat_job(clip, output_file, output_args)
+            if self.target is None:
+                args, depends, reads_stdin, nodes, cost = self._prepare(clip, self.layers)
+                cost += encode_cost(clip, self.layers, *self._output_codecs)
+                self.target = RenderJob(clip, self._ffmpeg.command((args, FFargOutput(output_file, output_args))),
+                                        output_file, depends, is_cache=False, cache_hit=False,
+                                        reads_stdin=reads_stdin, nodes=nodes, cost=cost)
+                self._jobs[(output_file, None)] = self.target
+
+    @property
+    def jobs(self) -> tuple[RenderJob, ...]:
+        return tuple(self._jobs.values())
+
+    @property
+    def output_file(self) -> Optional[Path]:
+        return None if self.target is None else self.target.output_file
+
+    @staticmethod
+    def _count_references(clip: Clip) -> dict[Path, int]:
+        """Number of clips reading each clip of the graph. Equal clips share their cache folder."""
+        references = {}
+
+        def count(parent: Clip):
+            for sub in parent.subclips:
+                seen = sub.cachedir in references
+                references[sub.cachedir] = references.get(sub.cachedir, 0) + 1
+                if not seen:
+                    count(sub)
+
+        count(clip)
+        return references
+
+    def _fusable_input(self, args: tuple[FFArgs, ...], sub: Clip, layers: Layer) -> Optional[int]:
+        """
+        Index of the input reading sub if it can be replaced by the processing of sub. None if sub needs a cache:
+        It's read several times or with input options, it's read by other clips, or a cache exists already.
+        """
+        if sub.CACHING is not Caching.AUTO or sub.is_still or sub.stdin_data() is not None:
+            return None
+        if self._references.get(sub.cachedir, 0) > 1:
+            return None
+        if not self._force and (sub.cache_file.is_file() or sub.layer_cache_file(layers).is_file()):
+            # Reading the cache is cheaper than processing again
+            return None
+
+        file = str(sub.input_args().input_file)
+        inputs = inputs_of(args)
+        found = [i for i, inp in enumerate(inputs) if str(inp.input_file) == file]
+        if len(found) != 1 or set(inputs[found[0]].args()[:-2]) - {"-vn", "-an"}:
+            # Seeking, looping etc. apply to the cache file
+            return None
+        return found[0]
+
+    def _prepare(self, clip: Clip, layers: Layer) -> tuple[tuple[FFArgs, ...], tuple[RenderJob, ...], bool,
+                                                           tuple[Clip, ...], float]:
+        """
+        ffmpeg arguments of a clip pruned to layers and the jobs of the subclips they read.
+        Subclips not worth a cache get fused into the arguments.
+        :return: Arguments, dependencies, whether stdin data is read, clips processed within the arguments
+                 (inputs and fused clips), estimated cost of the processing without encoding
+        """
+        key = (clip.cachedir, layers)
+        if key in self._prepared:
+            return self._prepared[key]
+
+        args, used = prune_layers(clip.ffmpeg_args(), layers)
+        # Data fed by Python may read subclips in any way. Their full output is needed.
+        reads_stdin = any(str(inp.input_file) == "pipe:0" for inp, _ in used)
+
+        # Input clips decode their source. The cost of reading subclips is added below.
+        is_input = clip.CACHING is Caching.NEVER
+        cost = decode_cost(clip, layers) if is_input else filter_cost(clip, layers)
+
+        depends = []
+        nodes = []
+        layer_files = {}
+        for sub in clip.subclips:
+            if reads_stdin:
+                sub_layers = sub.available_av_layer
+            else:
+                sub_input = str(sub.input_args().input_file)
+                sub_layers = Layer.NONE
+                for inp, layer in used:
+                    if str(inp.input_file) == sub_input:
+                        sub_layers |= layer
+                sub_layers &= sub.available_av_layer
+
+            if not sub_layers:
+                # Not needed for these layers
+                continue
+
+            looped = None if reads_stdin else self._looped_still(args, clip, sub, sub_layers)
+            if looped is not None:
+                # The encoded GOP of a still clip looped in copy mode replaces generating or decoding every frame
+                args, job = looped
+                depends.append(job)
+                nodes.append(sub)
+                cost += 0. if is_input else cache_read_cost(sub, sub_layers)
+                continue
+
+            if sub.CACHING is Caching.NEVER:
+                # Integrated as input. May depend on others.
+                _, sub_depends, _, _, sub_cost = self._prepare(sub, sub_layers)
+                depends.extend(sub_depends)
+                nodes.append(sub)
+                cost += 0. if is_input else sub_cost
+                continue
+
+            index = None if reads_stdin else self._fusable_input(args, sub, sub_layers)
+            if index is not None:
+                sub_args, sub_depends, _, sub_nodes, sub_cost = self._prepare(sub, sub_layers)
+                if not worth_caching(sub, sub_layers, sub_cost):
+                    # Processed within this ffmpeg process
+                    args = fuse_input(args, index, sub_args, f"{sub._autoname}_")
+                    depends.extend(sub_depends)
+                    nodes += [sub, *sub_nodes]
+                    cost += sub_cost
+                    continue
+
+            job = self._cache_job(sub, sub_layers)
+            depends.append(job)
+            if job.output_file != sub.cache_file:
+                layer_files[str(sub.cache_file)] = job.output_file
+            cost += 0. if is_input else cache_read_cost(sub, sub_layers)
+
+        if layer_files:
+            # Read caches holding only the needed layers
+            args = tuple(FFargInput(layer_files[str(a.input_file)], a.args()[:-2], a.video, a.audio)
+                         if isinstance(a, FFargInput) and str(a.input_file) in layer_files else a
+                         for a in args)
+
+        prepared = args, tuple(dict.fromkeys(depends)), reads_stdin, tuple(dict.fromkeys(nodes)), cost
+        self._prepared[key] = prepared
+        return prepared
+
+    def _looped_still(self, args: tuple[FFArgs, ...], clip: Clip, sub: Clip, layers: Layer
+                      ) -> Optional[tuple[tuple[FFArgs, ...], RenderJob]]:
+        """
+        Arguments reading the cache of a still subclip instead of its source, and the job rendering that cache
+        by looping the encoded GOP. Input options added by clip like seeking are kept.
+        None if sub is no still input of clip.
+        """
+        from scriptycut.still import StillFrames, STILL_GOP_SECONDS
+
+        if not sub.is_still or sub.CACHING is not Caching.NEVER or sub.video_fps is None \
+                or sub.duration <= STILL_GOP_SECONDS or isinstance(clip, StillFrames):
+            return None
+
+        source = sub.input_args().args()
+        if not any(isinstance(a, FFargInput) and a.args()[-len(source):] == source for a in args):
+            return None
+
+        job = self._cache_job(sub, layers)
+        return tuple(FFargInput(job.output_file, a.args()[:-len(source)], a.video, a.audio)
+                     if isinstance(a, FFargInput) and a.args()[-len(source):] == source else a
+                     for a in args), job
+
+    def _cache_job(self, clip: Clip, layers: Layer = None) -> RenderJob:
+        available = clip.available_av_layer
+        layers = available if layers is None else layers & available
+        job = self._jobs.get((clip.cachedir, layers)) or self._jobs.get((clip.cachedir, available))
+        if job is not None:
+            return job
+
+        layer_file = clip.layer_cache_file(layers)
+        if not self._force:
+            # Cache hit. No need to resolve dependencies. A full cache serves any layers.
+            for file in clip.cache_file, layer_file:
+                if file.is_file():
+                    job = RenderJob(clip, [], file, (), is_cache=True, cache_hit=True)
+                    self._jobs[(clip.cachedir, layers)] = job
+                    return job
+
+        if clip.is_still:
+            return self._still_job(clip)
+
+        args, depends, reads_stdin, nodes, cost = self._prepare(clip, layers)
+        output = clip.cache_output_args()
+        if layer_file != clip.cache_file:
+            output = FFargOutput(part_file(layer_file), output.args()[:-1])
+
+        job = RenderJob(clip, self._ffmpeg.command((args, output)), layer_file, depends,
+                        is_cache=True, cache_hit=False, reads_stdin=reads_stdin, nodes=nodes,
+                        cost=cost + cache_write_cost(clip, layers))
+        self._jobs[(clip.cachedir, layers)] = job
+        return job
+
+    def _segment_job(self, segment, output_args: ArgumentTypes, fmt: tuple) -> RenderJob:
+        """Job copying or encoding a video segment into its file. Existing segment files are reused."""
+        from scriptycut.streamcopy import copy_args, encode_output_args, loop_args
+        from scriptycut.still import StillFrames
+
+        if segment.copy:
+            args, segment_args = copy_args(segment)
+            depends, reads_stdin, nodes, cost = (), False, (segment.source, ), 0.
+        elif segment.looped:
+            gop = StillFrames(segment.clip, encode_output_args(output_args, fmt, None))
+            args, segment_args = loop_args(segment, gop)
+            # The GOP job is planned only when the segment gets rendered
+            depends, reads_stdin, nodes, cost = None, False, (), 0.
+        else:
+            args, depends, reads_stdin, nodes, cost = self._prepare(segment.clip, Layer.V)
+            segment_args = encode_output_args(output_args, fmt, segment.frames)
+            cost += encode_cost(segment.clip, Layer.V, self._output_codecs[0], None)
+
+        file = segment.file(segment_args)
+        job = self._jobs.get((file, None))
+        if job is not None:
+            return job
+
+        if not self._force and file.is_file():
+            job = RenderJob(segment.clip, [], file, (), is_cache=True, cache_hit=True, is_segment=True)
+        else:
+            if depends is None:
+                depends = self._cache_job(gop),
+            job = RenderJob(segment.clip, self._ffmpeg.command((args, FFargOutput(part_file(file), segment_args))),
+                            file, depends, is_cache=True, cache_hit=False, reads_stdin=reads_stdin, nodes=nodes,
+                            cost=cost, is_segment=True)
+        self._jobs[(file, None)] = job
+        return job
+
+    def _copy_job(self, clip: Clip, output_file: Path, output_args: ArgumentTypes) -> Optional[RenderJob]:
+        """
+        Renders the video as segments copied from source files between keyframes and encoded segments,
+        joined by the concat demuxer without encoding. The audio gets encoded as usual.
+        None if nothing can be copied. See scriptycut.streamcopy.
+        """
+        from scriptycut.streamcopy import plan_segments, concat_list
+
+        planned = plan_segments(clip, self._output_codecs[0], output_args) if Layer.V in self.layers else None
+        if planned is None:
+            return None
+
+        segments, fmt = planned
+        depends = [self._segment_job(segment, output_args, fmt) for segment in segments]
+        files = [job.output_file for job in depends]
+        key = hashlib.sha1("\n".join(map(str, files)).encode()).hexdigest()[:12]
+        list_file = clip.cachedir / f"concat_{key}.txt"
+
+        inputs = ()
+        graph = audio = None
+        reads_stdin = False
+        nodes = ()
+        cost = 0.
+        if Layer.A in self.layers:
+            audio_args, audio_depends, reads_stdin, nodes, cost = self._prepare(clip, Layer.A)
+            mapping = next(a for a in audio_args if isinstance(a, FFargFilter))
+            inputs = tuple(a for a in audio_args if not isinstance(a, FFargFilter))
+            graph, audio = mapping.graph, mapping.audio
+            depends += audio_depends
+            cost += encode_cost(clip, Layer.A, None, self._output_codecs[1])
+
+        concat = FFargInput(list_file, ("-f", "concat", "-safe", 0), audio=None)
+        args = (*inputs, concat, FFargFilter(graph, concat.video_spec(len(inputs_of(inputs))), audio))
+        output = FFargOutput(output_file, (*unpack_args(output_args), "-c:v", "copy"))
+        job = RenderJob(clip, self._ffmpeg.command((args, output)), output_file, tuple(dict.fromkeys(depends)),
+                        is_cache=False, cache_hit=False, reads_stdin=reads_stdin, nodes=nodes, cost=cost,
+                        input_lists={list_file: concat_list(files)})
+        self._jobs[(output_file, None)] = job
+        return job
+
+    def _repeat_job(self, clip: Clip, output_file: Path, output_args: ArgumentTypes) -> Optional[RenderJob]:
+        """
+        Encodes one pass of the clip of a RepeatClip with the output arguments into its cache folder
+        and loops it into the output in copy mode. None for other clips or output arguments cutting the output.
+        """
+        from scriptycut.clip import RepeatClip
+        from scriptycut.still import StillFrames
+
+        args = tuple(unpack_args(output_args))
+        if not isinstance(clip, RepeatClip) or isinstance(clip._loop_source, StillFrames) \
+                or _CUTTING_OPTIONS.intersection(args):
+            return None
+
+        key = hashlib.sha1(" ".join((self.layers.name, *args)).encode()).hexdigest()[:12]
+        pass_file = clip.cachedir / f"pass_{key}{output_file.suffix}"
+        encode = self._jobs.get((pass_file, None))
+        if encode is None:
+            if not self._force and pass_file.is_file():
+                encode = RenderJob(clip.clip, [], pass_file, (), is_cache=True, cache_hit=True)
+            else:
+                pass_args, depends, reads_stdin, nodes, cost = self._prepare(clip.clip, self.layers)
+                cost += encode_cost(clip.clip, self.layers, *self._output_codecs)
+                cmd = self._ffmpeg.command((pass_args, FFargOutput(part_file(pass_file), args)))
+                encode = RenderJob(clip.clip, cmd, pass_file, depends, is_cache=True, cache_hit=False,
+                                   reads_stdin=reads_stdin, nodes=nodes, cost=cost)
+            self._jobs[(pass_file, None)] = encode
+
+        inp = FFargInput(pass_file, ("-stream_loop", clip.count - 1),
+                         "v:0" if Layer.V in self.layers else None, "a:0" if Layer.A in self.layers else None)
+        cmd = self._ffmpeg.command((inp, FFargFilter(None, inp.video_spec(0), inp.audio_spec(0)),
+                                    FFargOutput(output_file, ("-c", "copy"))))
+        job = RenderJob(clip, cmd, output_file, (encode, ), is_cache=False, cache_hit=False)
+        self._jobs[(output_file, None)] = job
+        return job
+
+    def _still_output_args(self, output_args: ArgumentTypes) -> tuple[str, ...]:
+        """Output arguments with the video codec of the output, so the encoded GOP can be copied into it"""
+        args = tuple(unpack_args(output_args))
+        if not any(a in ("-c", "-codec", "-c:v", "-codec:v", "-vcodec") for a in args):
+            args += ("-c:v", self._output_codecs[0])
+        return args
+
+    def _still_job(self, clip: Clip, output_file: Optional[Path] = None, output_args: ArgumentTypes = None) -> RenderJob:
+        """Loops the once encoded GOP of a still clip in copy mode"""
+        from scriptycut.still import StillFrames
+
+        still = StillFrames(clip, output_args)
+        is_cache = output_file is None
+        # -t of the input cuts by packet timestamps, which lead the frames with B-frames
+        frames = round(clip.duration * clip.video_fps.as_float)
+        output = FFargOutput(clip.cache_part_file if is_cache else output_file, ("-c", "copy", "-frames:v", frames))
+        inp = still.loop_input_args(clip.duration)
+        cmd = self._ffmpeg.command((inp, FFargFilter(None, inp.video_spec(0), None), output))
+        job = RenderJob(clip, cmd, clip.cache_file if is_cache else output_file, (self._cache_job(still), ),
+                        is_cache, cache_hit=False)
+        self._jobs[(clip.cachedir, clip.available_av_layer) if is_cache else (output_file, None)] = job
+        return job
+
+    @property
+    def cost(self) -> float:
+        """Estimated cost of all jobs"""
+        return sum(job.cost for job in self.jobs)
+
+    def _job_action(self, job: RenderJob) -> str:
+        """How a job produces its output"""
+        from scriptycut.still import StillFrames
+
+        if job.cache_hit:
+            return f"{'segment' if job.is_segment else 'cache'} hit {job.output_file.name}"
+        if any(dep.is_segment for dep in job.depends):
+            action = "join video segments"
+            if Layer.A in self.layers and self.clip.has_audio:
+                action += f", encode {self._output_codecs[1]}"
+        elif job.is_copy:
+            action = "stream copy"
+        elif job.is_segment:
+            action = f"encode {job.output_file.name} {self._output_codecs[0]}"
+        elif isinstance(job.clip, StillFrames) and job.clip.output_args:
+            action = f"encode GOP {job.output_file.name} for the output"
+        elif job.is_cache and not job.output_file.name.startswith("cache."):
+            # Encoded with the output arguments, like one pass of a RepeatClip
+            action = f"encode {job.output_file.name} {'/'.join(str(c) for c in self._output_codecs)}"
+        elif job.is_cache:
+            action = f"cache {job.output_file.name} {CACHE_VIDEO_CODEC}/{CACHE_AUDIO_CODEC}"
+        else:
+            action = f"encode {'/'.join(str(c) for c in self._output_codecs)}"
+        if job.is_piped:
+            action += ", stdin pipe"
+        return action
+
+    def explain(self, profile: RenderProfile = None) -> str:
+        """
+        The physical plan: Each ffmpeg process with the clips fused into it, its inputs, the caches it reads
+        and the estimated cost (see scriptycut.costs). Processes are shown as a tree from the target.
+        :param profile: Profile of a run of this plan to show the actual times
+        """
+        from scriptycut.costs import codec_of
+
+        processes = [job for job in self.jobs if not job.cache_hit]
+        lines = [f"Render {self.clip._autoname} into {self.output_file or 'dependencies'} ({self.layers.name})",
+                 f"{len(processes)} ffmpeg processes, {len(self.jobs) - len(processes)} cache hits, "
+                 f"estimated cost {_format_cost(self.cost)}"]
+        if profile is not None:
+            critical = " -> ".join(n.name for n in profile.critical_path())
+            lines.append(f"actual {profile.wall_time:.2f}s wall, {profile.cpu_time:.2f}s cpu, "
+                         f"critical path: {critical or '-'}")
+
+        shown = set()
+
+        def describe(job: RenderJob, depth: int):
+            indent = "  " * depth
+            line = f"{indent}-> {job.name}  {self._job_action(job)}"
+            if job in shown:
+                lines.append(f"{line}  (see above)")
+                return
+            shown.add(job)
+
+            if not job.cache_hit:
+                line += f"  cost {_format_cost(job.cost)}"
+            node = None if profile is None else profile.nodes.get(str(job.output_file))
+            if node is not None and not node.cache_hit:
+                line += f"  (actual {node.wall_time:.2f}s wall, {node.cpu_time:.2f}s cpu)"
+            lines.append(line)
+
+            fused = [c._autoname for c in job.nodes if c.CACHING is not Caching.NEVER]
+            if fused:
+                lines.append(f"{indent}     fused: {', '.join(fused)}")
+
+            inputs = []
+            for c in job.nodes:
+                if c.CACHING is Caching.NEVER:
+                    codecs = [codec_of(c, layer) or "generated" for layer in (Layer.V, Layer.A)
+                              if layer in c.available_av_layer]
+                    inputs.append(f"{c._autoname} ({'/'.join(codecs)})")
+            if inputs:
+                lines.append(f"{indent}     inputs: {', '.join(inputs)}")
+
+            for dep in job.depends:
+                describe(dep, depth + 1)
+
+        depended = {dep for job in self.jobs for dep in job.depends}
+        for job in reversed(self.jobs):
+            if job not in depended:
+                describe(job, 0)
+
+        return "\n".join(lines)
+
+    def run(self, max_jobs: int = None, engine: Union["ThreadedEngine", "AsyncEngine"] = None) -> RenderProfile:
+        """
+        Runs all jobs. Independent jobs run in parallel.
+        :param max_jobs: Maximum number of parallel ffmpeg processes. Default from THREADS environment variable.
+        :param engine: ThreadedEngine (default) or AsyncEngine
+        :return: Profile of the processed jobs
+        """
+        return (engine or ThreadedEngine()).run(self, max_jobs)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}:{self.jobs}>"
+
+
+class ThreadedEngine:
+    """
+    Runs each ffmpeg process of a RenderPlan in its own JobThread.
+    """
+
+    def __init__(self, timeout: float = None):
+        """
+        :param timeout: Seconds until a single job gets killed
+        """
+        self.timeout = timeout
+
+    def run(self, plan: RenderPlan, max_jobs: int = None) -> RenderProfile:
+        max_jobs = max(1, max_jobs or threads_num)
+        profile = RenderProfile(plan.output_file)
+        finished: Queue[JobThread] = Queue()
+        running: dict[JobThread, RenderJob] = {}
+        pending = list(plan.jobs)
+        done: set[RenderJob] = set()
+        error: Optional[Exception] = None
+
+        while pending or running:
+            for job in tuple(pending):
+                if error is not None or len(running) >= max_jobs:
+                    break
+
+                if not all(d in done for d in job.depends):
+                    continue
+
+                pending.remove(job)
+                if job.cache_hit:
+                    profile.add(job.node_profile())
+                    done.add(job)
+                    continue
+
+                logger.info(f"Rendering {job.name}")
+                running[job.start(finished.put, self.timeout)] = job
+
+            if not running:
+                if error is None and pending:
+                    # Dependencies missing from the plan
+                    error = ClipError(f"Jobs can't start, their dependencies never finish: {pending!r}")
+                if error is not None:
+                    break
+                continue
+
+            thread = finished.get()
+            job = running.pop(thread)
+            profile.add(job.node_profile(thread))
+            try:
+                job.finalize(thread)
+                done.add(job)
+            except ClipError as e:
+                error = e
+
+        profile.finish()
+        if error is not None:
+            raise error
+
+        return profile
+
+
+class AsyncEngine:
+    """
+    Runs all ffmpeg processes of a RenderPlan on one asyncio event loop.
+    On failure or cancellation all other running processes get terminated.
+    No CPU times in the profile: asyncio reaps the processes without rusage.
+    Process exits are watched by pidfds where supported. Else Python up to 3.11 waits in a thread per process.
+    """
+
+    def __init__(self, timeout: float = None, on_progress: Callable[[RenderJob, dict[str, str]], None] = None):
+        """
+        :param timeout: Seconds until a single job gets killed
+        :param on_progress: Called with the job and parsed ffmpeg progress info (frame, out_time_us, speed, ...)
+        """
+        self.timeout = timeout
+        self.on_progress = on_progress
+
+    def run(self, plan: RenderPlan, max_jobs: int = None) -> RenderProfile:
+        with pidfd_child_watcher():
+            return asyncio.run(self.run_async(plan, max_jobs))
+
+    async def run_async(self, plan: RenderPlan, max_jobs: int = None) -> RenderProfile:
+        """Coroutine for usage within a running event loop"""
+        semaphore = asyncio.Semaphore(max(1, max_jobs or threads_num))
+        profile = RenderProfile(plan.output_file)
+        tasks: dict[RenderJob, asyncio.Task] = {}
+
+        async def run_job(job: RenderJob):
+            for dep in job.depends:
+                await tasks[dep]
+
+            if job.cache_hit:
+                profile.add(job.node_profile())
+                return
+
+            on_progress = None
+            if self.on_progress is not None:
+                def on_progress(info: dict[str, str]):
+                    self.on_progress(job, info)
+
+            async with semaphore:
+                logger.info(f"Rendering {job.name}")
+                async_job = job.async_job(self.timeout, on_progress)
+                try:
+                    await async_job
+                finally:
+                    profile.add(job.node_profile(async_job))
+                job.finalize(async_job)
+
+        # Jobs are ordered by dependencies. Tasks of dependencies exist before they're awaited.
+        for job in plan.jobs:
+            tasks[job] = asyncio.ensure_future(run_job(job))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            profile.finish()
+
+        return profile
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+"""
+Timing profile of a render.
+Each processed Clip node reports wall time, CPU time, I/O and cache usage.
+Export as JSON or as Chrome trace events (chrome://tracing, https://ui.perfetto.dev).
+"""
+
+import time
+from json import dumps
+from pathlib import Path
+from typing import Optional
+from dataclasses import dataclass, field, asdict
+
+from scriptycut.common import Pathlike
+
+
+@dataclass
+class NodeProfile:
+    name: str  # Autoname of the Clip
+    clip: str  # repr of the Clip
+    output: str
+    command: list[str]
+    cache_hit: bool
+    depends: list[str] = field(default_factory=list)  # Outputs of the nodes rendered before
+    start: float = 0.  # time.time()
+    end: float = 0.
+    cpu_user: float = 0.  # Seconds, from the rusage of the ffmpeg process
+    cpu_system: float = 0.
+    max_rss_kb: int = 0
+    bytes_read: int = 0  # Sizes of all input files
+    bytes_written: int = 0  # Size of the output file
+    returncode: Optional[int] = None
+    log_file: Optional[str] = None
+
+    @property
+    def wall_time(self) -> float:
+        return self.end - self.start
+
+    @property
+    def cpu_time(self) -> float:
+        return self.cpu_user + self.cpu_system
+
+    def as_dict(self) -> dict:
+        d = asdict(self)
+        d["wall_time"] = self.wall_time
+        d["cpu_time"] = self.cpu_time
+        return d
+
+
+class RenderProfile:
+    def __init__(self, output: Optional[Pathlike] = None):
+        self.output = None if output is None else str(output)
+        self.nodes: dict[str, NodeProfile] = {}  # By output, in order of completion
+        self.started = time.time()
+        self.finished: Optional[float] = None
+
+    def add(self, node: NodeProfile):
+        # Several jobs of one clip (layer caches) have distinct outputs
+        self.nodes[node.output] = node
+
+    def finish(self):
+        self.finished = time.time()
+
+    @property
+    def wall_time(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def cpu_time(self) -> float:
+        return sum(n.cpu_time for n in self.nodes.values())
+
+    def critical_path(self) -> list[NodeProfile]:
+        """
+        The chain of dependent nodes with the longest summed wall time.
+        Only faster processing of these nodes makes the whole render faster. More parallelism won't.
+        """
+        cost: dict[str, float] = {}
+        previous: dict[str, Optional[str]] = {}
+
+        def path_cost(output: str) -> float:
+            if output in cost:
+                return cost[output]
+
+            node = self.nodes[output]
+            deps = [d for d in node.depends if d in self.nodes]
+            best = max(deps, key=path_cost, default=None)
+            previous[output] = best
+            cost[output] = node.wall_time + (0. if best is None else path_cost(best))
+            return cost[output]
+
+        last = max(self.nodes, key=path_cost, default=None)
+        path = []
+        while last is not None:
+            path.append(self.nodes[last])
+            last = previous[last]
+        path.reverse()
+        return path
+
+    def as_dict(self) -> dict:
+        critical = self.critical_path()
+        return {
+            "output": self.output,
+            "started": self.started,
+            "finished": self.finished,
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+            "cache_hits": sum(n.cache_hit for n in self.nodes.values()),
+            "critical_path": [n.name for n in critical],
+            "critical_path_time": sum(n.wall_time for n in critical),
+            "nodes": [n.as_dict() for n in self.nodes.values()],
+        }
+
+    def write_json(self, file: Pathlike):
+        Path(file).write_text(dumps(self.as_dict(), indent=2))
+
+    def chrome_trace_events(self) -> list[dict]:
+        """Trace events format: https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU"""
+        critical = {n.output for n in self.critical_path()}
+        lanes: list[float] = []  # End time of the last node per lane (tid)
+        events = []
+
+        for node in sorted(self.nodes.values(), key=lambda n: n.start):
+            # Reuse the first free lane to show parallel processes side by side
+            tid = next((i for i, end in enumerate(lanes) if end <= node.start), len(lanes))
+            if tid == len(lanes):
+                lanes.append(node.end)
+            else:
+                lanes[tid] = node.end
+
+            event = {
+                "name": node.name,
+                "cat": "cache" if node.cache_hit else "render",
+                "pid": 1,
+                "tid": tid,
+                "ts": (node.start - self.started) * 1e6,
+                "args": {
+                    "clip": node.clip,
+                    "cpu_time": node.cpu_time,
+                    "bytes_read": node.bytes_read,
+                    "bytes_written": node.bytes_written,
+                    "critical_path": node.output in critical,
+                    "command": " ".join(node.command),
+                },
+            }
+
+            if node.cache_hit:
+                event.update(ph="i", s="t")
+            else:
+                event.update(ph="X", dur=node.wall_time * 1e6)
+
+            events.append(event)
+
+        return events
+
+    def write_chrome_trace(self, file: Pathlike):
+        Path(file).write_text(dumps({"traceEvents": self.chrome_trace_events(), "displayTimeUnit": "ms"}))
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}:{len(self.nodes)} nodes, {self.wall_time:.3f}s>"
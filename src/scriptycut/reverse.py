@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+Reversed playback with bounded memory.
+ffmpeg's reverse and areverse filters buffer their whole input. Reverse splits the clip into short chunks
+which get reversed as separate cached jobs (in parallel by the render engine) and joined in reverse order.
+Peak memory per job is bounded by a chunk.
+"""
+
+from bisect import bisect_left
+from typing import Optional
+
+from scriptycut.clip import Clip, ClipSequence
+from scriptycut.clipflags import ClipFlags
+from scriptycut.common import FPS, Caching
+from scriptycut.ffinterface import FFArgsInterface, FFargFilter
+from scriptycut.slice import Trim
+
+# Chunk length. 2 seconds of decoded 4K video are about 600 MB.
+REVERSE_CHUNK_SECONDS = 2.
+
+# Share of the chunk length a chunk bound moves to meet a keyframe
+KEYFRAME_TOLERANCE = .25
+
+
+def chunk_bounds(duration: float, chunk_seconds: float, keyframes: Optional[list[float]] = None) -> list[float]:
+    """
+    Start and end times of consecutive chunks of about chunk_seconds.
+    A bound moves to the nearest keyframe within KEYFRAME_TOLERANCE * chunk_seconds, so seeking to the chunk
+    decodes nothing before it. Without one nearby the chunk starts between keyframes anyway.
+    Chunks stay shorter than (1 + KEYFRAME_TOLERANCE) * chunk_seconds on any GOP length.
+    """
+    tolerance = chunk_seconds * KEYFRAME_TOLERANCE
+    bounds = [0.]
+    while True:
+        t = bounds[-1] + chunk_seconds
+        if keyframes:
+            i = bisect_left(keyframes, t - tolerance)
+            near = [k for k in keyframes[i:i + 2] if bounds[-1] < k <= t + tolerance]
+            if near:
+                t = min(near, key=lambda k: abs(k - t))
+        if t >= duration - chunk_seconds / 4:
+            # Don't leave a tiny last chunk
+            break
+        bounds.append(t)
+    bounds.append(duration)
+    return bounds
+
+
+class ReversedChunk(Clip):
+    """
+    A time range of a clip played backwards. Short enough to be reversed in memory.
+    """
+    # Fused chunks would buffer together within one process
+    CACHING = Caching.ALWAYS
+
+    def __init__(self, clip: Clip, start: float, end: float):
+        self._trim = Trim(clip, start, end)
+
+        Clip.__init__(self)
+        self._video_fps = clip.video_fps
+
+    @property
+    def subclips(self) -> tuple[Clip, ...]:
+        return self._trim,
+
+    @property
+    def flags(self) -> set[ClipFlags]:
+        return self._trim.flags
+
+    @property
+    def duration(self) -> float:
+        return self._trim.duration
+
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        return self._trim.video_resolution
+
+    def ffmpeg_args(self) -> FFArgsInterface:
+        inp = self._trim.input_args()
+        graph = []
+        if inp.video:
+            graph.append(f"[{inp.video_spec(0)}]reverse,setpts=PTS-STARTPTS[v]")
+        if inp.audio:
+            graph.append(f"[{inp.audio_spec(0)}]areverse,asetpts=PTS-STARTPTS[a]")
+        return inp, FFargFilter(";".join(graph), "[v]" if inp.video else None, "[a]" if inp.audio else None)
+
+    def _repr_data(self) -> str:
+        return f"⇆{self._trim!r}"
+
+
+class Reverse(ClipSequence):
+    """
+    Plays a clip backwards. Reversed chunks (aligned to keyframes if known) joined in reverse order.
+    """
+
+    def __init__(self, clip: Clip, chunk_seconds: float = REVERSE_CHUNK_SECONDS):
+        """
+        :param clip: Clip to reverse
+        :param chunk_seconds: Length of the chunks reversed in memory
+        """
+        if chunk_seconds <= 0:
+            raise ValueError("chunk_seconds must be positive.")
+
+        self._clip = clip
+        self._chunk_seconds = chunk_seconds
+
+        bounds = chunk_bounds(clip.duration, chunk_seconds, clip.keyframe_times())
+        chunks = [ReversedChunk(clip, start, end) for start, end in zip(bounds, bounds[1:])]
+        ClipSequence.__init__(self, reversed(chunks), False)
+        self._video_fps = clip.video_fps
+
+    @property
+    def clip(self) -> Clip:
+        return self._clip
+
+    @property
+    def video_fps(self) -> Optional[FPS]:
+        return self._clip.video_fps
+
+    def _repr_data(self) -> str:
+        return f"⇆{self._clip!r}:{self._chunk_seconds}"
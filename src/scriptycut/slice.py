@@ -8,9 +8,11 @@ clip[0:10,5.:6.,-1.]
 Frame 0-9, seconds 5 to 6, last second
 """
 
-from typing import Union
+from typing import Optional, Union
 
-from scriptycut.clip import Clip
+from scriptycut.clip import Clip, InputClip
+from scriptycut.clipflags import ClipFlags
+from scriptycut.ffinterface import FFargInput
 
 def _prepare_slice(slice_info: Union[slice, tuple[slice, ...]], clip_duration: float):
     # Check bounds etc. Calculate duration.
@@ -37,3 +39,76 @@ class Slice(Clip):
 
     def _repr_data(self) -> str:
         return f"{self._clip}↹{self._slice_info!r}"
+
+
+class Trim(InputClip):
+    """
+    Continuous time range of a clip. Read by input seeking (-ss, -t) from the source file or the cache
+    of the clip. Nothing gets decoded before the start or encoded for the trim itself.
+    """
+
+    def __init__(self, clip: Clip, start: float, end: float):
+        """
+        :param clip: Trimmed clip
+        :param start: Start in seconds
+        :param end: End in seconds
+        """
+        if isinstance(clip, Trim):
+            # Seek once within the original clip
+            start, end = clip.start + start, clip.start + end
+            clip = clip.clip
+
+        if start < 0 or end <= start or end > clip.duration + 1e-6:
+            raise ValueError(f"Invalid range {start} to {end} of {clip!r}")
+
+        self._clip = clip
+        self._start = start
+        self._end = end
+
+        InputClip.__init__(self)
+        self._video_fps = clip.video_fps
+
+    @property
+    def clip(self) -> Clip:
+        return self._clip
+
+    @property
+    def start(self) -> float:
+        return self._start
+
+    @property
+    def end(self) -> float:
+        return self._end
+
+    @property
+    def subclips(self) -> tuple[Clip, ...]:
+        return self._clip,
+
+    @property
+    def flags(self) -> set[ClipFlags]:
+        return self._clip.flags
+
+    @property
+    def duration(self) -> float:
+        return self._end - self._start
+
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        return self._clip.video_resolution
+
+    @property
+    def video_format(self):
+        return self._clip.video_format
+
+    @property
+    def audio_format(self):
+        return self._clip.audio_format
+
+    def input_args(self) -> FFargInput:
+        inp = self._clip.input_args()
+        # Behind the existing options, so they override a duration of generated inputs
+        return FFargInput(inp.input_file, (*inp.args()[:-2], "-ss", self._start, "-t", self.duration),
+                          inp.video, inp.audio)
+
+    def _repr_data(self) -> str:
+        return f"{self._clip!r}[{self._start}:{self._end}]"
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+Speed changes and timelapses.
+Fast timelapses read keyframes only: Other frames are dropped by the demuxer and never decoded.
+"""
+
+from typing import Optional
+
+from scriptycut.clip import Clip
+from scriptycut.clipflags import ClipFlags
+from scriptycut.common import FPS
+from scriptycut.ffinterface import FFArgsInterface, FFargFilter
+
+# Keyframes are read only from this factor on by default, and only if the keyframes are dense enough:
+# A timelapse shows a frame per factor / fps seconds of source. With fewer keyframes, frames repeat and it stutters.
+# Sources with keyframes every few seconds need factors of about 50 to 250.
+KEYFRAMES_MIN_FACTOR = 10.
+
+# atempo keeps the best quality within this range per instance
+_ATEMPO_MIN = .5
+_ATEMPO_MAX = 2.
+
+
+def atempo_chain(factor: float) -> str:
+    """atempo filters changing the tempo by factor in steps of good quality"""
+    steps = []
+    while factor > _ATEMPO_MAX:
+        steps.append(_ATEMPO_MAX)
+        factor /= _ATEMPO_MAX
+    while factor < _ATEMPO_MIN:
+        steps.append(_ATEMPO_MIN)
+        factor /= _ATEMPO_MIN
+    steps.append(factor)
+    return ",".join(f"atempo={s}" for s in steps)
+
+
+class Speed(Clip):
+    """
+    Plays a clip faster (factor > 1) or slower. The frame rate is kept: Frames are dropped or repeated.
+    Audio changes its tempo without changing the pitch.
+    """
+
+    def __init__(self, clip: Clip, factor: float, keyframes_only: Optional[bool] = None, audio=True):
+        """
+        :param clip: Clip to speed up or slow down
+        :param factor: Speed factor. 2 plays twice as fast, .5 in slow motion.
+        :param keyframes_only: Read keyframes only. Default: For factors from KEYFRAMES_MIN_FACTOR on
+                               if the source has a keyframe at least every output frame.
+        :param audio: Keep the audio
+        """
+        if factor <= 0:
+            raise ValueError("Speed factor must be positive.")
+
+        if keyframes_only is None:
+            keyframes_only = factor >= KEYFRAMES_MIN_FACTOR and self.dense_keyframes(clip, factor)
+
+        self._clip = clip
+        self._factor = factor
+        self._keyframes_only = keyframes_only and clip.has_video
+        self._audio = audio and clip.has_audio
+
+        Clip.__init__(self)
+        self._video_fps = clip.video_fps
+
+    @staticmethod
+    def dense_keyframes(clip: Clip, factor: float) -> bool:
+        """Whether clip has a keyframe per output frame on average at speed factor. False if unknown."""
+        fps = clip.video_fps
+        keyframes = clip.keyframe_times() if clip.has_video and fps is not None else None
+        if not keyframes or len(keyframes) < 2:
+            return False
+        interval = (keyframes[-1] - keyframes[0]) / (len(keyframes) - 1)
+        return interval <= factor / fps.as_float
+
+    @property
+    def clip(self) -> Clip:
+        return self._clip
+
+    @property
+    def factor(self) -> float:
+        return self._factor
+
+    @property
+    def subclips(self) -> tuple[Clip, ...]:
+        return self._clip,
+
+    @property
+    def flags(self) -> set[ClipFlags]:
+        if self._audio:
+            return self._clip.flags
+        return ClipFlags.merge_from_clips(self._clip, exclude=ClipFlags.HasAudio)
+
+    @property
+    def duration(self) -> float:
+        return self._clip.duration / self._factor
+
+    @property
+    def video_fps(self) -> Optional[FPS]:
+        return self._clip.video_fps
+
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        return self._clip.video_resolution
+
+    def ffmpeg_args(self) -> FFArgsInterface:
+        inp = self._clip.input_args()
+        if self._keyframes_only:
+            # Dropped by the demuxer. The decoder option covers demuxers not supporting it.
+            inp = inp.with_options(("-discard:v", "nokey", "-skip_frame", "nokey"))
+
+        graph = []
+        video = audio = None
+        if inp.video:
+            fps = self._clip.video_fps or self._fps_hint
+            graph.append(f"[{inp.video_spec(0)}]setpts=(PTS-STARTPTS)/{self._factor},"
+                         f"fps={fps.numerator}/{fps.denominator}[v]")
+            video = "[v]"
+
+        if self._audio and inp.audio:
+            graph.append(f"[{inp.audio_spec(0)}]{atempo_chain(self._factor)}[a]")
+            audio = "[a]"
+
+        return inp, FFargFilter(";".join(graph), video, audio)
+
+    def _repr_data(self) -> str:
+        return f"{self._clip}×{self._factor}:{int(self._keyframes_only)}:{int(self._audio)}"
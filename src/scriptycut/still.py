@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fast path for still clips like ImageClip and ColorClip.
+Only a short GOP of the picture gets encoded once. The full duration is produced by looping it
+with -stream_loop in copy mode, which costs milliseconds instead of an encode of every identical frame.
+"""
+
+from typing import Optional
+
+from scriptycut.clip import Clip
+from scriptycut.clipflags import ClipFlags
+from scriptycut.common import FPS
+from scriptycut.ffinterface import FFArgsInterface, FFargInput, FFargFilter, FFargOutput, ArgumentTypes, unpack_args
+
+# Length of the encoded GOP. Whole seconds keep loop timestamps exact in Matroska's millisecond timebase.
+STILL_GOP_SECONDS = 1
+
+
+class StillFrames(Clip):
+    """
+    The first STILL_GOP_SECONDS of a still clip, encoded once and looped by loop_input_args().
+    """
+
+    def __init__(self, clip: Clip, output_args: ArgumentTypes = None):
+        """
+        :param clip: Still clip with video only
+        :param output_args: Encoding arguments matching the final output. Default: cache codec.
+        """
+        if not clip.is_still or clip.video_fps is None:
+            raise ValueError(f"{clip!r} is not a still clip with a known frame rate.")
+
+        self._clip = clip
+        self._output_args = tuple(unpack_args(output_args))
+        self._frames = max(1, round(clip.video_fps.as_float * STILL_GOP_SECONDS))
+
+        Clip.__init__(self)
+        self._video_fps = clip.video_fps
+
+    @property
+    def clip(self) -> Clip:
+        return self._clip
+
+    @property
+    def output_args(self) -> tuple[str, ...]:
+        """Encoding arguments of the GOP. Empty for the cache codec."""
+        return self._output_args
+
+    @property
+    def subclips(self) -> tuple[Clip, ...]:
+        return self._clip,
+
+    @property
+    def flags(self) -> set[ClipFlags]:
+        return {ClipFlags.HasVideo}
+
+    @property
+    def duration(self) -> float:
+        return self._frames * self._video_fps.frame_time
+
+    @property
+    def video_fps(self) -> Optional[FPS]:
+        return self._clip.video_fps
+
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        return self._clip.video_resolution
+
+    def ffmpeg_args(self) -> FFArgsInterface:
+        inp = self._clip.input_args()
+        return inp, FFargFilter(f"[{inp.video_spec(0)}]trim=end_frame={self._frames},setpts=PTS-STARTPTS[v]",
+                                "[v]", None)
+
+    def cache_output_args(self) -> FFargOutput:
+        if not self._output_args:
+            return Clip.cache_output_args(self)
+        return FFargOutput(self.cache_part_file, self._output_args)
+
+    def loop_input_args(self, duration: float) -> FFargInput:
+        """Input repeating the encoded GOP for duration seconds"""
+        return self.input_args().with_options(("-stream_loop", -1, "-t", duration))
+
+    def _repr_data(self) -> str:
+        return f"{self._clip}:{self._frames}:{' '.join(map(str, self._output_args))}"
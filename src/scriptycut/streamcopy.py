@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+"""
+Rendering sequences by stream copy.
+Ranges of source files between keyframes are copied into the output without decoding. Only the rest gets encoded:
+Processed parts like crossfades and overlay windows, and the frames between a cut and the nearest keyframe.
+Still parts like ColorClip and ImageClip get one GOP encoded, which is looped into their segment in copy mode.
+
+Segments are video only MP4 files in the cache folders of the parts, joined by the concat demuxer.
+It converts H.264 from MP4 to Annex B with the parameter sets of each segment in-band,
+so segments of different encoders join. Audio is encoded as usual.
+
+Requirements, else everything gets encoded:
+- H.264 output without video filters.
+- Copied sources in H.264 with the output's resolution and pixel format at a constant frame rate.
+- Closed GOPs as written by most encoders: The frames between two keyframes are all decoded before the second one.
+"""
+
+import math
+import hashlib
+from pathlib import Path
+from typing import Optional, TYPE_CHECKING
+
+from scriptycut.clip import Clip
+from scriptycut.common import FPS
+from scriptycut.ffinterface import ArgumentTypes, FFArgs, FFargFilter, unpack_args
+
+if TYPE_CHECKING:
+    from scriptycut.fileclip import FileClip
+    from scriptycut.still import StillFrames
+
+COPY_CODECS = {"h264"}
+
+# Output options changing the video. Copied frames can't follow them.
+VIDEO_CHANGING_OPTIONS = {"-vf", "-filter:v", "-filter_complex", "-s", "-r", "-pix_fmt", "-aspect", "-ss", "-t", "-to",
+                          "-frames:v", "-vframes", "-vn"}
+
+# Time scale of all segments, so the concat demuxer joins them without rounding
+SEGMENT_TIMESCALE = 90000
+
+# Cuts closer to a keyframe than this are made at the keyframe
+KEYFRAME_TOLERANCE = 1e-3
+
+# H.264 profiles of probed streams and their libx264 names. Encoded segments match the copied ones.
+_X264_PROFILES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+}
+
+
+class Segment:
+    """
+    A part of the output video in its own file: A range of a source file copied from keyframe to keyframe,
+    the looped GOP of a still clip or a clip encoded.
+    """
+
+    def __init__(self, clip: Clip, copy=False, frames: Optional[int] = None):
+        """
+        :param clip: Clip to encode. For copies the FileClip or Trim of a FileClip.
+        :param copy: Copy the packets of the source
+        :param frames: Number of frames. Cuts between frames are rounded down to the frame shown at the cut.
+                       None: Until the end of the clip.
+        """
+        self.clip = clip
+        self.copy = copy
+        self.frames = frames
+
+    @property
+    def looped(self) -> bool:
+        """The GOP of a still clip gets encoded once and looped"""
+        return not self.copy and _is_looped_still(self.clip)
+
+    @property
+    def source(self) -> Optional["FileClip"]:
+        """Source file clip of the segment"""
+        source_range = _source_range(self.clip)
+        return None if source_range is None else source_range[0]
+
+    def file(self, output_args: tuple[str, ...]) -> Path:
+        """Segment file in the cache folder of the clip. Encoded ones per output arguments."""
+        if self.copy:
+            return self.clip.cachedir / "copy.mp4"
+        key = hashlib.sha1(" ".join(output_args).encode()).hexdigest()[:12]
+        return self.clip.cachedir / f"segment_{key}.mp4"
+
+    def __repr__(self):
+        action = "copy" if self.copy else "loop" if self.looped else "encode"
+        return f"<{self.__class__.__name__}:{action} {self.clip!r}>"
+
+
+def _is_looped_still(clip: Clip) -> bool:
+    """Still clips longer than their GOP"""
+    from scriptycut.still import STILL_GOP_SECONDS
+
+    return clip.is_still and clip.video_fps is not None and clip.duration > STILL_GOP_SECONDS
+
+
+def _source_range(clip: Clip) -> Optional[tuple["FileClip", float, float]]:
+    """Source file and time range of a FileClip or a Trim of one"""
+    from scriptycut.fileclip import FileClip
+    from scriptycut.slice import Trim
+
+    if isinstance(clip, FileClip):
+        return clip, 0., clip.duration
+    if isinstance(clip, Trim) and isinstance(clip.clip, FileClip):
+        return clip.clip, clip.start, clip.end
+    return None
+
+
+def copy_format(source: "FileClip") -> Optional[tuple]:
+    """Properties all copied sources need in common. None if the video of source can't be copied."""
+    fmt = source.video_format
+    if fmt is None or fmt.codec_name not in COPY_CODECS:
+        return None
+    stream = [s for s in source.all_streams_info if s.get("codec_type") == "video"][source.video_streamindex]
+    if stream.get("r_frame_rate") != stream.get("avg_frame_rate") or source.video_fps is None:
+        # Variable frame rate. Frames can't be counted by time.
+        return None
+    return fmt.codec_name, fmt.width, fmt.height, fmt.pix_fmt, str(source.video_fps), fmt.profile
+
+
+def _parts(clip: Clip) -> list[Clip]:
+    parts = clip.stream_copy_parts()
+    if parts is None:
+        return [clip]
+    return [p for part in parts for p in _parts(part)]
+
+
+def plan_segments(clip: Clip, video_codec: Optional[str], output_args: ArgumentTypes = None
+                  ) -> Optional[tuple[list[Segment], tuple]]:
+    """
+    Splits the video of a clip into copied and encoded segments.
+    :param video_codec: Codec of the output
+    :return: Segments in play order and the copy_format() of the copied ones, else the format of the output.
+             None if nothing can be copied or looped.
+    """
+    if video_codec not in COPY_CODECS or not clip.has_video or clip.stream_copy_parts() is None:
+        return None
+    if VIDEO_CHANGING_OPTIONS.intersection(unpack_args(output_args)):
+        return None
+
+    parts = _parts(clip)
+    ranges = [_source_range(p) for p in parts]
+    fmt = next((f for r in ranges if r is not None and (f := copy_format(r[0])) is not None), None)
+    rates = {p.video_fps for p in parts}
+    if fmt is None and len(rates) == 1 and None not in rates and any(_is_looped_still(p) for p in parts):
+        # Only stills to loop: Segments in the format of a plain encode
+        fmt = video_codec, *parts[0].video_resolution, "yuv420p", str(parts[0].video_fps), None
+    if fmt is None or fmt[0] != video_codec:
+        return None
+    resolution = fmt[1], fmt[2]
+    if any(not p.has_video or p.video_resolution != resolution for p in parts):
+        # Would need black frames or scaling within the sequence
+        return None
+
+    from scriptycut.slice import Trim
+
+    def frames_of(clip: Clip) -> int:
+        """Frames of an encoded segment. Seeking starts at the frame shown at the start time."""
+        source_range = _source_range(clip)
+        if source_range is None:
+            return round(clip.duration * fps)
+        rate = source_range[0].video_fps.as_float
+        return math.floor(source_range[2] * rate + KEYFRAME_TOLERANCE) - \
+            math.floor(source_range[1] * rate + KEYFRAME_TOLERANCE)
+
+    fps = FPS(fmt[4]).as_float
+    segments = []
+    for part, source_range in zip(parts, ranges):
+        if source_range is None or copy_format(source_range[0]) != fmt:
+            segments.append(Segment(part, frames=frames_of(part)))
+            continue
+
+        source, start, end = source_range
+        keyframes = source.keyframe_times() or []
+        to_end = end >= source.duration - KEYFRAME_TOLERANCE
+        first = next((k for k in keyframes if k >= start - KEYFRAME_TOLERANCE), None)
+        last = end if to_end else next((k for k in reversed(keyframes) if k <= end + KEYFRAME_TOLERANCE), None)
+        if first is None or last is None or last - first < KEYFRAME_TOLERANCE:
+            # No keyframe within
+            segments.append(Segment(part, frames=frames_of(part)))
+            continue
+
+        if first > start + KEYFRAME_TOLERANCE:
+            # Frames from the cut to the keyframe
+            head = Trim(source, start, first)
+            segments.append(Segment(head, frames=frames_of(head)))
+        copied = source if first <= KEYFRAME_TOLERANCE and to_end else Trim(source, first, last)
+        segments.append(Segment(copied, copy=True, frames=None if to_end else round((last - first) * fps)))
+        if last < end - KEYFRAME_TOLERANCE:
+            tail = Trim(source, last, end)
+            segments.append(Segment(tail, frames=frames_of(tail)))
+
+    if not any(s.copy or s.looped for s in segments):
+        return None
+    return segments, fmt
+
+
+def copy_args(segment: Segment) -> tuple[tuple[FFArgs, ...], tuple[str, ...]]:
+    """ffmpeg arguments and output arguments copying the packets of a segment from the keyframe at its start"""
+    source, start, _ = _source_range(segment.clip)
+    # Seeking in copy mode starts at the last keyframe before the time. A quarter frame behind is safe from rounding.
+    inp = source.input_args().with_options(("-ss", start + .25 / source.video_fps.as_float))
+    args = ["-c", "copy", "-avoid_negative_ts", "make_zero", "-video_track_timescale", SEGMENT_TIMESCALE]
+    if segment.frames is not None:
+        # Packets in decoding order: All frames before the next keyframe
+        args += ["-frames:v", segment.frames]
+    return (inp, FFargFilter(None, inp.video_spec(0), None)), tuple(str(a) for a in args)
+
+
+def loop_args(segment: Segment, gop: "StillFrames") -> tuple[tuple[FFArgs, ...], tuple[str, ...]]:
+    """ffmpeg arguments and output arguments looping the encoded GOP of a still segment"""
+    inp = gop.loop_input_args(segment.clip.duration)
+    args = ["-c", "copy", "-video_track_timescale", SEGMENT_TIMESCALE]
+    if segment.frames is not None:
+        args += ["-frames:v", segment.frames]
+    return (inp, FFargFilter(None, inp.video_spec(0), None)), tuple(str(a) for a in args)
+
+
+def encode_output_args(output_args: ArgumentTypes, fmt: tuple, frames: Optional[int]) -> tuple[str, ...]:
+    """Output arguments of encoded segments: The output's encoder settings in the format of the copied ones"""
+    _, _, _, pix_fmt, fps, profile = fmt
+    args = [*unpack_args(output_args), "-an", "-sn", "-pix_fmt", pix_fmt, "-r", fps,
+            "-video_track_timescale", SEGMENT_TIMESCALE]
+
+    encoder = None
+    for option, value in zip(args, args[1:]):
+        if option in ("-c", "-codec", "-c:v", "-codec:v", "-vcodec"):
+            encoder = value
+    if encoder in (None, "libx264") and profile in _X264_PROFILES:
+        args += ["-profile:v", _X264_PROFILES[profile]]
+
+    if frames is not None:
+        args += ["-frames:v", frames]
+    return tuple(str(a) for a in args)
+
+
+def concat_list(files: list[Path]) -> str:
+    """Input file of the concat demuxer"""
+    def quote(path: Path) -> str:
+        return "'" + str(path).replace("'", "'\\''") + "'"
+    return "".join(f"file {quote(f)}\n" for f in files)
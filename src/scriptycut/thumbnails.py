@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""
+Thumbnails and contact sheets of a Clip.
+All requested frames are extracted by a single ffmpeg pass (select or fps, scale, tile).
+Results are cached in the clip's cache folder.
+"""
+
+import re
+import json
+import hashlib
+from fractions import Fraction
+from pathlib import Path
+from subprocess import run
+from typing import Optional, Iterable
+
+from scriptycut.clip import Clip, ClipError
+from scriptycut.ffinterface import FFargFilter, FFargOutput
+
+THUMBNAIL_SIZE = 320, -2  # -1 or -2 keep the aspect ratio. -2 keeps the size even.
+
+
+def select_times_expr(times: Iterable[float]) -> str:
+    """select filter expression picking the first frame at or after each time"""
+    # prev_pts is NAN for the first frame
+    return "+".join(f"gte(t,{t})*(isnan(prev_pts)+lt(prev_pts*TB,{t}))" for t in times)
+
+
+def _frames_of_times(log: str, times: list[float]) -> list[int]:
+    """
+    Index of the extracted frame for each of the sorted times: The first frame at or after it.
+    Times falling on one frame share it. Times beyond the last frame are left out.
+    :param log: ffmpeg output with the showinfo filter after select
+    """
+    num, den = re.search(r"config in time_base: (\d+)/(\d+)", log).groups()
+    time_base = Fraction(int(num), int(den))
+    frame_times = [int(pts) * time_base for pts in re.findall(r"\bn: *\d+ +pts: *(-?\d+)", log)]
+    indexes = []
+    frame = 0
+    for t in times:
+        while frame < len(frame_times) and frame_times[frame] < Fraction(t):
+            frame += 1
+        if frame == len(frame_times):
+            break
+        indexes.append(frame)
+    return indexes
+
+
+def _extract(clip: Clip, name: str, params: dict, graph: str, output_name: str, output_args: tuple,
+             keyframes_only: bool, times: Optional[list[float]] = None) -> list[Path]:
+    """
+    Runs the extraction once and returns the cached files
+    :param times: Sorted times selected by graph, which shows them by the showinfo filter. One file per time.
+    """
+    from scriptycut.analysis import source_stamps
+    from scriptycut.fftools import FFMPEG
+    from scriptycut.render import source_input
+
+    stamps = source_stamps(clip)
+    key = hashlib.sha1(json.dumps({**params, "graph": graph}, sort_keys=True).encode()).hexdigest()[:16]
+    folder = clip.cachedir / name / key
+    index_file = folder / "index.json"
+    if index_file.is_file():
+        index = json.loads(index_file.read_text())
+        if index.get("source") == stamps:
+            return [folder / f for f in index["files"]]
+
+    folder.mkdir(parents=True, exist_ok=True)
+    for old in folder.glob("*.png"):
+        old.unlink()
+
+    inp = source_input(clip)
+    if keyframes_only:
+        # Decoders skip everything but keyframes. Much faster on long GOPs.
+        inp = inp.with_options(("-skip_frame", "nokey"))
+
+    cmd = FFMPEG().command((inp, FFargFilter(f"[{inp.video_spec(0)}]{graph}[v]", "[v]", None),
+                            FFargOutput(folder / output_name, output_args)))
+    res = run(cmd, capture_output=True, text=True, errors="replace")
+    if res.returncode != 0:
+        raise ClipError(f"Extracting {name} of {clip!r} failed:\n{res.stderr[-2000:]}")
+
+    files = sorted(f.name for f in folder.glob("*.png"))
+    if times is not None:
+        files = [files[i] for i in _frames_of_times(res.stderr, times)]
+    index_file.write_text(json.dumps({"params": params, "source": stamps, "files": files}))
+    return [folder / f for f in files]
+
+
+def _scale(size: tuple[int, int]) -> str:
+    return f"scale={size[0]}:{size[1]}"
+
+
+def thumbnails(clip: Clip, times: Optional[Iterable[float]] = None, every: Optional[float] = None,
+               size: tuple[int, int] = THUMBNAIL_SIZE, keyframes_only=False) -> list[Path]:
+    """
+    Extracts frames as PNG files in one pass.
+    :param clip: Clip with video
+    :param times: Seconds of the frames. The first frame at or after each time is taken.
+    :param every: Alternative to times: One frame every n seconds
+    :param size: Thumbnail size (width, height). -1 or -2 keep the aspect ratio.
+    :param keyframes_only: Decode keyframes only. The nearest keyframe after each time is taken.
+    :return: PNG files in the order of time, one per time. Times on the same frame share its file.
+             Times beyond the end are missing.
+    """
+    if not clip.has_video:
+        raise ValueError(f"{clip!r} has no video.")
+    if (times is None) == (every is None):
+        raise ValueError("Specify either times or every.")
+
+    if times is not None:
+        times = sorted(float(t) for t in times)
+        if not times:
+            return []
+        # showinfo logs the time of each selected frame to assign it to the times
+        select = f"select='{select_times_expr(times)}',showinfo"
+    else:
+        if every <= 0:
+            raise ValueError("every must be positive.")
+        select = f"fps=1/{every}:round=up"
+
+    params = {"times": times, "every": every, "size": tuple(size), "keyframes_only": keyframes_only}
+    return _extract(clip, "thumbnails", params, f"{select},{_scale(size)}", "thumb_%05d.png",
+                    ("-fps_mode", "vfr"), keyframes_only, times)
+
+
+def contact_sheet(clip: Clip, cols: int = 4, rows: int = 4, size: tuple[int, int] = THUMBNAIL_SIZE,
+                  keyframes_only=False) -> Path:
+    """
+    A single image of cols * rows frames evenly spread over the clip.
+    :param clip: Clip with video
+    :param cols: Tiles per row
+    :param rows: Tiles per column
+    :param size: Size of a tile (width, height). -1 or -2 keep the aspect ratio.
+    :param keyframes_only: Decode keyframes only
+    :return: PNG file
+    """
+    if not clip.has_video:
+        raise ValueError(f"{clip!r} has no video.")
+    if cols < 1 or rows < 1:
+        raise ValueError("cols and rows must be at least 1.")
+
+    count = cols * rows
+    step = clip.duration / count
+    times = [round(step * (i + .5), 6) for i in range(count)]
+
+    params = {"times": times, "cols": cols, "rows": rows, "size": tuple(size), "keyframes_only": keyframes_only}
+    graph = f"select='{select_times_expr(times)}',{_scale(size)},tile={cols}x{rows}"
+    files = _extract(clip, "contact_sheet", params, graph, "sheet.png", ("-frames:v", 1), keyframes_only)
+    if not files:
+        raise ClipError(f"No frames for a contact sheet of {clip!r}")
+    return files[0]
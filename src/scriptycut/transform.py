@@ -5,10 +5,12 @@ Basic transformations for clips.
 Probably needed to match resolutions between clips.
 """
 
+from typing import Optional
 from collections.abc import Generator
 
 from scriptycut.clip import Clip
 from scriptycut.clipflags import ClipFlags
+from scriptycut.ffinterface import FFArgsInterface, FFargFilter
 
 
 def _check_options(options: str) -> str:
@@ -70,19 +72,43 @@ class Scale(Clip):
                  keep_aspect=True, center=True, custom: str = None):
 
         if custom:
-            if any((width, height, keep_aspect)):
+            if any((width, height)):
                 raise TypeError("When specifying 'custom', other arguments are not allowed.")
+        elif not any((width, height)):
+            raise TypeError("Specify at least width or height.")
 
-
+        if not clip.has_video:
+            raise RuntimeError("Scale only works for clips containing a video stream.")
 
         self._clip = clip
-        self._options = custom if custom is not None else ""
+        self._resolution = (width, height) if width and height else None
+        self._options = custom if custom is not None else _scale_filter(width, height, keep_aspect, center)
         Clip.__init__(self)
 
     @property
     def clip(self) -> Clip:
         return self._clip
 
+    @property
+    def subclips(self) -> tuple[Clip, ...]:
+        return self._clip,
+
+    @property
+    def flags(self) -> set[ClipFlags]:
+        return self._clip.flags
+
+    @property
+    def duration(self) -> float:
+        return self._clip.duration
+
+    @property
+    def video_fps(self):
+        return self._clip.video_fps
+
+    @property
+    def video_resolution(self) -> Optional[tuple[int, int]]:
+        return self._resolution
+
     # def iter_sequenced_clips(self) -> Generator[Clip, None, None]:
     #     yield from self._clip.iter_sequenced_clips()
 
@@ -90,5 +116,22 @@ class Scale(Clip):
         yield from self._clip.iter_all_clips()
         yield self
 
+    def ffmpeg_args(self) -> FFArgsInterface:
+        inp = self._clip.input_args()
+        return inp, FFargFilter(f"[{inp.video_spec(0)}]{self._options}[v]", "[v]", inp.audio_spec(0))
+
     def _repr_data(self) -> str:
         return f"{self._clip}:{self._options}"
+
+
+def _scale_filter(width: Optional[int], height: Optional[int], keep_aspect: bool, center: bool) -> str:
+    if not (width and height):
+        # Other side follows the aspect ratio
+        return f"scale={width or -2}:{height or -2},setsar=1"
+
+    if not keep_aspect:
+        return f"scale={width}:{height},setsar=1"
+
+    # Fit into and add black bars
+    pos = "(ow-iw)/2:(oh-ih)/2" if center else "0:0"
+    return f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:{pos},setsar=1"
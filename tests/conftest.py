@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+from scriptycut.cache import Cache
+from scriptycut.clip import Clip
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None,
+                                     reason="ffmpeg and ffprobe required")
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path):
+    """Fresh root cache per test"""
+    previous = Clip._root_cache
+    cache = Cache(tmp_path / "cache", auto_discard_orphans=False)
+    Clip.set_root_cache(cache)
+    yield cache
+    Clip.set_root_cache(previous)
+
+
+@pytest.fixture(scope="session")
+def media(tmp_path_factory):
+    """
+    Encodes a source file: 6 s of H.264 video (320x180, 25 fps, keyframe each second) with AAC audio.
+    """
+    if shutil.which("ffmpeg") is None:
+        pytest.skip("ffmpeg required")
+    file = tmp_path_factory.mktemp("media") / "source.mp4"
+    subprocess.run(["ffmpeg", "-v", "error", "-y",
+                    "-f", "lavfi", "-i", "testsrc2=size=320x180:rate=25:duration=6",
+                    "-f", "lavfi", "-i", "sine=frequency=440:duration=6",
+                    "-c:v", "libx264", "-preset", "ultrafast", "-g", "25", "-keyint_min", "25", "-sc_threshold", "0",
+                    "-pix_fmt", "yuv420p", "-c:a", "aac", str(file)], check=True)
+    return file
+
+
+def probe_streams(file) -> dict[str, tuple[int, float]]:
+    """Codec type: (frames or packets, duration) of the streams of a file"""
+    res = subprocess.run(["ffprobe", "-v", "error", "-count_packets", "-show_entries",
+                          "stream=codec_type,nb_read_packets:format=duration", "-of", "csv=p=0", str(file)],
+                         capture_output=True, text=True, check=True)
+    lines = res.stdout.split()
+    duration = float(lines[-1])
+    return {kind: (int(count), duration) for kind, count in (line.split(",") for line in lines[:-1])}
+
+
+def read_frames(file, pix_fmt="rgb24") -> np.ndarray:
+    """Decoded frames of a file as (N, H, W, 3) uint8 array"""
+    res = subprocess.run(["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height",
+                          "-of", "csv=p=0", str(file)], capture_output=True, text=True, check=True)
+    width, height = map(int, res.stdout.split(","))
+    res = subprocess.run(["ffmpeg", "-v", "error", "-i", str(file), "-map", "0:v:0", "-f", "rawvideo",
+                          "-pix_fmt", pix_fmt, "-"], capture_output=True, check=True)
+    return np.frombuffer(res.stdout, np.uint8).reshape(-1, height, width, 3)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import subprocess
+
+import numpy as np
+import pytest
+
+from scriptycut import analysis
+from scriptycut.fileclip import FileClip
+
+from .conftest import requires_ffmpeg
+
+
+def encode(file, *inputs: str, graph: str):
+    """Encodes lavfi sources joined by a filter graph"""
+    args = [a for source in inputs for a in ("-f", "lavfi", "-i", source)]
+    subprocess.run(["ffmpeg", "-v", "error", "-y", *args, "-filter_complex", graph, str(file)], check=True)
+    return file
+
+
+@pytest.fixture
+def black_start(tmp_path):
+    """1 s black, then 2 s testsrc2"""
+    return encode(tmp_path / "black_start.mkv", "color=black:s=160x90:r=25:d=1", "testsrc2=s=160x90:r=25:d=2",
+                  graph="[0][1]concat")
+
+
+@pytest.fixture
+def silent_middle(tmp_path):
+    """1 s sine, 1 s silence, 1 s sine"""
+    return encode(tmp_path / "silent_middle.wav", "sine=frequency=440:d=1", "anullsrc=r=48000:cl=mono:d=1",
+                  "sine=frequency=440:d=1", graph="[0][1][2]concat=n=3:v=0:a=1")
+
+
+def no_analysis(*args):
+    raise AssertionError("analyzed again")
+
+
+@requires_ffmpeg
+def test_video_analysis(black_start, monkeypatch):
+    clip = FileClip(black_start)
+
+    (black, ) = clip.black_segments()
+    assert black == pytest.approx([0, 1], abs=.05)
+    (change, ) = clip.scene_changes()
+    assert change == pytest.approx(1, abs=.05)
+
+    # Both come from the stored pass
+    monkeypatch.setattr(analysis, "_run_analysis", no_analysis)
+    assert len(FileClip(black_start).black_segments(min_duration=2)) == 0
+
+
+@requires_ffmpeg
+def test_video_reanalyzed_when_source_changes(black_start, media):
+    assert len(FileClip(black_start).black_segments()) == 1
+    black_start.write_bytes(media.read_bytes())
+
+    assert len(FileClip(black_start).black_segments()) == 0
+
+
+@requires_ffmpeg
+def test_audio_analysis(silent_middle, monkeypatch):
+    result = FileClip(silent_middle).audio_analysis()
+
+    (silence, ) = result.silences()
+    assert silence == pytest.approx([1, 2], abs=.05)
+    assert len(result.times) == 30
+    # The sine source has an amplitude of 1/8
+    assert result.peak_db[:10] == pytest.approx(-18.06, abs=.1)
+    assert (result.peak_db[12:18] < -90).all()
+    assert np.isfinite(result.loudness["integrated"])
+    assert f"measured_I={result.loudness['integrated']}" in result.loudnorm_args()
+
+    monkeypatch.setattr(analysis, "_run_analysis", no_analysis)
+    assert np.array_equal(FileClip(silent_middle).audio_analysis().rms_db, result.rms_db)
+
+
+@requires_ffmpeg
+def test_audio_reanalyzed_when_source_changes(silent_middle, tmp_path):
+    assert len(FileClip(silent_middle).audio_analysis().silences()) == 1
+    encode(tmp_path / "sine.wav", "sine=frequency=440:d=3", graph="[0]anull").replace(silent_middle)
+
+    assert len(FileClip(silent_middle).audio_analysis().silences()) == 0
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import asyncio
+import threading
+
+import pytest
+
+from scriptycut import generate
+from scriptycut.asyncjobs import AsyncJob, parse_progress_block, pidfd_child_watcher
+from scriptycut.render import AsyncEngine, RenderPlan
+
+from .conftest import probe_streams, requires_ffmpeg
+
+
+def test_parse_progress_block():
+    assert parse_progress_block(["frame=12", "out_time_us=500000", "speed=2.5x", "progress=continue"]) == \
+        {"frame": "12", "out_time_us": "500000", "speed": "2.5x", "progress": "continue"}
+
+
+def test_feed_stdin_and_read_stdout():
+    received = []
+
+    async def read(reader: asyncio.StreamReader):
+        received.append(await reader.read())
+
+    job = AsyncJob(["cat"], stdin=(b"x" * 100000 for _ in range(10)), read_stdout=read)
+    result = asyncio.run(job.run())
+
+    assert result.returncode == 0
+    assert received == [b"x" * 1000000]
+
+
+def test_timeout_kills():
+    job = AsyncJob(["sleep", "10"], timeout=.2)
+    result = asyncio.run(job.run())
+
+    assert result.returncode < 0
+    assert job.wall_time < 5
+
+
+def test_cancel_terminates():
+    job = AsyncJob(["sleep", "10"])
+
+    async def cancel_soon():
+        task = asyncio.ensure_future(job.run())
+        await asyncio.sleep(.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_soon())
+    assert job.process.returncode is not None
+    assert job.result is None
+
+
+@pytest.mark.skipif(sys.version_info >= (3, 12), reason="Python 3.12 watches by pidfds itself")
+def test_pidfd_child_watcher_no_thread_per_process():
+    previous = asyncio.get_child_watcher()
+    threads = []
+
+    async def run_jobs():
+        jobs = [AsyncJob(["sleep", ".3"]) for _ in range(5)]
+        tasks = [asyncio.ensure_future(job.run()) for job in jobs]
+        await asyncio.sleep(.1)
+        threads.append(threading.active_count())
+        await asyncio.gather(*tasks)
+
+    with pidfd_child_watcher():
+        asyncio.run(run_jobs())
+
+    assert asyncio.get_child_watcher() is previous
+    if type(previous) is asyncio.ThreadedChildWatcher and hasattr(asyncio, "PidfdChildWatcher"):
+        assert threads[0] < 5
+
+
+@requires_ffmpeg
+def test_async_engine(tmp_path):
+    progress = []
+    out = tmp_path / "out.mp4"
+    plan = RenderPlan(generate.TestSrc(1, 64, 36), out)
+    profile = plan.run(engine=AsyncEngine(on_progress=lambda job, info: progress.append(info)))
+
+    assert probe_streams(out)["video"][0] == 24
+    assert list(profile.nodes) == [str(out)]
+    assert progress and progress[-1]["progress"] == "end"
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+from scriptycut.common import FPS
+from scriptycut.conform import AudioTarget, Conform, FormatPlan, VideoTarget
+from scriptycut.fileclip import FileClip
+from scriptycut.slice import Trim
+from scriptycut.transform import Scale
+
+from .conftest import probe_streams, requires_ffmpeg
+
+
+@requires_ffmpeg
+def test_cheapest_target(media):
+    source = FileClip(media)
+    small = Scale(source, 160, 90)
+    plan = FormatPlan([source, Trim(source, 1., 2.), small])
+
+    # Scaling down the source once is cheaper than scaling up the small clip
+    assert plan.video.resolution == (160, 90)
+    assert plan.changes(small) == {}
+    assert plan.changes(source) == {"resolution": (160, 90)}
+    assert plan.cost == 6 * 25 * 160 * 90
+
+    converted, trim, unchanged = plan.apply()
+    assert isinstance(converted, Scale) and converted.video_resolution == (160, 90)
+    assert trim.clip is converted and (trim.start, trim.end) == (1., 2.)
+    assert unchanged is small
+
+
+@requires_ffmpeg
+def test_given_target_converted_once(media):
+    source = FileClip(media)
+    plan = FormatPlan([source, Trim(source, 1., 2.)], video=VideoTarget((320, 180), FPS(10)),
+                      audio=AudioTarget(22050))
+
+    assert plan.changes(source) == {"fps": FPS(10), "sample_rate": 22050}
+    converted, trim = plan.apply()
+    assert isinstance(converted, Conform)
+    assert trim.clip is converted
+
+
+@requires_ffmpeg
+def test_render_conform(media, tmp_path):
+    out = tmp_path / "conform.mp4"
+    Conform(FileClip(media), resolution=(160, 90), fps=FPS(10), sample_rate=22050).render(out)
+
+    result = FileClip(out)
+    assert result.video_resolution == (160, 90)
+    assert result.video_fps == FPS(10)
+    assert probe_streams(out)["video"][0] == 60
+    assert int(result.audio_format.sample_rate) == 22050
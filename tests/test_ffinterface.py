@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from scriptycut.common import Layer
+from scriptycut.ffinterface import FFargInput, FFargFilter, compose, fuse_input, prune_layers
+
+
+def test_prune_layers_audio_only():
+    args, used = prune_layers((FFargInput("a.mkv"), FFargInput("v.mkv"),
+                               FFargFilter("[1:v:0]scale=2:2[v];[0:a:0]volume=2[a]", "[v]", "[a]")), Layer.A)
+
+    assert compose(args) == ["-vn", "-i", "a.mkv", "-filter_complex", "[0:a:0]volume=2[a]", "-map", "[a]"]
+    assert [(str(inp.input_file), layer) for inp, layer in used] == [("a.mkv", Layer.A)]
+
+
+def test_prune_layers_renumbers_inputs():
+    args, _ = prune_layers((FFargInput("v1.mkv"), FFargInput("v2.mkv"), FFargInput("a.mkv"),
+                            FFargFilter("[0:v:0][1:v:0]hstack[v]", "[v]", "2:a:0")), Layer.A)
+
+    assert compose(args) == ["-vn", "-i", "a.mkv", "-map", "0:a:0"]
+
+
+def test_prune_layers_keeps_shared_input():
+    args, used = prune_layers((FFargInput("av.mkv"), FFargFilter("[0:v:0]hflip[v]", "[v]", "0:a:0")), Layer.AV)
+
+    assert compose(args) == ["-i", "av.mkv", "-filter_complex", "[0:v:0]hflip[v]", "-map", "[v]", "-map", "0:a:0"]
+    assert used[0][1] == Layer.AV
+
+
+def test_prune_layers_missing_layer():
+    with pytest.raises(ValueError):
+        prune_layers((FFargInput("v.mkv", audio=None), FFargFilter(None, "0:v:0", None)), Layer.A)
+
+
+def test_fuse_input_with_several_inputs():
+    parent = (FFargInput("sub.mkv"), FFargInput("b.mkv"),
+              FFargFilter("[0:v:0][1:v:0]overlay[v];[0:a:0][1:a:0]amix[a]", "[v]", "[a]"))
+    sub = (FFargInput("s1.mp4"), FFargInput("s2.mp4"),
+           FFargFilter("[0:v:0][1:v:0]hstack[v];[0:a:0][1:a:0]amerge[a]", "[v]", "[a]"))
+
+    assert compose(fuse_input(parent, 0, sub, "S_")) == [
+        "-i", "s1.mp4", "-i", "s2.mp4", "-i", "b.mkv", "-filter_complex",
+        "[0:v:0][1:v:0]hstack[S_v];[0:a:0][1:a:0]amerge[S_a];[S_v][2:v:0]overlay[v];[S_a][2:a:0]amix[a]",
+        "-map", "[v]", "-map", "[a]"]
+
+
+def test_fuse_input_splits_stream_used_twice():
+    parent = (FFargInput("sub.mkv"), FFargFilter("[0:v:0][0:v:0]hstack[v]", "[v]", "0:a:0"))
+    sub = (FFargInput("s.mp4"), FFargFilter("[0:v:0]hflip[v];[0:a:0]volume=2[a]", "[v]", "[a]"))
+
+    assert compose(fuse_input(parent, 0, sub, "S_")) == [
+        "-i", "s.mp4", "-filter_complex",
+        "[0:v:0]hflip[S_v];[0:a:0]volume=2[S_a];[S_v]split=2[S_v_0][S_v_1];[S_v_0][S_v_1]hstack[v]",
+        "-map", "[v]", "-map", "[S_a]"]
+
+
+def test_fuse_input_of_plain_input():
+    # Input streams can be read any number of times. No split needed.
+    parent = (FFargInput("a.mkv"), FFargInput("sub.mkv"), FFargFilter("[1:v:0][1:v:0]vstack[v]", "[v]", "0:a:0"))
+    sub = (FFargInput("s.mp4", ("-ss", 2)), FFargFilter(None, "0:v:0", None))
+
+    assert compose(fuse_input(parent, 1, sub, "S_")) == [
+        "-i", "a.mkv", "-ss", "2", "-i", "s.mp4", "-filter_complex", "[1:v:0][1:v:0]vstack[v]",
+        "-map", "[v]", "-map", "0:a:0"]
+
+
+def test_fuse_input_missing_stream():
+    parent = (FFargInput("sub.mkv"), FFargFilter(None, "0:v:0", "0:a:0"))
+    sub = (FFargInput("s.mp4", audio=None), FFargFilter("[0:v:0]hflip[v]", "[v]", None))
+
+    with pytest.raises(ValueError):
+        fuse_input(parent, 0, sub, "S_")
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from scriptycut import fftools
+from scriptycut.fftools import FFMPEG, FFPROBE, FFtool
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """An executable printing a version and counting its runs, with the capability cache in tmp_path"""
+    monkeypatch.setattr(fftools, "CAPABILITY_CACHE_PATH", tmp_path / "capabilities")
+    runs = tmp_path / "runs"
+    binary = tmp_path / "fake-ffmpeg"
+    binary.write_text(f"#!/bin/sh\necho run >> {runs}\necho 'ffmpeg version 9.9'\n")
+    binary.chmod(0o755)
+    yield binary, runs
+    FFtool._instances.pop((FFMPEG, str(binary)), None)
+
+
+def run_count(runs) -> int:
+    return len(runs.read_text().splitlines()) if runs.is_file() else 0
+
+
+def test_singletons():
+    assert FFMPEG() is FFMPEG()
+    assert FFMPEG() is not FFPROBE()
+    assert FFMPEG("other-ffmpeg") is not FFMPEG()
+
+
+def test_capabilities_discovered_once(fake_ffmpeg):
+    binary, runs = fake_ffmpeg
+    tool = FFMPEG(str(binary))
+    assert run_count(runs) == 0
+
+    assert tool.version.startswith("ffmpeg version 9.9")
+    assert run_count(runs) == 1
+
+    # A new process reads the capability cache
+    FFtool._instances.pop((FFMPEG, str(binary)))
+    assert FFMPEG(str(binary)).version.startswith("ffmpeg version 9.9")
+    assert run_count(runs) == 1
+
+
+def test_capabilities_of_changed_binary(fake_ffmpeg):
+    binary, runs = fake_ffmpeg
+    assert FFMPEG(str(binary)).version
+    FFtool._instances.pop((FFMPEG, str(binary)))
+
+    binary.write_text(binary.read_text().replace("9.9", "10.0"))
+    assert FFMPEG(str(binary)).version.startswith("ffmpeg version 10.0")
+    assert run_count(runs) == 2
+
+
+def test_import_starts_no_process(tmp_path):
+    # An ffmpeg on PATH which fails if it ever runs
+    for name in "ffmpeg", "ffprobe":
+        binary = tmp_path / name
+        binary.write_text(f"#!/bin/sh\ntouch {tmp_path / 'started'}\nexit 1\n")
+        binary.chmod(0o755)
+    env = dict(os.environ, PATH=f"{tmp_path}{os.pathsep}{os.environ['PATH']}",
+               PYTHONPATH=os.pathsep.join(sys.path))
+    code = "import scriptycut, scriptycut.clip, scriptycut.fileclip, scriptycut.render, scriptycut.fftools"
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
+
+    assert not (tmp_path / "started").exists()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from scriptycut.clip import ClipError
+from scriptycut.fileclip import FileClip
+from scriptycut.framefunction import FrameFunctionClip
+
+from .conftest import probe_streams, read_frames, requires_ffmpeg
+
+
+# Module level: Workers import them by name
+def invert(frames: np.ndarray) -> np.ndarray:
+    return 255 - frames
+
+
+def darken(frames: np.ndarray) -> np.ndarray:
+    return frames // 2
+
+
+def crop(frames: np.ndarray) -> np.ndarray:
+    return frames[:, 1:]
+
+
+@requires_ffmpeg
+def test_function_in_cache_key(media):
+    source = FileClip(media)
+
+    assert FrameFunctionClip(source, invert).cachedir == FrameFunctionClip(source, invert).cachedir
+    assert FrameFunctionClip(source, invert).cachedir != FrameFunctionClip(source, darken).cachedir
+
+
+@requires_ffmpeg
+def test_render(media, tmp_path):
+    out = tmp_path / "inverted.mkv"
+    FrameFunctionClip(FileClip(media), invert, batch=7, workers=2).render(out, ("-c:v", "ffv1"))
+
+    assert np.array_equal(read_frames(out), 255 - read_frames(media))
+    # Audio is passed through
+    assert probe_streams(out)["audio"][1] == pytest.approx(6, abs=.1)
+
+
+@requires_ffmpeg
+def test_changed_shape_fails(media, tmp_path):
+    with pytest.raises(ClipError, match="shape"):
+        FrameFunctionClip(FileClip(media), crop, workers=1).render(tmp_path / "cropped.mkv")
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import shutil
+import threading
+
+import numpy as np
+import pytest
+
+from scriptycut.fileclip import FileClip
+from scriptycut.framepool import DecoderPool
+
+from .conftest import read_frames, requires_ffmpeg
+
+
+@pytest.fixture
+def pool():
+    pool = DecoderPool()
+    yield pool
+    pool.close()
+
+
+@requires_ffmpeg
+def test_random_access(media):
+    clip = FileClip(media)
+    frames = read_frames(media)
+
+    assert np.array_equal(clip[30], frames[30])
+    assert np.array_equal(clip[2.], frames[50])
+    assert np.array_equal(clip[-1], frames[149])
+    with pytest.raises(IndexError):
+        clip[150]
+
+
+@requires_ffmpeg
+def test_decoder_reuse(media, pool):
+    clip = FileClip(media)
+    pool.get(clip, 10)
+    pool.get(clip, 20)
+    (decoder, ) = pool._decoders.values()
+    assert decoder.restarts == 1
+
+    # Behind the position: seek
+    pool.get(clip, 5)
+    assert decoder.restarts == 2
+    # Far ahead: seek
+    pool.get(clip, 120)
+    assert decoder.restarts == 3
+
+    frame = pool.get(clip, 5)
+    assert (pool.hits, pool.misses) == (1, 4)
+    assert not frame.flags.writeable
+
+
+@requires_ffmpeg
+def test_sources_decode_in_parallel(media, tmp_path, pool):
+    other = tmp_path / "other.mp4"
+    shutil.copy(media, other)
+    busy, free = FileClip(media), FileClip(other)
+    pool.get(busy, 0)
+    (decoder, ) = pool._decoders.values()
+
+    frames = []
+    with decoder.lock:
+        # A read of the other source does not wait for this one
+        thread = threading.Thread(target=lambda: frames.append(pool.get(free, 10)))
+        thread.start()
+        thread.join(10)
+        assert frames and not thread.is_alive()
+
+
+@requires_ffmpeg
+def test_evicted_decoders_close(media, tmp_path):
+    other = tmp_path / "other.mp4"
+    shutil.copy(media, other)
+    pool = DecoderPool(max_decoders=1)
+    first = FileClip(media)
+    pool.get(first, 0)
+    (decoder, ) = pool._decoders.values()
+    pool.get(FileClip(other), 0)
+
+    assert decoder.evicted and decoder._proc is None
+    assert np.array_equal(pool.get(first, 1), read_frames(media)[1])
+    pool.close()
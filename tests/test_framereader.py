@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from scriptycut.common import Layer
+from scriptycut.fileclip import FileClip
+from scriptycut.rawframes import FrameReader
+from scriptycut.slice import Trim
+from scriptycut.transform import Scale
+
+from .conftest import read_frames, requires_ffmpeg
+
+
+@requires_ffmpeg
+def test_batches(media):
+    reader = FrameReader(FileClip(media), batch=16)
+    shapes = [batch.shape for batch in reader]
+
+    assert shapes == [(16, 180, 320, 3)] * 9 + [(6, 180, 320, 3)]
+    assert reader.frames_read == 150
+
+
+@requires_ffmpeg
+def test_frames_match_decoder(media):
+    frames = np.concatenate([batch.copy() for batch in FileClip(media).iter_frames(batch=32)])
+
+    assert np.array_equal(frames, read_frames(media))
+
+
+@requires_ffmpeg
+def test_ring_buffer_reuse(media):
+    reader = FrameReader(FileClip(media), batch=8, ring_size=2)
+    batches = iter(reader)
+    first = next(batches)
+    copy = first.copy()
+    second = next(batches)
+
+    # The previous batch stays valid until the ring wraps around
+    assert np.array_equal(first, copy)
+    assert not np.shares_memory(first, second)
+    assert np.shares_memory(first, next(batches))
+    reader.close()
+
+
+@requires_ffmpeg
+def test_size_and_fps(media):
+    batches = list(FileClip(media).iter_frames(batch=100, size=(64, 36), fps=5))
+
+    assert sum(len(b) for b in batches) == 30
+    assert batches[0].shape[1:] == (36, 64, 3)
+
+
+@requires_ffmpeg
+def test_dependencies_rendered_clip_not_cached(media):
+    processed = Scale(FileClip(media), 160, 90)
+    clip = Trim(processed, 1., 3.)
+    frames = sum(len(b) for b in clip.iter_frames())
+
+    assert frames == 50
+    # The seeked clip reads the video cache of its input. The clip itself is decoded directly.
+    assert processed.layer_cache_file(Layer.V).is_file()
+    assert not clip.cache_file.exists()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from scriptycut.common import FPS
+from scriptycut.fileclip import FileClip
+from scriptycut.framefunction import FrameFunctionClip
+from scriptycut.rawframes import FrameReader, FrameStore
+
+from .conftest import read_frames, requires_ffmpeg
+from .test_framefunction import invert
+
+
+def test_store_roundtrip(tmp_path):
+    frames = np.arange(5 * 4 * 6 * 3, dtype=np.uint8).reshape(5, 4, 6, 3)
+    store = FrameStore(tmp_path)
+    with store.create((4, 6, 3), "uint8", FPS(25)) as writer:
+        writer.write(frames[:2])
+        writer.write(frames[2:].tobytes())
+        # Appears on commit only
+        assert not store.exists
+
+    stored = store.open()
+    assert np.array_equal(stored, frames)
+    assert not stored.flags.writeable
+    assert store.header()["fps"] == "25/1"
+
+
+def test_store_aborted(tmp_path):
+    directory = tmp_path / "store"
+    directory.mkdir()
+    store = FrameStore(directory)
+    with pytest.raises(RuntimeError):
+        with store.create((4, 6, 3), "uint8") as writer:
+            writer.write(np.zeros((2, 4, 6, 3), dtype=np.uint8))
+            raise RuntimeError("failed")
+
+    assert not store.exists
+    assert list(directory.iterdir()) == []
+
+
+@requires_ffmpeg
+def test_frames_decoded_once(media, monkeypatch):
+    clip = FileClip(media)
+    frames = clip.frames()
+    assert np.array_equal(frames, read_frames(media))
+
+    # Readers slice the store instead of decoding
+    def no_decode(*args, **kwargs):
+        raise AssertionError("decoded")
+
+    monkeypatch.setattr(FrameReader, "command", no_decode)
+    assert clip.frames().shape == (150, 180, 320, 3)
+    assert np.array_equal(next(iter(FrameReader(clip, batch=10))), frames[:10])
+    assert np.array_equal(clip[42], frames[42])
+
+
+@requires_ffmpeg
+def test_frame_function_fills_store(media, tmp_path):
+    clip = FrameFunctionClip(FileClip(media), invert, workers=1)
+    clip.render(tmp_path / "out.mkv")
+    store = FrameStore(clip.cachedir)
+
+    assert store.exists
+    assert np.array_equal(store.open(), 255 - read_frames(media))
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import os
+from hashlib import sha256
+
+import numpy as np
+import imageio.v3 as iio
+import pytest
+
+from scriptycut import image as image_module
+from scriptycut.image import Image, ImageClip, ImageFromFile, file_sha256
+
+
+@pytest.fixture
+def png(tmp_path):
+    file = tmp_path / "image.png"
+    iio.imwrite(file, np.arange(16 * 8 * 3, dtype=np.uint8).reshape(8, 16, 3))
+    return file
+
+
+def test_file_sha256(png, monkeypatch):
+    assert file_sha256(png) == sha256(png.read_bytes()).hexdigest()
+
+    # Memoized while size and mtime stay
+    monkeypatch.setattr(image_module, "HASH_CHUNK_SIZE", 0)
+    assert file_sha256(png) == sha256(png.read_bytes()).hexdigest()
+
+
+def test_file_sha256_of_changed_file(png):
+    before = file_sha256(png)
+    iio.imwrite(png, np.zeros((8, 16, 3), dtype=np.uint8))
+    stat_info = png.stat()
+    os.utime(png, ns=(stat_info.st_atime_ns, stat_info.st_mtime_ns + 10 ** 9))
+
+    assert file_sha256(png) != before
+
+
+def test_image_from_file_is_lazy(png, monkeypatch):
+    def no_decode(*args, **kwargs):
+        raise AssertionError("decoded")
+
+    monkeypatch.setattr(iio, "imread", no_decode)
+    image = ImageFromFile(png)
+
+    assert image.content_hash == "sha256=" + sha256(png.read_bytes()).hexdigest()
+    assert image.data_shape == (8, 16, 3)
+    assert image.size == (16, 8)
+    assert isinstance(hash(image), int)
+
+
+def test_image_from_file_data(png):
+    image = ImageFromFile(png)
+    data = image.data
+
+    assert data.shape == (8, 16, 3)
+    assert image.data is data
+    del data
+    assert image.data.shape == (8, 16, 3)
+
+
+def test_image_hash_of_sliced_array():
+    data = np.arange(8 * 16 * 3, dtype=np.uint8).reshape(8, 16, 3)
+    sliced = data[:, ::2]
+
+    assert Image(sliced, None).content_hash == Image(sliced.copy(), None).content_hash
+    assert Image(data, None).content_hash != Image(data.reshape(16, 8, 3), None).content_hash
+
+
+def test_image_clip_reads_file(png):
+    clip = ImageClip(ImageFromFile(png), 2.)
+    inp = clip.input_args()
+
+    assert str(inp.input_file) == str(png.absolute())
+    assert "-loop" in inp.args()
+    assert clip.video_resolution == (16, 8)
+
+
+def test_image_clip_writes_memory_image_once():
+    clip = ImageClip(Image(np.zeros((8, 16, 3), dtype=np.uint8), None), 2.)
+    file = clip.image_file
+    mtime = file.stat().st_mtime_ns
+
+    assert iio.imread(file).shape == (8, 16, 3)
+    assert clip.image_file == file and file.stat().st_mtime_ns == mtime
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from scriptycut.clip import ClipError
+from scriptycut.fileclip import FileClip
+from scriptycut.rawaudio import AudioArrayClip, AudioReader
+
+from .conftest import probe_streams, requires_ffmpeg
+
+
+def ramp(seconds: float, sample_rate=8000, channels=2) -> np.ndarray:
+    samples = np.linspace(-.5, .5, round(seconds * sample_rate), dtype=np.float32)
+    return np.repeat(samples[:, None], channels, axis=1)
+
+
+def read_all(clip, **kwargs) -> np.ndarray:
+    return np.concatenate([chunk.copy() for chunk in clip.iter_audio(**kwargs)])
+
+
+def test_duration_in_cache_key():
+    array = ramp(1.)
+
+    assert AudioArrayClip(array, 8000).cachedir == AudioArrayClip(array, 8000).cachedir
+    assert AudioArrayClip(array, 8000).cachedir != AudioArrayClip(array, 8000, duration=2.).cachedir
+
+
+@requires_ffmpeg
+def test_array_roundtrip():
+    array = ramp(1.5)
+    samples = read_all(AudioArrayClip(array, 8000), sample_rate=8000)
+
+    # Stored as FLAC in the cache: 24 bit resolution
+    assert samples.shape == array.shape
+    assert np.allclose(samples, array, atol=1e-4)
+
+
+@requires_ffmpeg
+def test_function_padded_to_duration():
+    def chunks():
+        yield ramp(.5)[:, 0]
+        yield ramp(.5)[:, 0]
+
+    clip = AudioArrayClip(chunks, 8000, duration=2., channels=1)
+    samples = read_all(clip, sample_rate=8000, layout="mono")
+
+    assert samples.shape == (16000, 1)
+    assert not samples[8000:].any()
+
+
+@requires_ffmpeg
+def test_function_chunk_shape_checked(tmp_path):
+    clip = AudioArrayClip(lambda: [np.zeros((100, 3))], 8000, duration=1.)
+
+    with pytest.raises(ClipError):
+        clip.render(tmp_path / "out.wav")
+
+
+@requires_ffmpeg
+def test_reader_chunks(media):
+    reader = AudioReader(FileClip(media), chunk_seconds=.5, sample_rate=8000, layout="mono")
+    lengths = [len(chunk) for chunk in reader]
+
+    assert set(lengths[:-1]) == {4000}
+    assert sum(lengths) == reader.samples_read == pytest.approx(6 * 8000, abs=1024)
+
+
+@requires_ffmpeg
+def test_render_array(tmp_path):
+    out = tmp_path / "out.wav"
+    AudioArrayClip(ramp(1.), 8000, duration=3.).render(out)
+
+    assert probe_streams(out)["audio"][1] == pytest.approx(3, abs=.01)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+import pytest
+
+from scriptycut.clip import ClipError
+from scriptycut.image import Image, ImageSequenceClip
+from scriptycut.rawframes import RawFrameWriter, pix_fmt_of
+
+from .conftest import probe_streams, read_frames, requires_ffmpeg
+
+
+def test_pix_fmt_of():
+    assert pix_fmt_of((8, 16, 3), np.dtype("uint8")) == "rgb24"
+    assert pix_fmt_of((8, 16), np.dtype("uint8")) == "gray"
+    with pytest.raises(ValueError):
+        pix_fmt_of((8, 16, 2), np.dtype("float64"))
+
+
+def read_all(fd: int) -> bytes:
+    data = b""
+    while chunk := os.read(fd, 1 << 16):
+        data += chunk
+    os.close(fd)
+    return data
+
+
+def test_writer_streams_frames():
+    frames = [np.full((8, 16, 3), i, dtype=np.uint8) for i in range(20)]
+    # Non-contiguous views get copied
+    frames.append(np.zeros((8, 32, 3), dtype=np.uint8)[:, ::2])
+    read_fd, write_fd = os.pipe()
+    writer = RawFrameWriter(iter(frames), write_fd, queue_frames=2).start()
+    data = read_all(read_fd)
+    writer.join()
+
+    assert data == b"".join(np.ascontiguousarray(f).tobytes() for f in frames)
+    assert writer.bytes_written == len(data)
+    assert writer.frames_written == 21
+    assert writer.error is None
+
+
+def test_writer_stops_on_closed_pipe():
+    def endless():
+        while True:
+            yield np.zeros((64, 64, 3), dtype=np.uint8)
+
+    read_fd, write_fd = os.pipe()
+    writer = RawFrameWriter(endless(), write_fd).start()
+    os.read(read_fd, 100)
+    os.close(read_fd)
+    writer.join(5)
+
+    assert not writer._writer.is_alive() and not writer._producer.is_alive()
+
+
+def test_writer_keeps_producer_error():
+    def failing():
+        yield np.zeros((8, 16, 3), dtype=np.uint8)
+        raise RuntimeError("broken frame")
+
+    read_fd, write_fd = os.pipe()
+    writer = RawFrameWriter(failing(), write_fd).start()
+    read_all(read_fd)
+    writer.join()
+
+    assert isinstance(writer.error, RuntimeError)
+    assert writer.frames_written == 1
+
+
+def colors():
+    return [Image(np.full((36, 64, 3), value, dtype=np.uint8), None) for value in (0, 128, 255)]
+
+
+@requires_ffmpeg
+def test_render_image_sequence(tmp_path):
+    out = tmp_path / "sequence.mkv"
+    profile = ImageSequenceClip(colors(), .5).render(out, ("-c:v", "ffv1"))
+
+    assert probe_streams(out)["video"][0] == 36
+    frames = read_frames(out)
+    assert [int(frames[i].mean()) for i in (0, 11, 12, 35)] == [0, 0, 128, 255]
+    (node, ) = profile.nodes.values()
+    assert node.bytes_read == 3 * 36 * 64 * 3
+
+
+@requires_ffmpeg
+def test_render_image_sequence_fails_with_producer(tmp_path, monkeypatch):
+    def broken(self):
+        yield self._images[0].data
+        raise RuntimeError("broken frame")
+
+    monkeypatch.setattr(ImageSequenceClip, "stdin_data", broken)
+    with pytest.raises(ClipError, match="broken frame"):
+        ImageSequenceClip(colors(), .5).render(tmp_path / "sequence.mkv")
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from scriptycut import generate
+from scriptycut.common import Layer
+from scriptycut.fileclip import FileClip
+from scriptycut.grid import Grid
+from scriptycut.render import RenderPlan
+from scriptycut.reverse import Reverse, chunk_bounds
+from scriptycut.slice import Trim
+from scriptycut.speed import Speed
+from scriptycut.transform import Scale
+
+from .conftest import probe_streams, read_frames, requires_ffmpeg
+
+
+def scaled_testsrc():
+    return Scale(generate.TestSrc(2, 320, 180), 160, 90)
+
+
+def test_prepare_fuses_cheap_clip(tmp_path):
+    clip = scaled_testsrc()
+    plan = RenderPlan(clip, tmp_path / "out.mp4")
+
+    assert len(plan.jobs) == 1
+    cmd = plan.target.cmd
+    assert cmd[cmd.index("-filter_complex") + 1].startswith("[0:v:0]scale=160:90")
+    assert clip._autoname in plan.explain()
+
+
+def test_prepare_fuses_subclip_into_parent(tmp_path):
+    clip = Scale(scaled_testsrc(), 80, 45)
+    plan = RenderPlan(clip, tmp_path / "out.mp4")
+    args = plan._prepare(clip, Layer.V)[0]
+
+    assert len(plan.jobs) == 1
+    graph = next(a for a in args if hasattr(a, "graph")).graph
+    assert graph.startswith("[0:v:0]scale=160:90")
+    assert "]scale=80:45" in graph
+    assert plan._prepare(clip, Layer.V)[3] == (clip.clip, clip.clip.clip)
+
+
+def test_clip_read_twice_gets_cache(tmp_path):
+    clip = scaled_testsrc()
+    sequence = clip + clip
+    plan = RenderPlan(sequence, tmp_path / "out.mp4")
+
+    assert [(job.clip, job.is_cache) for job in plan.jobs] == [(clip, True), (sequence, False)]
+    assert plan.target.depends == (plan.jobs[0], )
+
+
+def test_seeked_clip_gets_cache(tmp_path):
+    clip = scaled_testsrc()
+    trim = Trim(clip, .5, 1.5)
+    plan = RenderPlan(trim, tmp_path / "out.mp4")
+
+    cache = plan.jobs[0]
+    assert cache.clip is clip and cache.is_cache
+    assert plan._fusable_input(plan._prepare(trim, Layer.V)[0], clip, Layer.V) is None
+    cmd = plan.target.cmd
+    assert cmd[cmd.index("-ss") + 1] == "0.5"
+    assert cmd[cmd.index("-i") + 1] == str(cache.output_file)
+
+
+@requires_ffmpeg
+def test_audio_only_plan(media, tmp_path):
+    source = FileClip(media)
+    clip = Grid([source, Scale(source, 160, 90)], cols=2)
+    plan = RenderPlan(clip, tmp_path / "out.wav")
+
+    assert plan.layers == Layer.A
+    assert len(plan.jobs) == 1
+    cmd = plan.target.cmd
+    assert cmd[:cmd.index("-i")].count("-vn") == 1
+    assert cmd.count("-i") == 1
+    assert "scale" not in " ".join(cmd) and ":v:" not in " ".join(cmd)
+
+    plan.run()
+    assert set(probe_streams(tmp_path / "out.wav")) == {"audio"}
+
+
+@requires_ffmpeg
+def test_render_overlay_window(media, tmp_path):
+    source = FileClip(media)
+    out = tmp_path / "overlay.mp4"
+    clip = source.overlay(generate.TestSrc(1, 80, 45), "x=10:y=10", start=2., duration=1.)
+    plan = RenderPlan(clip, out)
+
+    segments = [job for job in plan.jobs if job.is_segment]
+    assert [job.is_copy for job in segments] == [True, False, True]
+    plan.run()
+
+    streams = probe_streams(out)
+    assert streams["video"][0] == 150
+    assert streams["video"][1] == pytest.approx(6, abs=.1)
+
+
+@requires_ffmpeg
+def test_render_grid(media, tmp_path):
+    source = FileClip(media)
+    out = tmp_path / "grid.mp4"
+    Grid([source, Scale(source, 160, 90), source], cols=2).render(out)
+
+    streams = probe_streams(out)
+    assert streams["video"][0] == 150
+    assert FileClip(out).video_resolution == (640, 360)
+
+
+@requires_ffmpeg
+def test_grid_ended_cell_filled(media, tmp_path):
+    source = FileClip(media)
+    out = tmp_path / "grid.mkv"
+    Grid([source, Trim(source, 0., 2.)], cols=2, audio=1, fill="red").render(out, ("-c:v", "ffv1"))
+
+    frames = read_frames(out)
+    assert len(frames) == 150
+    # The right cell shows the clip until 2 s, then the fill color
+    right = frames[:, :, 320:].reshape(150, -1, 3).mean(axis=1)
+    assert right[100] == pytest.approx((255, 0, 0), abs=3)
+    assert right[20] != pytest.approx((255, 0, 0), abs=3)
+    # The audio of the short clip is padded
+    samples = sum(len(chunk) for chunk in FileClip(out).iter_audio(sample_rate=8000))
+    assert samples / 8000 == pytest.approx(6, abs=.1)
+
+
+@requires_ffmpeg
+def test_render_speed(media, tmp_path):
+    out = tmp_path / "speed.mp4"
+    clip = FileClip(media).speed(2)
+    clip.render(out)
+
+    assert "-discard:v" not in RenderPlan(clip, out).target.cmd
+    streams = probe_streams(out)
+    assert streams["video"][0] == 75
+    assert streams["video"][1] == pytest.approx(3, abs=.1)
+
+
+@requires_ffmpeg
+def test_dense_keyframes(media):
+    # A keyframe each second at 25 fps
+    source = FileClip(media)
+
+    assert Speed.dense_keyframes(source, 25)
+    assert not Speed.dense_keyframes(source, 20)
+    assert "-discard:v" in Speed(source, 50).ffmpeg_args()[0].args()
+    assert "-discard:v" not in Speed(source, 20).ffmpeg_args()[0].args()
+    assert "-discard:v" not in Speed(source, 50, keyframes_only=False).ffmpeg_args()[0].args()
+
+
+@requires_ffmpeg
+def test_render_speed_keyframes_only(media, tmp_path):
+    out = tmp_path / "timelapse.mkv"
+    Speed(FileClip(media), 50, keyframes_only=True).render(out, ("-c:v", "ffv1"))
+
+    # An output frame each 2 s of source: The keyframes at 0, 2 and 4 s
+    frames = read_frames(out)
+    assert np.array_equal(frames, read_frames(media)[[0, 50, 100]])
+
+
+def test_chunk_bounds():
+    assert chunk_bounds(6., 2.) == [0., 2., 4., 6.]
+    # Moved to keyframes nearby. No tiny last chunk.
+    assert chunk_bounds(6.3, 2., [0., 2.4, 4.1, 6.]) == [0., 2.4, 4.1, 6.3]
+
+
+@requires_ffmpeg
+def test_render_reverse(media, tmp_path):
+    out = tmp_path / "reverse.mkv"
+    clip = FileClip(media).reverse(2.)
+    clip.render(out, ("-c:v", "ffv1"))
+
+    assert isinstance(clip, Reverse)
+    frames = read_frames(out)
+    assert np.array_equal(frames, read_frames(media)[::-1])
+    samples = sum(len(chunk) for chunk in FileClip(out).iter_audio(sample_rate=8000))
+    assert samples / 8000 == pytest.approx(6, abs=.1)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from scriptycut import generate
+from scriptycut.clip import ClipError
+from scriptycut.fileclip import FileClip
+from scriptycut.render import RenderJob, RenderPlan, ThreadedEngine
+from scriptycut.renderprofile import NodeProfile, RenderProfile
+from scriptycut.transform import Scale
+
+from .conftest import requires_ffmpeg
+
+
+def node(name: str, output: str, start: float, end: float, depends=()) -> NodeProfile:
+    return NodeProfile(name=name, clip=name, output=output, command=[], cache_hit=False,
+                       depends=list(depends), start=start, end=end)
+
+
+def test_critical_path():
+    profile = RenderProfile("out.mp4")
+    profile.add(node("A", "a.mkv", 0., 1.))
+    profile.add(node("B", "b.mkv", 0., 3.))
+    profile.add(node("C", "out.mp4", 3., 4., depends=("a.mkv", "b.mkv")))
+
+    assert [n.output for n in profile.critical_path()] == ["b.mkv", "out.mp4"]
+    assert profile.as_dict()["critical_path_time"] == pytest.approx(4.)
+
+
+def test_nodes_of_one_clip_are_kept_apart():
+    # Layer caches of the same clip
+    profile = RenderProfile("out.mp4")
+    profile.add(node("A", "cache_v.mkv", 0., 5.))
+    profile.add(node("A", "cache_a.mkv", 0., 1.))
+    profile.add(node("B", "out.mp4", 5., 6., depends=("cache_v.mkv", "cache_a.mkv")))
+
+    assert len(profile.nodes) == 3
+    assert [n.output for n in profile.critical_path()] == ["cache_v.mkv", "out.mp4"]
+    events = profile.chrome_trace_events()
+    assert [e["args"]["critical_path"] for e in events] == [True, False, True]
+
+
+def test_stuck_jobs_raise(tmp_path):
+    clip = generate.TestSrc(1, 64, 36)
+    plan = RenderPlan(clip, tmp_path / "out.mp4")
+    missing = RenderJob(clip, [], tmp_path / "missing.mkv", (), is_cache=True, cache_hit=False)
+    plan.target.depends = (missing, )
+
+    with pytest.raises(ClipError, match="never finish"):
+        ThreadedEngine().run(plan)
+
+
+@requires_ffmpeg
+def test_bytes_read_of_fused_inputs(media, tmp_path):
+    clip = Scale(Scale(FileClip(media), 160, 90), 80, 46)
+    profile = RenderPlan(clip, tmp_path / "out.mp4").run()
+
+    (node, ) = profile.nodes.values()
+    assert node.bytes_read == media.stat().st_size
+    assert node.bytes_written == (tmp_path / "out.mp4").stat().st_size
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from scriptycut.fileclip import FileClip
+from scriptycut.render import RenderPlan
+
+from .conftest import probe_streams, requires_ffmpeg
+
+ENCODE = ("-c:v", "libx264", "-preset", "ultrafast")
+
+
+@requires_ffmpeg
+def test_one_pass_encoded_and_looped(media, tmp_path):
+    out = tmp_path / "repeated.mkv"
+    clip = FileClip(media) * 3
+    plan = RenderPlan(clip, out, ENCODE)
+    plan.run()
+
+    (encode, ) = plan.target.depends
+    assert plan.target.is_copy and not encode.is_copy
+    assert encode.clip is clip.clip and encode.output_file.suffix == ".mkv"
+    streams = probe_streams(out)
+    assert streams["video"][0] == 3 * 150
+    assert streams["video"][1] == pytest.approx(18, abs=.1)
+
+    # The pass is reused
+    assert RenderPlan(clip, tmp_path / "again.mkv", ENCODE).target.depends[0].cache_hit
+
+
+@requires_ffmpeg
+def test_cut_output_encoded_whole(media, tmp_path):
+    plan = RenderPlan(FileClip(media) * 3, tmp_path / "repeated.mkv", (*ENCODE, "-t", 10))
+
+    assert not plan.target.is_copy
+    assert "-stream_loop" in plan.target.cmd
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from scriptycut import generate
+from scriptycut.clip import ClipSequence
+from scriptycut.fileclip import FileClip
+from scriptycut.render import RenderPlan
+from scriptycut.still import StillFrames
+
+from .conftest import probe_streams, read_frames, requires_ffmpeg
+
+
+def red(duration: float, width=320, height=180):
+    return generate.ColorClip(duration, width, height, "red")
+
+
+@requires_ffmpeg
+def test_render_without_output_args(tmp_path):
+    out = tmp_path / "still.mp4"
+    plan = RenderPlan(red(5, 64, 36), out)
+    plan.run()
+
+    assert plan.target.is_copy
+    (gop, ) = plan.target.depends
+    # Encoded for the output's codec, so it can be copied
+    assert isinstance(gop.clip, StillFrames) and gop.clip.output_args[-2:] == ("-c:v", "h264")
+    assert probe_streams(out)["video"][0] == 5 * 24
+
+
+@requires_ffmpeg
+def test_sequence_loops_still_segment(media, tmp_path):
+    out = tmp_path / "sequence.mp4"
+    plan = RenderPlan(ClipSequence([FileClip(media), red(3)]), out)
+    plan.run()
+
+    (looped, ) = [job for job in plan.jobs if job.is_segment and isinstance(job.clip, generate.ColorClip)]
+    assert looped.is_copy
+    # At the frame rate of the copied source
+    assert probe_streams(out)["video"][0] == 150 + 75
+    frames = read_frames(out)
+    assert frames[200, ..., 0].mean() > 200 and frames[200, ..., 1:].mean() < 50
+
+
+@requires_ffmpeg
+def test_encoded_sequence_reads_looped_still(tmp_path):
+    out = tmp_path / "sequence.mkv"
+    plan = RenderPlan(ClipSequence([generate.TestSrc(1, 64, 36), red(3, 64, 36)]), out, ("-c:v", "ffv1"))
+    plan.run()
+
+    (looped, ) = [job for job in plan.target.depends if isinstance(job.clip, generate.ColorClip)]
+    assert looped.is_copy and looped.is_cache
+    assert str(looped.output_file) in plan.target.input_files
+    frames = read_frames(out)
+    assert len(frames) == 4 * 24
+    assert np.all(frames[30:, ..., 0] > 200)
+
+
+def test_short_still_is_encoded(tmp_path):
+    plan = RenderPlan(ClipSequence([generate.TestSrc(1, 64, 36), red(.5, 64, 36)]), tmp_path / "out.mkv",
+                      ("-c:v", "ffv1"))
+
+    assert plan.jobs == (plan.target, )
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from scriptycut.clip import ClipSequence
+from scriptycut.crossfade import Crossfade
+from scriptycut.fileclip import FileClip
+from scriptycut.render import RenderPlan
+from scriptycut.slice import Trim
+
+from .conftest import probe_streams, requires_ffmpeg
+
+
+def crossfaded(media):
+    source = FileClip(media)
+    return ClipSequence([source, Crossfade(1., "fade"), Trim(source, .4, 6.)])
+
+
+@requires_ffmpeg
+def test_crossfade_copies_untouched_parts(media, tmp_path):
+    out = tmp_path / "crossfade.mp4"
+    plan = RenderPlan(crossfaded(media), out)
+    segments = [job for job in plan.jobs if job.is_segment]
+
+    assert [job.is_copy for job in segments].count(True) == 2
+    profile = plan.run()
+
+    streams = probe_streams(out)
+    # 6 s + 5.6 s - 1 s overlap
+    assert streams["video"][0] == 265
+    assert streams["audio"][1] == pytest.approx(10.6, abs=.1)
+    assert profile.nodes[str(out)].bytes_read >= sum(job.output_file.stat().st_size for job in segments)
+
+
+@requires_ffmpeg
+def test_planning_writes_no_files(media, tmp_path):
+    clip = crossfaded(media)
+    plan = RenderPlan(clip, tmp_path / "crossfade.mp4")
+    plan.explain()
+
+    (list_file, ) = plan.target.input_lists
+    assert not list_file.exists()
+    assert not list(clip.cachedir.parent.rglob("*.mp4"))
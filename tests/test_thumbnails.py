@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import imageio.v3 as iio
+import numpy as np
+
+from scriptycut.fileclip import FileClip
+
+from .conftest import read_frames, requires_ffmpeg
+
+
+@requires_ffmpeg
+def test_one_file_per_time(media):
+    files = FileClip(media).thumbnails([1.01, 2., 1.02, 9.], size=(-1, -1))
+
+    # 1.01 and 1.02 fall on the frame at 1.04. 9 is beyond the end.
+    assert len(files) == 3
+    assert files[0] == files[1] != files[2]
+    frames = read_frames(media)
+    assert np.array_equal(iio.imread(files[0]), frames[26])
+    assert np.array_equal(iio.imread(files[2]), frames[50])
+
+
+@requires_ffmpeg
+def test_keyframes_only(media):
+    files = FileClip(media).thumbnails([.5, .6, 2.5], keyframes_only=True)
+
+    # Keyframes each second
+    assert len(files) == 3
+    assert files[0] == files[1] != files[2]
+
+
+@requires_ffmpeg
+def test_every_and_cache(media):
+    clip = FileClip(media)
+    files = clip.thumbnails(every=2, size=(80, -2))
+
+    assert len(files) == 3
+    assert iio.imread(files[0]).shape == (46, 80, 3)
+    mtime = files[0].stat().st_mtime_ns
+    assert clip.thumbnails(every=2, size=(80, -2)) == files
+    assert files[0].stat().st_mtime_ns == mtime
+
+
+@requires_ffmpeg
+def test_contact_sheet(media):
+    sheet = FileClip(media).contact_sheet(3, 2, size=(80, 45))
+
+    assert iio.imread(sheet).shape == (90, 240, 3)